@@ -2,6 +2,7 @@
 Main caller for interface
 """
 
+import multiprocessing
 import sys
 
 import PyQt5
@@ -26,4 +27,5 @@ def main():
     sys.exit(app.exec_())
 
 if __name__ == '__main__':
+    multiprocessing.freeze_support()
     main()
\ No newline at end of file
@@ -11,6 +11,7 @@ from PyQt5 import Qt, QtCore, QtGui, QtWidgets
 from application.interface.components.qworker import Worker
 from application.interface.components.wrap_text import wrap_text
 from application.interface.menus.menu import MyMenu
+from application.logic.representation.parsers.catalog import Catalog
 
 
 class OnOffWidget(QtWidgets.QWidget):
@@ -164,13 +165,14 @@ class FirstMenu(MyMenu):
         if not os.path.exists(database_path):
             return selectables
 
-        for folder in [f.path for f in os.scandir(database_path) if f.is_dir() and any('.pbz2' in _file for _file in os.listdir(f.path))]:
-            name = os.path.normpath(folder).split(os.path.sep)[-1]
+        catalog = Catalog(database_path)
+        for name in catalog.folders():
             if name not in folders:
                 selectables.append(QtWidgets.QCheckBox(name))
                 selectables[-1].setChecked(False)
                 selectables[-1].toggled.connect(self.select_one)
                 container.widget().layout().addWidget(selectables[-1])
+        catalog.close()
         return selectables
 
     def select_all(self, state):
@@ -288,7 +290,7 @@ class FirstMenu(MyMenu):
 
         application = self.parentWidget().parentWidget().application
         worker = Worker(
-            application.parse_files, self.files_to_parse, self)
+            application.parse_files, self.files_to_parse, self, processes=None)
         worker.signals.finished.connect(self.stop_waiting)
         self.threadpool.start(worker)
         self.start_waiting()
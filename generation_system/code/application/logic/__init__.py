@@ -4,7 +4,9 @@ This script presents the application class
 To comunicate with interface
 """
 
+import concurrent.futures
 import math
+import multiprocessing
 import music21
 import os
 import json
@@ -14,17 +16,25 @@ from PyQt5 import QtCore
 
 import application.logic.single_oracle as single_oracle
 import application.logic.multi_oracle as multi_oracle
+import application.logic.generation.model_store as model_store
 
+import application.logic.representation.parsers.utils as parser_utils
+import application.logic.representation.utils.compression as compression
 import application.logic.representation.utils.features as rep_utils
 import application.logic.representation.utils.statistics as statistics
 
-from application.logic.representation.parsers.music_parser import MusicParser
+from application.logic.representation.events.vocabulary import CORPUS_VOCABULARY
+from application.logic.representation.parsers.catalog import Catalog
+from application.logic.representation.parsers.manifest import (Manifest, content_hash,
+                                                               source_path)
+from application.logic.representation.parsers.music_parser import MusicParser, load_parsed
 from application.logic.representation.parsers.segmentation import (apply_segmentation_info,
                                                              get_phrases_from_events,
                                                              segmentation,
                                                              INTERPART_WEIGHTS,
                                                              LINE_WEIGHTS)
 
+
 class Application(QtCore.QObject):
     """
     Class Application,
@@ -73,73 +83,196 @@ class Application(QtCore.QObject):
             'multiple_oracles': {}
         }
 
-    def parse_files(self, filenames, interface):
+    def parse_files(self, filenames, interface, processes=1):
         """
         Parses Music
+        (in a pool of processes if processes is not 1;
+        None uses all cpus)
+        Files parsed before (same contents and parser version,
+        as in the manifest of the database) are loaded instead
         """
         if interface is not None:
             self.signal_parsed.connect(interface.increase_progress_bar)
             self.signal_error.connect(interface.handler_error_parsing)
 
-        reversed_filenames = reversed(filenames)
+        manifest = Manifest(self.database_path)
+        reversed_filenames = [filename for filename in reversed(filenames)
+                              if '.mxl' in filename or '.xml' in filename]
 
         n_processed = 0
+        hashes = {}
+        to_parse = []
         for filename in reversed_filenames:
-            if '.mxl' in filename or '.xml' in filename:
-                parser = MusicParser(filename)
-                if parser.exception == False:
-                    self.music[filename] = (parser, filename, False)
-                    self.music[filename][0].parse()
-                    folder_name = ['Other']
-                    if self.music[filename][0].music.metadata.composer is not None:
-                        folder_name = [
-                            self.music[filename][0].music.metadata.composer.split(' ')[-1]]
-                        folder_name[-1].capitalize()
-                    name = os.path.normpath(filename).split(os.path.sep)[-1]
-                    name = '.'.join(name.split('.')[:-1])
-                    folders = self.database_path.split(os.path.sep) + folder_name
-                    self.music[filename][0].to_pickle(name, folders)
-
-                    n_processed += 1
-                    perc = int((n_processed/len(filenames))*100)
-
-                    if interface is not None:
-                        self.signal_parsed.emit(perc)
+            if os.path.isfile(filename):
+                hashes[filename] = content_hash(filename)
+            if filename in hashes and manifest.is_current(filename, hashes[filename]):
+                self.music[filename] = (load_parsed(manifest.pickle_path(filename)),
+                                        filename, False)
+
+                n_processed += 1
+                if interface is not None:
+                    self.signal_parsed.emit(int((n_processed/len(filenames))*100))
+            else:
+                to_parse.append(filename)
 
-                else:
-                    self.signal_error.emit(filename, str(parser.exception))
+        parsed = []
+        for filename, parser, pickle_path, exception in self.parse_and_save_files(
+                to_parse, processes):
+            if exception is None:
+                self.music[filename] = (parser, filename, False)
+                parsed.append((filename, parser, pickle_path))
+                if filename in hashes:
+                    manifest.add(filename, hashes[filename], pickle_path)
+
+                n_processed += 1
+                perc = int((n_processed/len(filenames))*100)
+
+                if interface is not None:
+                    self.signal_parsed.emit(perc)
+
+            else:
+                self.signal_error.emit(filename, exception)
+
+        if os.path.isdir(self.database_path):
+            CORPUS_VOCABULARY.to_pickle(self.vocabulary_path())
+            manifest.save()
+
+            catalog = Catalog(self.database_path, refresh=False)
+            for filename, parser, pickle_path in parsed:
+                catalog.add(pickle_path, parser.music_events,
+                            source_path(filename) if filename in hashes else None)
+            catalog.close()
 
         if interface is not None:
             self.signal_parsed.connect(
                 interface.handler_finish_parsing)
             self.signal_parsed.emit(100)
 
+    def parse_and_save_files(self, filenames, processes=1):
+        """
+        Parses and saves each file to the database, yielding
+        (filename, parser, pickle path, exception) as each file is done
+        """
+        if processes is None:
+            processes = os.cpu_count() or 1
+        if processes == 1 or len(filenames) < 2:
+            for filename in filenames:
+                yield (filename, *parse_and_save(filename, self.database_path))
+            return
+
+        # spawn, as forking the (multithreaded) interface is not safe
+        context = multiprocessing.get_context('spawn')
+        with concurrent.futures.ProcessPoolExecutor(processes, mp_context=context) as executor:
+            futures = {executor.submit(parse_and_save_events, filename, self.database_path):
+                       filename for filename in filenames}
+            for future in concurrent.futures.as_completed(futures):
+                try:
+                    music_events, pickle_path, exception = future.result()
+                except Exception as error:
+                    music_events, pickle_path, exception = None, None, str(error)
+
+                parser = None
+                if exception is None:
+                    parser = MusicParser()
+                    parser.music_events = music_events
+                yield futures[future], parser, pickle_path, exception
+
     def retrieve_database(self, folders):
         """
         Retrieves Music from Database
         """
-        folders_in_database_path = [f.path for f in os.scandir(
-            self.database_path) if f.is_dir() and any(folder in f.path for folder in folders)]
+        # or its legacy .pbz2 file, in a database not migrated
+        vocabulary_path = compression.pickle_path(self.vocabulary_path(''))
+        if vocabulary_path is not None:
+            CORPUS_VOCABULARY.from_pickle(vocabulary_path)
+
+        # folders and pieces are found in the catalog of the database
+        catalog = Catalog(self.database_path)
+
+        folders_in_database_path = [
+            os.path.join(self.database_path, name) for name in catalog.folders()
+            if any(folder in os.path.join(self.database_path, name) for folder in folders)]
         for folder in folders_in_database_path:
-            self.recover_parsed_folder(folder)
+            self.recover_parsed_folder(folder, catalog)
+        catalog.close()
 
         if folders_in_database_path:
             for key in list(self.music.keys()):
                 if self.music[key][1] not in folders_in_database_path and self.music[key][2]:
                     self.music.pop(key, None)
 
-    def recover_parsed_folder(self, folder):
+    def evict_missing_sources(self):
+        """
+        Removes from the database the files parsed from source files
+        that are no longer found; returns these source files
+        """
+        manifest = Manifest(self.database_path)
+        missing = manifest.missing()
+        for filename in missing:
+            manifest.evict(filename)
+        manifest.save()
+
+        # (music recovered from the database is known by the name of its piece)
+        catalog = Catalog(self.database_path)
+        names = [piece['name'] for piece in catalog.pieces() if piece['source'] in missing]
+        catalog.remove_sources(missing)
+        catalog.close()
+        for key in list(self.music.keys()):
+            if source_path(key) in missing or (key in names and self.music[key][2]):
+                self.music.pop(key)
+        return missing
+
+    def vocabulary_path(self, extension=compression.PICKLE_EXTENSION):
+        """
+        Returns path of the vocabulary of categorical viewpoints of the database
+        """
+        return os.sep.join([self.database_path, 'vocabulary' + extension])
+
+    def model_path(self, name):
         """
-        Recover Parsed Music in Folder
+        Returns path of a model (of oracles) in the database
+        """
+        return os.sep.join([self.database_path, name + model_store.MODEL_EXTENSION])
+
+    def save_model(self, name):
+        """
+        Saves the oracles (and their features) to a model in the database;
+        returns the path of the model
+        """
+        model_store.save_model(self.model_path(name), self.oracles_information)
+        return self.model_path(name)
+
+    def load_model(self, name):
+        """
+        Loads the oracles (and their features) of a model in the database,
+        to generate sequences from them
+        (or of its pickle, in a database not migrated)
+        """
+        if os.path.isfile(self.model_path(name)):
+            self.oracles_information = model_store.load_model(self.model_path(name))
+            return
+
+        pickle_path = compression.pickle_path(os.sep.join([self.database_path, name]))
+        if pickle_path is None:
+            raise FileNotFoundError('No model {} in {}'.format(name, self.database_path))
+        model = model_store.as_model(compression.load(pickle_path))
+        if model is None:
+            raise ValueError('{} is not a model'.format(pickle_path))
+        self.oracles_information = model
+
+    def recover_parsed_folder(self, folder, catalog=None):
+        """
+        Recover Parsed Music in Folder, as in the catalog of the database
+        (except music already parsed from its source file)
         """
         if os.path.isdir(folder):
-            for root, _, files in os.walk(folder):
-                for filename in files:
-                    name = '.'.join(filename.split('.')[:-1])
-                    if not name in self.music and '.pbz2' in filename:
-                        music_parser = MusicParser()
-                        music_parser.from_pickle(name, root.split(os.sep))
-                        self.music[name] = (music_parser, folder, True)
+            if catalog is None:
+                catalog = Catalog(self.database_path)
+            sources = [source_path(filename) for filename in self.music]
+            for piece in catalog.pieces(folders=[os.path.basename(os.path.normpath(folder))]):
+                if (not piece['name'] in self.music and piece['source'] not in sources and
+                        os.path.isfile(piece['path'])):
+                    self.music[piece['name']] = (load_parsed(piece['path']), folder, True)
 
     def process_music(self):
         """
@@ -267,9 +400,10 @@ class Application(QtCore.QObject):
     def part_segmentation(self, events, interpart_offsets, interpart_events):
         """
         Segmentation for a Part
+        (interpart_offsets is the OffsetIndex of the interpart events)
         """
         if interpart_offsets is not None and self.segmentation_viewpoints['inter-part'] is not None:
-            ev_offsets = [ev.get_offset() for ev in events]
+            ev_offsets = parser_utils.offsets_column(events)
             interpart_start_indexes = [
                 interpart_offsets.index(off) for off in ev_offsets]
             segmentation(events, weights_line=self.segmentation_viewpoints['parts'],
@@ -290,8 +424,11 @@ class Application(QtCore.QObject):
         part_features = self.music_information['parts']['original_features']
         part_features_names = self.music_information['parts']['original_features_names']
 
+        encoder = rep_utils.FeatureEncoder(res_weights, offset=False)
+        encoder.set_feature_names(
+            [key for key in part_features_names if key in res_weights])
         index_of_res_weights = [part_features_names.index(
-            key) for key in res_weights.keys() if key in part_features_names]
+            key) for key in encoder.feature_names]
 
         for music, _tuple in self.music.items():
             parser = _tuple[0]
@@ -299,8 +436,8 @@ class Application(QtCore.QObject):
 
             # If interpart Elements exist, use them to calculate Segmentation
             if parser.get_interpart_events() is not None:
-                interpart_offsets = [ev.get_offset()
-                                    for ev in parser.get_interpart_events()]
+                interpart_offsets = parser_utils.offset_index(
+                    parser.get_interpart_events())
 
             number_part = 0
             for key, events in parser.get_part_events().items():
@@ -310,8 +447,7 @@ class Application(QtCore.QObject):
                         events, interpart_offsets, parser.get_interpart_events())
 
                     # Get Features For Weights
-                    features, _ = rep_utils.create_feat_array(
-                        events, res_weights, False)
+                    features = encoder.transform(events)
                     first_ind = self.indexes_first[music]['parts'][number_part]
                     last_ind = first_ind + len(events)
                     part_features[first_ind:last_ind,
@@ -399,3 +535,45 @@ class Application(QtCore.QObject):
             single_oracle.generate_from_single(self, num_seq)
         else:
             multi_oracle.generate_from_multiple(self, num_seq)
+
+
+def database_name(filename, parser, database_path):
+    """
+    Returns the name and folders (by composer)
+    of a parsed file in the database
+    """
+    folder_name = ['Other']
+    if parser.music.metadata.composer is not None:
+        folder_name = [parser.music.metadata.composer.split(' ')[-1]]
+        folder_name[-1].capitalize()
+    name = os.path.normpath(filename).split(os.path.sep)[-1]
+    name = '.'.join(name.split('.')[:-1])
+    return name, database_path.split(os.path.sep) + folder_name
+
+
+def parse_and_save(filename, database_path):
+    """
+    Parses and saves a file to the database;
+    returns (parser, pickle path, None) or (None, None, exception),
+    so that one bad file does not stop the others
+    """
+    try:
+        parser = MusicParser(filename)
+        if parser.exception != False:
+            return None, None, str(parser.exception)
+        parser.parse()
+        pickle_path = parser.to_store(*database_name(filename, parser, database_path))
+    except Exception as exception:
+        return None, None, str(exception)
+    return parser, pickle_path, None
+
+
+def parse_and_save_events(filename, database_path):
+    """
+    parse_and_save in a worker process: returns the events
+    instead of the parser (its music21 stream is not sent back)
+    """
+    parser, pickle_path, exception = parse_and_save(filename, database_path)
+    if parser is None:
+        return None, None, exception
+    return parser.music_events, pickle_path, None
@@ -8,12 +8,16 @@ import random
 import numpy as np
 
 from application.logic.generation.oracles.factor_oracle import FactorOracle
+from application.logic.representation.events.offset_index import OffsetIndex
 
 
 def sync_generate(oracles, offsets, seq_len=10, p=0.5, k=1):
     """
     Generate synchronized lines from various oracles
     """
+    # offsets of each part, searched by binary search
+    offsets = dict((key, OffsetIndex(part)) for key, part in offsets.items())
+
     len_events_by_part = [(key, len(part)) for key, part in offsets.items()]
     len_events_by_part.sort(key=lambda tup: tup[1], reverse=True)
     principal_key = len_events_by_part[0][0]
@@ -144,10 +148,10 @@ def fill_gaps(key, ks_dict_1, k_2, sequences, ktraces, start_offset, offsets, ma
     """
     Fill Gaps where existent
     """
-    max_of_all_offsets = max(max(offsets.values())) + 1
+    max_of_all_offsets = max(max(offsets.values(), key=list)) + 1
     values = ks_dict_1[key] - k_2
     if max_offset == -1:
-        max_offset = max(max(offsets.values())) + 1
+        max_offset = max(max(offsets.values(), key=list)) + 1
 
     for i in range(values):
         ks = k_2 + i + 1
@@ -321,7 +325,7 @@ def _find_nearest_k(offsets, key, off, minus=True):
     if off == -1:
         return len(offsets[key])
 
-    k = np.argmin(np.abs(np.array(offsets[key])-off))
+    k = offsets[key].nearest(off)
     if offsets[key][k] <= off and minus:
         k += 1
     elif offsets[key][k] > off and not minus:
@@ -0,0 +1,254 @@
+#!/usr/bin/env python3.7
+"""
+This script defines the model store, a file with the oracles and feature
+matrices of a trained model, whose arrays are memory-mapped when loaded
+"""
+import collections
+import json
+import pickle
+import struct
+
+import numpy as np
+
+from application.logic.generation.feature_array import FeatureArray
+from application.logic.generation.oracles.factor_oracle import FactorOracle
+from application.logic.representation.parsers.corpus_store import aligned, map_file, replacing
+
+MODEL_EXTENSION = '.model'
+MODEL_MAGIC = b'ORMODEL1'
+
+# version of the layout of models, checked when loading them
+MODEL_VERSION = 1
+
+# an oracle or a list of feature rows, stored as arrays
+Packed = collections.namedtuple('Packed', ['kind', 'content'])
+
+
+def save_model(file_path, model):
+    """
+    Saves a model (a dict of oracles, features and settings) to a file:
+    a header (JSON, the version and the index of the arrays), the arrays of
+    the oracles (suffix links, lrs, transitions, reverse suffix links and
+    latent states in CSR form, feature arrays) and of the feature matrices,
+    aligned, and a pickle of the rest of the model
+    """
+    arrays = collections.OrderedDict()
+    objects = pickle.dumps(pack(model, arrays, 'model'), protocol=pickle.HIGHEST_PROTOCOL)
+
+    index = {'version': MODEL_VERSION, 'arrays': {}}
+    position = 0
+    for name, array in arrays.items():
+        position = aligned(position)
+        index['arrays'][name] = {'dtype': array.dtype.str, 'shape': array.shape,
+                                 'offset': position}
+        position += array.nbytes
+    position = aligned(position)
+    index['objects'] = {'offset': position, 'size': len(objects)}
+
+    header = json.dumps(index).encode('utf-8')
+    start = aligned(len(MODEL_MAGIC) + 8 + len(header))
+    with replacing(file_path) as handle:
+        handle.write(MODEL_MAGIC + struct.pack('<Q', len(header)) + header)
+        for name, array in arrays.items():
+            handle.seek(start + index['arrays'][name]['offset'])
+            handle.write(np.ascontiguousarray(array).tobytes())
+        handle.seek(start + index['objects']['offset'])
+        handle.write(objects)
+
+
+def load_model(file_path):
+    """
+    Loads a model from a file; its feature arrays and matrices are
+    copy-on-write maps of the file (only read when used), as the
+    columns of the corpus store
+    """
+    with open(file_path, 'rb') as handle:
+        if handle.read(len(MODEL_MAGIC)) != MODEL_MAGIC:
+            raise ValueError('{} is not a model file'.format(file_path))
+        size = struct.unpack('<Q', handle.read(8))[0]
+        index = json.loads(handle.read(size).decode('utf-8'))
+        if index['version'] != MODEL_VERSION:
+            raise ValueError('{} has version {} of models (not {})'.format(
+                file_path, index['version'], MODEL_VERSION))
+    buffer = map_file(file_path)
+
+    start = aligned(len(MODEL_MAGIC) + 8 + size)
+    arrays = {}
+    for name, entry in index['arrays'].items():
+        dtype, shape = np.dtype(entry['dtype']), tuple(entry['shape'])
+        if int(np.prod(shape)) == 0:
+            arrays[name] = np.empty(shape, dtype=dtype)
+        else:
+            arrays[name] = np.frombuffer(buffer, dtype=dtype, count=int(np.prod(shape)),
+                                         offset=start + entry['offset']).reshape(shape)
+
+    objects = index['objects']
+    packed = pickle.loads(buffer[start + objects['offset']:
+                                 start + objects['offset'] + objects['size']])
+    return unpack(packed, arrays)
+
+
+def as_model(obj):
+    """
+    Returns a model from an unpickled object: a model, or the information
+    of a single oracle or multiple oracles (as legacy pickles of models
+    have), or None if it is not a model
+    """
+    if not isinstance(obj, dict):
+        return None
+    if obj and set(obj) <= {'single_oracle', 'multiple_oracles'}:
+        return {'single_oracle': {}, 'multiple_oracles': {}, **obj}
+    if isinstance(obj.get('oracle'), FactorOracle):
+        return {'single_oracle': obj, 'multiple_oracles': {}}
+    if isinstance(obj.get('oracles'), dict) and obj['oracles'] and all(
+            isinstance(oracle, FactorOracle) for oracle in obj['oracles'].values()):
+        return {'single_oracle': {}, 'multiple_oracles': obj}
+    return None
+
+
+def pack(value, arrays, name):
+    """
+    Returns a value of a model with its oracles and lists of feature
+    rows packed (their arrays added to arrays, by name)
+    """
+    if isinstance(value, FactorOracle):
+        return Packed('oracle', pack_oracle(value, arrays, name))
+    if isinstance(value, dict):
+        return type(value)((key, pack(item, arrays, '{}.{}'.format(name, key)))
+                           for key, item in value.items())
+    if is_feature_rows(value):
+        arrays[name] = np.array(value, dtype=np.float64)
+        return Packed('rows', (name, type(value[0]).__name__))
+    return value
+
+
+def unpack(value, arrays):
+    """
+    Returns a value of a model with its oracles and lists of feature rows
+    unpacked (lists of arrays are views of the rows of a matrix)
+    """
+    if isinstance(value, Packed):
+        if value.kind == 'oracle':
+            return unpack_oracle(value.content, arrays)
+        name, row_type = value.content
+        if row_type == 'list':
+            return arrays[name].tolist()
+        return list(arrays[name])
+    if isinstance(value, dict):
+        return type(value)((key, unpack(item, arrays)) for key, item in value.items())
+    return value
+
+
+def is_feature_rows(value):
+    """
+    Returns if a value is a list of (numeric) feature rows of the same length
+    """
+    if not isinstance(value, list) or not value:
+        return False
+    if not all(isinstance(row, (list, np.ndarray)) for row in value):
+        return False
+    if len(set(type(row) for row in value)) != 1 or len(set(len(row) for row in value)) != 1:
+        return False
+    try:
+        np.array(value, dtype=np.float64)
+    except (TypeError, ValueError):
+        return False
+    return True
+
+
+def pack_oracle(oracle, arrays, name):
+    """
+    Returns the state of an oracle, with its links and
+    feature array added to arrays (by name)
+    """
+    basic = oracle.basic_attributes
+    arrays[name + '.sfx'] = links_array(basic['sfx'])
+    arrays[name + '.lrs'] = np.array(basic['lrs'], dtype=np.int64)
+    for links in ('trn', 'rsfx'):
+        arrays[name + '.' + links + '.indptr'], arrays[name + '.' + links + '.indices'] = \
+            csr_arrays(basic[links])
+
+    state = {key: item for key, item in vars(oracle).items()
+             if key not in ('basic_attributes', 'f_array', 'latent')}
+    state['basic_attributes'] = {key: item for key, item in basic.items()
+                                 if key not in ('sfx', 'lrs', 'trn', 'rsfx')}
+    # data are the latent states of a VMO (or symbols of other oracles)
+    if all(symbol is None or isinstance(symbol, (int, np.integer)) for symbol in basic['data']):
+        arrays[name + '.data'] = links_array(basic['data'])
+        del state['basic_attributes']['data']
+
+    if hasattr(oracle, 'latent'):
+        arrays[name + '.latent.indptr'], arrays[name + '.latent.indices'] = \
+            csr_arrays(oracle.latent)
+    if hasattr(oracle, 'f_array'):
+        arrays[name + '.f_array'] = oracle.f_array.data
+        state['f_array'] = {key: item for key, item in vars(oracle.f_array).items()
+                            if key != 'data'}
+    return {'class': type(oracle), 'name': name, 'state': state,
+            'attributes': list(vars(oracle))}
+
+
+def unpack_oracle(packed, arrays):
+    """
+    Returns an oracle from its state and arrays
+    """
+    name, state = packed['name'], dict(packed['state'])
+    oracle = packed['class'].__new__(packed['class'])
+
+    basic = dict(state.pop('basic_attributes'))
+    basic['sfx'] = links_list(arrays[name + '.sfx'])
+    basic['lrs'] = arrays[name + '.lrs'].tolist()
+    for links in ('trn', 'rsfx'):
+        basic[links] = csr_lists(arrays[name + '.' + links + '.indptr'],
+                                 arrays[name + '.' + links + '.indices'])
+    if name + '.data' in arrays:
+        basic['data'] = links_list(arrays[name + '.data'])
+    state['basic_attributes'] = {key: basic[key] for key in ('sfx', 'trn', 'rsfx', 'lrs', 'data')}
+
+    if name + '.latent.indptr' in arrays:
+        state['latent'] = csr_lists(arrays[name + '.latent.indptr'],
+                                    arrays[name + '.latent.indices'])
+    if 'f_array' in state:
+        f_array = FeatureArray.__new__(FeatureArray)
+        vars(f_array).update(state['f_array'])
+        f_array.data = arrays[name + '.f_array']
+        state['f_array'] = f_array
+
+    # (in the order of the attributes of the oracle saved)
+    for attribute in packed['attributes']:
+        setattr(oracle, attribute, state[attribute])
+    return oracle
+
+
+def links_array(links):
+    """
+    Returns an array of links (states, with None as -1)
+    """
+    return np.array([-1 if link is None else link for link in links], dtype=np.int64)
+
+
+def links_list(array):
+    """
+    Returns the list of links of an array (with -1 as None)
+    """
+    return [None if link < 0 else link for link in array.tolist()]
+
+
+def csr_arrays(lists):
+    """
+    Returns the CSR form (indptr and indices) of a list of lists of states
+    """
+    indptr = np.zeros(len(lists) + 1, dtype=np.int64)
+    np.cumsum([len(states) for states in lists], out=indptr[1:])
+    indices = np.fromiter((state for states in lists for state in states),
+                          dtype=np.int64, count=int(indptr[-1]))
+    return indptr, indices
+
+
+def csr_lists(indptr, indices):
+    """
+    Returns the list of lists of states of a CSR form
+    """
+    indices = indices.tolist()
+    bounds = indptr.tolist()
+    return [indices[begin:end] for begin, end in zip(bounds[:-1], bounds[1:])]
@@ -15,6 +15,7 @@ from application.logic.generation.cdist_fixed import distance_between_windowed_f
 from application.logic.representation.conversor.score_conversor import parse_multiple
 from application.logic.representation.events.linear_event import PartEvent
 from application.logic.representation.parsers.utils import get_last_x_events_that_are_notes_before_index
+from application.logic.representation.utils.features import FeatureDecoder
 
 
 def get_multiple_part_features(application, part_info, vert_info):
@@ -208,11 +209,12 @@ def multi_sequence_score_generator(sequences, feature_names, application, name='
     sequenced_events = {}
     for key, sequence in sequences.items():
         if key != 'inter-part':
-            sequenced_events[key] = [PartEvent(
-                from_list=state, features=feature_names)
-                if not isinstance(state, str)
-                else state
-                for state in sequence]
+            decoded = iter(FeatureDecoder.compiled(PartEvent, feature_names).decode(
+                [state for state in sequence if not isinstance(state, str)]))
+            sequenced_events[key] = [next(decoded)
+                                     if not isinstance(state, str)
+                                     else state
+                                     for state in sequence]
 
             start_pitches[key] = application.principal_music[0].get_part_events()[
                 key][0].get_viewpoint('pitch')
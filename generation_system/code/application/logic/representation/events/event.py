@@ -5,17 +5,28 @@ This script presents the class Event that represents an event in a piece of musi
 
 import fractions
 import  application.logic.representation.events.utils as utils
+from application.logic.representation.events.viewpoint_schema import ViewpointSchema
 
 
 class Event:
     """
     Class Event
+
+    Viewpoints are kept in a fixed list of slots, laid out by
+    the SCHEMA of the class of the event.
+
+    Events are compared by their viewpoints; only frozen events
+    (see freeze), whose viewpoints can not change, can be hashed
     """
 
+    SCHEMA = ViewpointSchema({})
+
+    __slots__ = ('offset_time', '_values')
+
     def __init__(self, offset=None, from_dict=None, from_list=None, features=None):
         # pylint: disable=unused-argument
         self.offset_time = offset
-        self.viewpoints = {}
+        self._values = self.SCHEMA.new_values()
 
     def _init_from_list_or_dict(self, offset=None, from_dict=None, from_list=None, features=None):
         # pylint: disable=unused-argument
@@ -24,38 +35,56 @@ class Event:
         elif (from_list is not None) and (features is not None):
             self.from_feature_list(from_list, features)
 
+    @property
+    def viewpoints(self):
+        """
+        Returns the viewpoints of event as a nested dict
+        """
+        return self.SCHEMA.to_nested(self._values)
+
     def add_viewpoint(self, name, info, category=None):
         """
         Adds a viewpoint to event
         """
-        new_name = name
-        if '.' not in name and category is not None:
-            new_name = category + '.' + name
-
-        viewpoints_flat = utils.flatten_dict(self.viewpoints, sep='.')
-        views = [v for v in viewpoints_flat if new_name in v]
-
-        if views != []:
-            path = views[0].split('.')
-            view_cat = self.viewpoints
-            for key in path[:-1]:
-                view_cat = view_cat[key]
-            utils.add_viewpoint(view_cat, path[-1], info)
+        slot = self.SCHEMA.resolve(name, category)
+        if slot is not None:
+            utils.add_viewpoint(self._values, slot, info)
 
     def get_viewpoint(self, name, category=None):
         """
         Returns a viewpoint of event
         """
-        new_name = name
-        if '.' not in name and category is not None:
-            new_name = category + '.' + name
-
-        viewpoints_flat = utils.flatten_dict(self.viewpoints, sep='.')
-        views = [v for v in viewpoints_flat if new_name in v]
-        if views != []:
-            return viewpoints_flat[views[0]]
+        slot = self.SCHEMA.resolve(name, category)
+        if slot is not None:
+            return self._values[slot]
         return None
 
+    def fingerprint(self):
+        """
+        Returns a stable hash of the viewpoints of event (not of its offset),
+        computed once until a viewpoint changes
+        """
+        return self._values.fingerprint()
+
+    def freeze(self):
+        """
+        Returns a frozen copy of event (or event, if frozen): its viewpoints
+        can not be changed (nor the row of a table, if event is a view of
+        one, changes them), so it can be hashed, in sets and dicts
+        """
+        if self.is_frozen():
+            return self
+        event = type(self).__new__(type(self))
+        event.offset_time = self.offset_time
+        event._values = self.SCHEMA.frozen_values(self._values)
+        return event
+
+    def is_frozen(self):
+        """
+        Returns if the viewpoints of event can not be changed
+        """
+        return getattr(self._values, 'frozen', False)
+
     def get_offset(self):
         """
         Returns offset value of event
@@ -73,6 +102,7 @@ class Event:
         Defines an equal function for Event with weighted attributes
         Return a float in interval [0, 1] in which 0 means that the
         two events are totally non-equal and 1, totally equal.
+        (features.weighted_similarity compares blocks of events at once)
         """
         if weights is None:
             return float(self == other)
@@ -89,7 +119,7 @@ class Event:
         Transforms event in a list of features
         """
         if features is None:
-            features = list(self.viewpoints)
+            features = list(self.SCHEMA.categories)
 
         features_list = [self.get_viewpoint(feat) for feat in features]
 
@@ -111,18 +141,17 @@ class Event:
         """
         Transforms event in a dict of features
         """
-        viewpoints_flat = utils.flatten_dict(self.viewpoints, sep='.')
         if features is None:
-            features = viewpoints_flat.keys()
+            features = self.SCHEMA.paths
 
         features_dict = {}
         if offset:
             features_dict['offset'] = self.offset_time
 
         for feat in features:
-            views = [v for v in viewpoints_flat if feat in v]
-            if views != []:
-                features_dict[feat] = viewpoints_flat[views[0]]
+            slot = self.SCHEMA.resolve(feat)
+            if slot is not None:
+                features_dict[feat] = self._values[slot]
         return features_dict
 
     def from_feature_dict(self, from_dict, features):
@@ -138,24 +167,38 @@ class Event:
             else:
                 self.add_viewpoint(feat, from_dict[feat])
 
+    def __getstate__(self):
+        """
+        Pickles event with its viewpoints as a nested dict
+        (and if it is frozen)
+        """
+        state = {'offset_time': self.offset_time, 'viewpoints': self.viewpoints}
+        if self.is_frozen():
+            state['frozen'] = True
+        return state
+
+    def __setstate__(self, state):
+        """
+        Unpickles event from its viewpoints as a nested dict
+        """
+        self.offset_time = state['offset_time']
+        self._values = self.SCHEMA.from_nested(state['viewpoints'])
+        self._values.frozen = state.get('frozen', False)
+
     def __str__(self):
         """
         Overrides str function for Event
         """
         to_return = 'Event at offset {}: \n'.format(self.offset_time)
-        viewpoints = ['.'.join(path.split('.')[-2:])
-                      for path in utils.flatten_dict(self.viewpoints, sep='.')]
-
-        to_return += ''.join([str(key) + ': ' + str(self.get_viewpoint(key)) + '; '
-                              for key in viewpoints])
+        to_return += ''.join([str(key) + ': ' + str(self._values[slot]) + '; '
+                              for key, slot in zip(self.SCHEMA.short_names,
+                                                   self.SCHEMA.short_slots)])
         return to_return
 
     def __iter__(self):
-        viewpoints = ['.'.join(path.split('.')[-2:])
-                      for path in utils.flatten_dict(self.viewpoints, sep='.')]
         yield('offset', self.offset_time)
-        for key in viewpoints:
-            view = self.get_viewpoint(key)
+        for key, slot in zip(self.SCHEMA.short_names, self.SCHEMA.short_slots):
+            view = self._values[slot]
             if isinstance(view, fractions.Fraction):
                 yield(key, str(view))
             else:
@@ -163,16 +206,23 @@ class Event:
 
     def __eq__(self, other):
         """
-        Overrides equal function for Event
+        Overrides equal function for Event:
+        events are equal if they have the same viewpoints
+        (at any offset), by their fingerprints
+        """
+        if not isinstance(other, Event):
+            return NotImplemented
+        return self.fingerprint() == other.fingerprint()
+
+    def __hash__(self):
+        """
+        Hash of a frozen event, by its fingerprint (events that are
+        not frozen could change it, and so are not hashable)
         """
-        viewpoints = ['.'.join(path.split('.')[-2:])
-                      for path in utils.flatten_dict(self.viewpoints, sep='.')]
-        for viewpoint in viewpoints:
-            self_view = self.get_viewpoint(viewpoint)
-            other_view = other.get_viewpoint(viewpoint)
-            if other_view is None or self_view != other_view:
-                return False
-        return True
+        if not self.is_frozen():
+            raise TypeError('unhashable {}: only frozen events (see freeze) '
+                            'are hashable'.format(type(self).__name__))
+        return hash(self.fingerprint())
 
     def __ne__(self, other):
         """
@@ -0,0 +1,425 @@
+#!/usr/bin/env python3.7
+"""
+This script presents the class EventTable that stores a sequence
+of events column by column, one NumPy column per viewpoint
+"""
+import collections.abc
+import numbers
+
+import numpy as np
+
+from application.logic.representation.events.offset_index import OffsetIndex
+from application.logic.representation.events.vocabulary import CORPUS_VOCABULARY, NONE_CODE
+
+DTYPES = {
+    'bool': np.bool_,
+    'int': np.float64,
+    'float': np.float64,
+    'category': np.int32,
+    'object': object,
+}
+
+# kinds of the columns of numbers (floats, with NaN for None)
+NUMERIC_KINDS = ('int', 'float')
+
+# ints kept exactly by a float column (bigger ones go to object columns)
+MAX_EXACT_INT = 2 ** 53
+
+
+class EventRow:
+    """
+    Slot values of a row of an EventTable, as seen by an event
+    """
+
+    __slots__ = ('table', 'row')
+
+    def __init__(self, table, row):
+        self.table = table
+        self.row = row
+
+    def __getitem__(self, slot):
+        return self.table.get_value(self.row, slot)
+
+    def __setitem__(self, slot, value):
+        self.table.set_value(self.row, slot, value)
+
+    def fingerprint(self):
+        """
+        Returns the fingerprint of the values of the row
+        """
+        return self.table.fingerprint(self.row)
+
+
+class EventTable(collections.abc.Sequence):
+    """
+    A class used to store the events of a part (or the inter-part events)
+    as columns, instead of as a list of events with their own viewpoints.
+
+    Boolean viewpoints are kept in bool columns, numeric ones in float
+    columns (with NaN for None, and a mask of the rows whose value is
+    an int, so that values are read as they were set), strings in
+    category columns (codes of the corpus vocabulary) and lists and
+    music21 objects in object columns. A bool/numeric/category column
+    that receives any other value (as a Fraction, for a numeric column)
+    is converted to an object column. Indexing the table returns events
+    of event_class that are views of a row: reading and writing their
+    viewpoints reads and writes the table. Rows not yet written hold the
+    defaults of the schema, which (as for single events) are shared.
+
+    Attributes
+    ----------
+    event_class: class
+        class of the events in the table (PartEvent, InterPartEvent)
+    schema: ViewpointSchema
+        schema of event_class
+    offsets: numpy array
+        offsets of the events
+    columns: list of numpy arrays
+        one column per slot of schema
+    integral: list of numpy arrays
+        for each numeric column, if the value of each row is an int
+        (None for the other columns)
+    kinds: list of str
+        actual kind of storage of each column
+    vocabulary: Vocabulary
+        codes of the values of category columns
+    """
+
+    def __init__(self, event_class, events=None, capacity=16):
+        self.event_class = event_class
+        self.schema = event_class.SCHEMA
+        self.kinds = list(self.schema.kinds)
+        self.vocabulary = CORPUS_VOCABULARY
+        self._fingerprints = {}
+        self._offset_index = None
+
+        self._length = 0
+        self.offsets = np.empty(capacity, dtype=object)
+        self.columns = [self._default_column(slot, kind, capacity)
+                        for slot, kind in enumerate(self.kinds)]
+        self.integral = [self._default_integral(slot, kind, capacity)
+                         for slot, kind in enumerate(self.kinds)]
+
+        if events is not None:
+            self.extend(events)
+
+    def __len__(self):
+        return self._length
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self.event_at(i) for i in range(*index.indices(self._length))]
+
+        if index < 0:
+            index += self._length
+        if not 0 <= index < self._length:
+            raise IndexError('EventTable index out of range')
+        return self.event_at(index)
+
+    def event_at(self, row):
+        """
+        Returns an event that is a view of a row
+        """
+        event = self.event_class.__new__(self.event_class)
+        event.offset_time = self.offsets[row]
+        event._values = EventRow(self, row)
+        return event
+
+    def append(self, event):
+        """
+        Appends (a copy of) an event to the table
+        """
+        if self._length == len(self.offsets):
+            self._grow(max(16, 2 * self._length))
+
+        row = self._length
+        self._length += 1
+        self.offsets[row] = event.get_offset()
+
+        # only the slots set in a single event differ from the defaults
+        slots = range(len(self.columns))
+        if isinstance(event._values, dict):
+            slots = list(event._values)
+        for slot in slots:
+            self.set_value(row, slot, event._values[slot])
+
+    def extend(self, events):
+        """
+        Appends (copies of) a sequence of events to the table
+        """
+        for event in events:
+            self.append(event)
+
+    def add_rows(self, number):
+        """
+        Appends number events with the default viewpoints (and no offset)
+        """
+        if self._length + number > len(self.offsets):
+            self._grow(max(16, 2 * (self._length + number)))
+        self._length += number
+
+    def offset_index(self):
+        """
+        Returns the OffsetIndex of the events
+        (extended with the offsets of the rows added since)
+        """
+        if self._offset_index is None or len(self._offset_index) > self._length:
+            self._offset_index = OffsetIndex()
+        self._offset_index.extend(self.offsets[len(self._offset_index):self._length])
+        return self._offset_index
+
+    def get_value(self, row, slot):
+        """
+        Returns the value of a slot in a row
+        """
+        value = self.columns[slot][row]
+        kind = self.kinds[slot]
+        if kind == 'object':
+            return value
+        if kind == 'category':
+            return self.vocabulary.decode(self.schema.paths[slot], value)
+        if kind == 'bool':
+            return bool(value)
+        if value != value:
+            return None
+        if self.integral[slot][row]:
+            return int(value)
+        return float(value)
+
+    def set_value(self, row, slot, value):
+        """
+        Sets the value of a slot in a row
+        """
+        self._fingerprints.pop(row, None)
+        kind = self.kinds[slot]
+        if kind == 'bool' and not isinstance(value, (bool, np.bool_)):
+            self._to_object(slot)
+        elif kind == 'category':
+            if value is None or isinstance(value, str):
+                value = self.vocabulary.encode(self.schema.paths[slot], value)
+            else:
+                self._to_object(slot)
+        elif kind in NUMERIC_KINDS:
+            integral = is_exact_int(value)
+            if value is None:
+                value = np.nan
+            elif not integral and (isinstance(value, (bool, np.bool_))
+                                   or not isinstance(value, float)):
+                # (fractions, as of tuplets, and big ints are kept exact)
+                self._to_object(slot)
+            if self.kinds[slot] in NUMERIC_KINDS:
+                self.integral[slot][row] = integral
+        self.columns[slot][row] = value
+
+    def set_values(self, slot, rows, values=None):
+        """
+        Sets the values of a slot in some rows (None if values is None);
+        a numpy array that fits the column is written at once
+        """
+        self._fingerprints.clear()
+        kind = self.kinds[slot]
+        if values is None:
+            if kind in NUMERIC_KINDS:
+                self.columns[slot][rows] = np.nan
+                self.integral[slot][rows] = False
+                return
+            if kind == 'category':
+                self.columns[slot][rows] = NONE_CODE
+                return
+            values = [None] * len(rows)
+        elif isinstance(values, np.ndarray) and kind == 'bool' and values.dtype == np.bool_:
+            self.columns[slot][rows] = values
+            return
+        elif isinstance(values, np.ndarray) and kind in NUMERIC_KINDS and (
+                values.dtype.kind == 'f' or (values.dtype.kind in 'iu' and (
+                    len(values) == 0 or np.abs(values).max() <= MAX_EXACT_INT))):
+            self.columns[slot][rows] = values
+            self.integral[slot][rows] = values.dtype.kind in 'iu'
+            return
+
+        for row, value in zip(rows, values):
+            self.set_value(row, slot, value)
+
+    def fingerprint(self, row):
+        """
+        Returns the (cached) fingerprint of the values of a row
+        """
+        fingerprint = self._fingerprints.get(row)
+        if fingerprint is None:
+            fingerprint = self.schema.fingerprint(EventRow(self, row))
+            self._fingerprints[row] = fingerprint
+        return fingerprint
+
+    def column(self, name):
+        """
+        Returns a view of the column of a viewpoint
+        (the codes of its values, for a category column)
+        """
+        slot = self.schema.resolve(name)
+        if slot is None:
+            raise KeyError(name)
+        return self.columns[slot][:self._length]
+
+    def values(self, name):
+        """
+        Returns the values of a viewpoint for all events
+        (as get_viewpoint gives them), decoded column-wise
+        """
+        slot = self.schema.resolve(name)
+        if slot is None:
+            raise KeyError(name)
+        kind = self.kinds[slot]
+        column = self.columns[slot][:self._length]
+
+        if kind in ('bool', 'object'):
+            return column.tolist()
+        if kind == 'category':
+            values = np.array(self.vocabulary.values[self.schema.paths[slot]] + [None],
+                              dtype=object)
+            return values[column].tolist()
+
+        values = column.astype(object)
+        integral = self.integral[slot][:self._length] & ~np.isnan(column)
+        values[integral] = column[integral].astype(np.int64).tolist()
+        values[np.isnan(column)] = None
+        return values.tolist()
+
+    def set_column(self, name, values, rows=None):
+        """
+        Sets the values of a viewpoint for all events (or the events in rows)
+        """
+        slot = self.schema.resolve(name)
+        if slot is None:
+            raise KeyError(name)
+        if rows is None:
+            rows = np.arange(len(values))
+        self.set_values(slot, rows, values)
+
+    def _default_column(self, slot, kind, capacity):
+        """
+        Returns a new column of a kind filled with the default of a slot
+        """
+        column = np.empty(capacity, dtype=DTYPES[kind])
+        default = self.schema.defaults[slot]
+        if kind == 'category':
+            default = self.vocabulary.encode(self.schema.paths[slot], default)
+        elif default is None and kind != 'object':
+            default = np.nan
+        column.fill(default)
+        return column
+
+    def _default_integral(self, slot, kind, capacity):
+        """
+        Returns a new mask of the int values of a column of a kind, filled
+        as the default of a slot (None, if the column is not numeric)
+        """
+        if kind not in NUMERIC_KINDS:
+            return None
+        return np.full(capacity, is_exact_int(self.schema.defaults[slot]), dtype=np.bool_)
+
+    def _grow(self, capacity):
+        """
+        Reallocates the columns to a bigger capacity
+        """
+        offsets = np.empty(capacity, dtype=object)
+        offsets[:self._length] = self.offsets[:self._length]
+        self.offsets = offsets
+
+        for slot, column in enumerate(self.columns):
+            new_column = self._default_column(slot, self.kinds[slot], capacity)
+            new_column[:self._length] = column[:self._length]
+            self.columns[slot] = new_column
+
+            if self.integral[slot] is not None:
+                integral = self._default_integral(slot, self.kinds[slot], capacity)
+                integral[:self._length] = self.integral[slot][:self._length]
+                self.integral[slot] = integral
+
+    def _to_object(self, slot):
+        """
+        Converts a column to an object column
+        """
+        new_column = self._default_column(slot, 'object', len(self.offsets))
+        new_column[:self._length] = [self.get_value(row, slot)
+                                     for row in range(self._length)]
+        self.columns[slot] = new_column
+        self.integral[slot] = None
+        self.kinds[slot] = 'object'
+
+    def __getstate__(self):
+        """
+        Pickles table with its columns by viewpoint path (and the values
+        of the codes of category columns, and the int masks of numeric ones)
+        """
+        return {
+            'event_class': self.event_class,
+            'offsets': self.offsets[:self._length],
+            'columns': dict((path, column[:self._length]) for path, column in
+                            zip(self.schema.paths, self.columns)),
+            'integral': dict((path, integral[:self._length]) for path, integral in
+                             zip(self.schema.paths, self.integral) if integral is not None),
+            'kinds': dict(zip(self.schema.paths, self.kinds)),
+            'vocabulary': dict((path, list(self.vocabulary.values[path]))
+                               for path, kind in zip(self.schema.paths, self.kinds)
+                               if kind == 'category'),
+        }
+
+    def __setstate__(self, state):
+        """
+        Unpickles table from its columns by viewpoint path,
+        with the default values for missing viewpoints;
+        codes of category columns are recoded in the corpus vocabulary
+        (only the columns of missing viewpoints are allocated); in tables
+        pickled with no int masks, integral values of int columns are ints
+        """
+        self.event_class = state['event_class']
+        self.schema = self.event_class.SCHEMA
+        self.kinds = list(self.schema.kinds)
+        self.vocabulary = CORPUS_VOCABULARY
+        self._fingerprints = {}
+        self._offset_index = None
+
+        self._length = len(state['offsets'])
+        self.offsets = np.array(state['offsets'], dtype=object)
+        self.columns = []
+        self.integral = []
+        for slot, path in enumerate(self.schema.paths):
+            if path not in state['columns']:
+                self.columns.append(self._default_column(slot, self.kinds[slot], self._length))
+                self.integral.append(
+                    self._default_integral(slot, self.kinds[slot], self._length))
+                continue
+            column = state['columns'][path]
+            kind = state['kinds'][path]
+            if kind == 'category':
+                column = self.vocabulary.remap(
+                    path, column, state['vocabulary'][path]).astype(np.int32, copy=False)
+            self.columns.append(column)
+            self.kinds[slot] = kind
+
+            integral = None
+            if kind in NUMERIC_KINDS:
+                integral = state.get('integral', {}).get(path)
+                if integral is None:
+                    integral = (column == np.floor(column)) if kind == 'int' else \
+                        np.zeros(len(column), dtype=np.bool_)
+            self.integral.append(integral)
+
+    @classmethod
+    def from_state(cls, state):
+        """
+        Returns a table from its state (as pickled), keeping its
+        columns (not copies), unless codes of category columns
+        must be recoded in the corpus vocabulary
+        """
+        table = cls.__new__(cls)
+        table.__setstate__(state)
+        return table
+
+
+def is_exact_int(value):
+    """
+    Returns if a value is an int (not a bool) that a float column keeps exactly
+    """
+    return (isinstance(value, numbers.Integral) and not isinstance(value, (bool, np.bool_))
+            and abs(value) <= MAX_EXACT_INT)
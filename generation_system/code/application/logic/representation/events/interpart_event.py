@@ -7,6 +7,8 @@ from fractions import Fraction
 
 import application.logic.representation.events.utils as utils
 from application.logic.representation.events.event import Event
+from application.logic.representation.events.viewpoint_schema import ViewpointSchema
+from application.logic.representation.utils.features import FeatureDecoder
 
 ARRAY_VALUES = ['pitches',
                 'pitchClass', 'primeForm', 'pcOrdered']
@@ -24,135 +26,148 @@ BOOL_VALUES = ['is_consonant', 'is_major_triad',
                'is_diminished_seventh',
                'is_dominant_seventh']
 
+DEFAULT_VIEWPOINTS = {
+    'metadata': {
+        'composer': '',
+        'piece_title': '',
+    },
+    'duration': {
+        'length': 1,
+        'type': 'quarter',
+        'dots': 0,
+        'tie': {
+            'type': 'no tie',
+            'style': 'normal',
+        },
+    },
+    'basic': {
+        'root': '',
+        'pitches': [],
+        'cardinality': 0,
+        'inversion': '',
+        'primeForm': '',
+        'quality': '',
+    },
+    'classes': {
+        'pcOrdered': '',
+        'pc_cardinality': 0,
+        'pitchClass': '',
+        'forte_class': '',
+        'forte_class_number': 0,
+    },
+    'quality': {
+        'is_consonant': False,
+        'is_major_triad': False,
+        'is_incomplete_major_triad': False,
+        'is_minor_triad': False,
+        'is_incomplete_minor_triad': False,
+        'is_augmented_sixth': False,
+        'is_french_augmented_sixth': False,
+        'is_german_augmented_sixth': False,
+        'is_italian_augmented_sixth': False,
+        'is_swiss_augmented_sixth': False,
+        'is_augmented_triad': False,
+        'is_half_diminished_seventh': False,
+        'is_diminished_seventh': False,
+        'is_dominant_seventh': False,
+    },
+    'key': {
+        'keysig': 0,
+        'signatures': {
+            'key': 'C major',
+            'certainty': 0,
+            'function': 'I',
+        },
+        'measure': {
+            'key': 'C major',
+            'certainty': 0,
+            'function': 'I',
+        },
+    },
+}
+
 
 class InterPartEvent(Event):
     """
     Class InterPartEvent
     """
 
+    SCHEMA = ViewpointSchema(DEFAULT_VIEWPOINTS)
+
+    __slots__ = ()
+
     def __init__(self, offset=None, from_dict=None, from_list=None, features=None):
         super().__init__(offset, from_dict, from_list, features)
-
-        default = {
-            'metadata': {
-                'composer': '',
-                'piece_title': '',
-            },
-            'duration': {
-                'length': 1,
-                'type': 'quarter',
-                'dots': 0,
-                'tie': {
-                    'type': 'no tie',
-                    'style': 'normal',
-                },
-            },
-            'basic': {
-                'root': '',
-                'pitches': [],
-                'cardinality': 0,
-                'inversion': '',
-                'primeForm': '',
-                'quality': '',
-            },
-            'classes': {
-                'pcOrdered': '',
-                'pc_cardinality': 0,
-                'pitchClass': '',
-                'forte_class': '',
-                'forte_class_number': 0,
-            },
-            'quality': {
-                'is_consonant': False,
-                'is_major_triad': False,
-                'is_incomplete_major_triad': False,
-                'is_minor_triad': False,
-                'is_incomplete_minor_triad': False,
-                'is_augmented_sixth': False,
-                'is_french_augmented_sixth': False,
-                'is_german_augmented_sixth': False,
-                'is_italian_augmented_sixth': False,
-                'is_swiss_augmented_sixth': False,
-                'is_augmented_triad': False,
-                'is_half_diminished_seventh': False,
-                'is_diminished_seventh': False,
-                'is_dominant_seventh': False,
-            },
-            'key': {
-                'keysig': 0,
-                'signatures': {
-                    'key': 'C major',
-                    'certainty': 0,
-                    'function': 'I',
-                },
-                'measure': {
-                    'key': 'C major',
-                    'certainty': 0,
-                    'function': 'I',
-                },
-            },
-        }
-
-        self.viewpoints = dict(list(default.items()) +
-                               list(self.viewpoints.items()))
         self._init_from_list_or_dict(offset, from_dict, from_list, features)
 
     def from_feature_list(self, from_list, features, nan_value=10000):
         """
         Transforms list of features in an event
         """
-        for i, feat in enumerate(features):
-            category = None
-            if '.' in feat:
-                if feat.split('.')[-1].isdigit():
-                    category = ".".join(feat.split('.')[0:-2])
-                    feat = ".".join(feat.split('.')[-2:])
-                else:
-                    category = ".".join(feat.split('.')[0:-1])
-                    feat = feat.split('.')[-1]
-
-            if feat == 'offset':
-                self.offset_time = from_list[i]
-            elif from_list[i] == nan_value:
-                self.add_viewpoint(feat, None, category)
-            elif feat in BOOL_VALUES:
-                self.add_viewpoint(feat, bool(from_list[i]), category)
-            elif any(val in feat for val in ARRAY_VALUES) and from_list[i] == 1.0:
-                self.add_viewpoint(feat.split(
-                    '_')[0], feat.split('_')[1:], category)
-            elif '=' in feat and from_list[i] == 1.0:
-                info = feat.split('=')
-                self.add_viewpoint(info[0], info[1], category)
+        FeatureDecoder.compiled(type(self), features, nan_value).decode_event(
+            self, from_list)
+
+    @classmethod
+    def compile_feature(cls, feat):
+        """
+        Compiles how a feature of a list of features is set in an event,
+        as (kind, slot, raw_slot, info) (see PartEvent.compile_feature)
+        """
+        category = None
+        if '.' in feat:
+            if feat.split('.')[-1].isdigit():
+                category = ".".join(feat.split('.')[0:-2])
+                feat = ".".join(feat.split('.')[-2:])
             else:
-                self.add_viewpoint(feat, from_list[i], category)
+                category = ".".join(feat.split('.')[0:-1])
+                feat = feat.split('.')[-1]
+
+        raw_slot = cls.SCHEMA.resolve(feat, category)
+        if feat == 'offset':
+            return ('offset', None, None, None)
+        if feat in BOOL_VALUES:
+            return ('bool', None, raw_slot, None)
+        if any(val in feat for val in ARRAY_VALUES):
+            return ('array', cls.SCHEMA.resolve(feat.split('_')[0], category),
+                    raw_slot, feat.split('_')[1:])
+        if '=' in feat:
+            info = feat.split('=')
+            return ('category', cls.SCHEMA.resolve(info[0], category),
+                    raw_slot, info[1])
+        return ('value', None, raw_slot, None)
 
     def to_feature_dict(self, features=None, offset=True):
         """
         Transforms event in a dict of features
         """
-        viewpoints_flat = utils.flatten_dict(self.viewpoints, sep='.')
         if features is None:
-            features = viewpoints_flat.keys()
+            features = self.SCHEMA.paths
 
         features_dict = {}
         if offset:
             features_dict['offset'] = float(self.offset_time)
 
         for feat in features:
-            content = None
-            views = [v for v in viewpoints_flat if feat in v]
-            if views != []:
-                content = viewpoints_flat[views[0]]
-
-            # add features that are arrays~
-            if isinstance(content, Fraction):
-                features_dict[feat] = float(content)
-            elif (content is not None and
-                    any(s in ARRAY_VALUES for s in feat.split('.'))):
-                for a_feat in enumerate(content):
-                    if isinstance(a_feat, tuple):
-                        a_feat = a_feat[1]
-                    features_dict[feat + '_' + str(a_feat)] = True
-            else:
-                features_dict[feat] = content
+            features_dict.update(self.feature_values(feat, self.get_viewpoint(feat)))
         return features_dict
+
+    @staticmethod
+    def feature_values(feat, content):
+        """
+        Returns the features (name, value) for the content of a viewpoint
+        """
+        # add features that are arrays
+        if isinstance(content, Fraction):
+            return [(feat, float(content))]
+        if (content is not None and
+                any(s in ARRAY_VALUES for s in feat.split('.'))):
+            return [(feat + '_' + str(a_feat), True) for a_feat in content]
+        return [(feat, content)]
+
+    @staticmethod
+    def is_numeric_feature(feat):
+        """
+        Returns True if the numeric contents of a viewpoint
+        are its features, as they are
+        """
+        return not any(s in ARRAY_VALUES for s in feat.split('.'))
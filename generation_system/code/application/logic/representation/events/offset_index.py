@@ -0,0 +1,143 @@
+#!/usr/bin/env python3.7
+"""
+This script presents the classes OffsetIndex and OffsetRanges
+that find events by offset without scanning all events
+"""
+import bisect
+import collections.abc
+
+
+class OffsetIndex(collections.abc.Sequence):
+    """
+    A class used to find events by their offsets.
+
+    It is the sequence of the offsets of some events (in the order of
+    the events, so it can be used as a list of offsets) that keeps them
+    sorted as well: exact, range and nearest offset queries are binary
+    searches instead of scans of all events. Offsets appended in order
+    (as events are parsed) cost O(1).
+
+    Attributes
+    ----------
+    sorted_offsets: list
+        offsets in increasing order
+    order: list of int
+        index of the event of each offset of sorted_offsets
+        (events with the same offset in the order of the events)
+    """
+
+    def __init__(self, offsets=()):
+        self._offsets = list(offsets)
+        self.order = sorted(range(len(self._offsets)), key=self._offsets.__getitem__)
+        self.sorted_offsets = [self._offsets[i] for i in self.order]
+        self._in_order = all(i == index for i, index in enumerate(self.order))
+
+    def __len__(self):
+        return len(self._offsets)
+
+    def __getitem__(self, index):
+        return self._offsets[index]
+
+    def __contains__(self, offset):
+        position = bisect.bisect_left(self.sorted_offsets, offset)
+        return (position < len(self.sorted_offsets)
+                and self.sorted_offsets[position] == offset)
+
+    def append(self, offset):
+        """
+        Adds the offset of a new (last) event
+        """
+        index = len(self._offsets)
+        self._offsets.append(offset)
+        if not self.sorted_offsets or self.sorted_offsets[-1] <= offset:
+            self.sorted_offsets.append(offset)
+            self.order.append(index)
+        else:
+            position = bisect.bisect_right(self.sorted_offsets, offset)
+            self.sorted_offsets.insert(position, offset)
+            self.order.insert(position, index)
+            self._in_order = False
+
+    def extend(self, offsets):
+        """
+        Adds the offsets of new (last) events
+        """
+        for offset in offsets:
+            self.append(offset)
+
+    def index(self, offset, start=0, stop=None):
+        """
+        Returns the index of the first event at offset
+        (raises ValueError if there is none, as list.index)
+        """
+        indexes = [index for index in self.indexes_at(offset)
+                   if start <= index and (stop is None or index < stop)]
+        if not indexes:
+            raise ValueError('{} is not in index'.format(offset))
+        return indexes[0]
+
+    def indexes_at(self, offset):
+        """
+        Returns the indexes of the events at offset
+        """
+        return self.order[bisect.bisect_left(self.sorted_offsets, offset):
+                          bisect.bisect_right(self.sorted_offsets, offset)]
+
+    def indexes_between(self, offset1, offset2):
+        """
+        Returns the indexes of the events between (and including) two offsets
+        """
+        start = bisect.bisect_left(self.sorted_offsets, offset1)
+        end = bisect.bisect_right(self.sorted_offsets, offset2)
+        if end <= start:
+            return []
+        if self._in_order:
+            return list(range(start, end))
+        return sorted(self.order[start:end])
+
+    def nearest(self, offset):
+        """
+        Returns the index of the (first) event with the offset nearest to offset
+        """
+        if not self.sorted_offsets:
+            raise ValueError('nearest offset of an empty index')
+
+        position = bisect.bisect_left(self.sorted_offsets, offset)
+        candidates = []
+        if position < len(self.sorted_offsets):
+            candidates.append(position)
+        if position > 0:
+            candidates.append(bisect.bisect_left(
+                self.sorted_offsets, self.sorted_offsets[position - 1]))
+        return min((abs(self.sorted_offsets[candidate] - offset), self.order[candidate])
+                   for candidate in candidates)[1]
+
+
+class OffsetRanges:
+    """
+    A class used to find, for increasing offsets, the ranges of offsets
+    (start and end included) that have them, as get_evs_bet_offs_inc
+    finds the events of each range, but in a single pass.
+
+    Attributes
+    ----------
+    ranges: list of tuple
+        (start, end, value), by start (and end)
+    """
+
+    def __init__(self, ranges=()):
+        self.ranges = list(ranges)
+        self._first = 0
+        self._last = 0
+
+    def values_at(self, offset):
+        """
+        Returns the values of the ranges that have offset
+        (offset must not be smaller than in the last call)
+        """
+        while self._first < len(self.ranges) and self.ranges[self._first][1] < offset:
+            self._first += 1
+        while self._last < len(self.ranges) and self.ranges[self._last][0] <= offset:
+            self._last += 1
+        return [value for start, end, value in self.ranges[self._first:self._last]
+                if start <= offset <= end]
@@ -3,7 +3,7 @@
 This script presents utility functions for dealing with events
 """
 
-import collections
+import collections.abc
 
 import music21
 
@@ -34,11 +34,7 @@ def add_viewpoint(viewpoint, name, info):
     """
     Add viewpoint sub-routine
     """
-    if isinstance(viewpoint[name], list):
-        viewpoint[name].append(info)
-        viewpoint[name] = utils.flatten(viewpoint[name])
-    else:
-        viewpoint[name] = info
+    utils.add_value(viewpoint, name, info)
 
 
 def flatten_dict(dictionary, parent_key='', sep='_'):
@@ -49,7 +45,7 @@ def flatten_dict(dictionary, parent_key='', sep='_'):
     items = []
     for key, value in dictionary.items():
         new_key = parent_key + sep + key if parent_key else key
-        if isinstance(value, collections.MutableMapping):
+        if isinstance(value, collections.abc.MutableMapping):
             items.extend(flatten_dict(value, new_key, sep=sep).items())
         else:
             items.append((new_key, value))
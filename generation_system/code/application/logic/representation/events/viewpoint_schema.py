@@ -0,0 +1,232 @@
+#!/usr/bin/env python3.7
+"""
+This script presents the class ViewpointSchema that compiles
+the viewpoints of a class of events to a fixed layout of slots
+"""
+import functools
+import hashlib
+import math
+import numbers
+from fractions import Fraction
+
+import numpy as np
+
+import application.logic.representation.events.utils as utils
+
+# names resolved (that are not suffixes of paths) kept for each schema
+RESOLVED_NAMES = 1024
+
+
+def kind_of_value(value):
+    """
+    Returns the kind of storage for a default value
+    (viewpoints with no default are taken as numeric)
+    """
+    if isinstance(value, bool):
+        return 'bool'
+    if isinstance(value, int):
+        return 'int'
+    if value is None or isinstance(value, float):
+        return 'float'
+    if isinstance(value, str):
+        return 'category'
+    return 'object'
+
+
+def fingerprint_value(value):
+    """
+    Returns a value as it is hashed in a fingerprint: numbers that are
+    equal (1, 1.0, Fraction(1, 1), ...) give the same, and only those
+    (Fraction(1, 3) is not 1/3), objects their str
+    """
+    if value is None or isinstance(value, str):
+        return value
+    if isinstance(value, (bool, np.bool_)):
+        return bool(value)
+    if isinstance(value, numbers.Integral):
+        return int(value)
+    if isinstance(value, numbers.Real):
+        if not isinstance(value, numbers.Rational):
+            value = float(value)
+            if not math.isfinite(value):
+                return value
+        value = Fraction(value)
+        return value.numerator if value.denominator == 1 else value
+    if isinstance(value, (list, tuple)):
+        return [fingerprint_value(item) for item in value]
+    return type(value).__name__ + ':' + str(value)
+
+
+def first_slot(paths, name):
+    """
+    Returns the slot of the first of paths that contains name (or None)
+    """
+    return next((i for i, path in enumerate(paths) if name in path), None)
+
+
+@functools.lru_cache(maxsize=RESOLVED_NAMES)
+def resolve_name(paths, name):
+    """
+    Returns the slot of the first of paths that contains name
+    (or None), keeping the names resolved last
+    """
+    return first_slot(paths, name)
+
+
+class ViewpointValues(dict):
+    """
+    Slot values of an event: only the slots that were set are stored,
+    all others read the (shared) default of the schema.
+
+    Defaults are never modified: list viewpoints are replaced, not
+    appended to in place, when a value is added (copy-on-write).
+    The fingerprint of the values is kept until a slot is set;
+    frozen values (of events that can be hashed) can not be set
+    """
+
+    __slots__ = ('schema', '_fingerprint', 'frozen')
+
+    def __init__(self, schema):
+        super().__init__()
+        self.schema = schema
+        self._fingerprint = None
+        self.frozen = False
+
+    def __missing__(self, slot):
+        return self.schema.defaults[slot]
+
+    def __setitem__(self, slot, value):
+        if self.frozen:
+            raise TypeError('viewpoints of a frozen event can not be changed')
+        self._fingerprint = None
+        super().__setitem__(slot, value)
+
+    def fingerprint(self):
+        """
+        Returns the (cached) fingerprint of the values
+        """
+        if self._fingerprint is None:
+            self._fingerprint = self.schema.fingerprint(self)
+        return self._fingerprint
+
+
+class ViewpointSchema:
+    """
+    A class used to compile the (nested) default viewpoints of
+    a class of events into a fixed, ordered layout of slots.
+
+    Names given to get_viewpoint/add_viewpoint are matched against
+    the full paths (e.g. 'duration.tie.type') exactly as before:
+    the first path (in declaration order) that contains the name.
+    Suffixes of the paths (as 'tie.type') are resolved once, when
+    compiled, so their lookups cost a dictionary access; other names
+    are resolved in a cache of the names used last (of bounded size).
+
+    Attributes
+    ----------
+    paths: tuple of str
+        full (dotted) paths of the viewpoints, in declaration order
+    slots: dict
+        path -> index of the slot of the viewpoint
+    defaults: tuple
+        default value of each slot
+    kinds: tuple of str
+        kind of storage of each slot ('bool', 'int', 'float', 'category'
+        or 'object'), inferred from its default value
+    categories: list of str
+        top-level categories of viewpoints
+    short_names: list of str
+        last two components of each path, as used by str/iter/eq
+    short_slots: list of int
+        slots resolved from short_names
+    """
+
+    def __init__(self, default):
+        flat = utils.flatten_dict(default, sep='.')
+
+        self.paths = tuple(flat)
+        self.slots = dict((path, i) for i, path in enumerate(self.paths))
+        self.defaults = tuple(flat.values())
+        self.kinds = tuple(kind_of_value(value) for value in self.defaults)
+        self.categories = list(default)
+
+        self._resolved = {}
+        for path in self.paths:
+            components = path.split('.')
+            for i in range(len(components)):
+                name = '.'.join(components[i:])
+                if name not in self._resolved:
+                    self._resolved[name] = first_slot(self.paths, name)
+
+        self.short_names = ['.'.join(path.split('.')[-2:])
+                            for path in self.paths]
+        self.short_slots = [self.resolve(name) for name in self.short_names]
+        self._paths_digest = hashlib.blake2b(repr(self.paths).encode()).digest()
+
+    def resolve(self, name, category=None):
+        """
+        Returns the slot of the first path that contains name
+        (prefixed by category, if given), or None if no path does
+        """
+        if '.' not in name and category is not None:
+            name = category + '.' + name
+
+        try:
+            return self._resolved[name]
+        except KeyError:
+            return resolve_name(self.paths, name)
+
+    def new_values(self):
+        """
+        Returns new slot values, all with the default values
+        """
+        return ViewpointValues(self)
+
+    def frozen_values(self, values):
+        """
+        Returns frozen slot values, a copy of values
+        (of an event, or of a row of a table)
+        """
+        frozen = self.new_values()
+        for slot, default in enumerate(self.defaults):
+            if values[slot] != default:
+                frozen[slot] = values[slot]
+        frozen.frozen = True
+        return frozen
+
+    def fingerprint(self, values):
+        """
+        Returns a stable 128-bit hash (as an int) of the values of all
+        slots, that does not change between runs; values of different
+        schemas (classes of events) have different fingerprints
+        """
+        content = repr([fingerprint_value(values[slot])
+                        for slot in range(len(self.paths))])
+        digest = hashlib.blake2b(self._paths_digest, digest_size=16)
+        digest.update(content.encode())
+        return int.from_bytes(digest.digest(), 'big')
+
+    def to_nested(self, values):
+        """
+        Returns the slot values as a nested dict of viewpoints
+        """
+        nested = {}
+        for slot, path in enumerate(self.paths):
+            value = values[slot]
+            keys = path.split('.')
+            view_cat = nested
+            for key in keys[:-1]:
+                view_cat = view_cat.setdefault(key, {})
+            view_cat[keys[-1]] = value
+        return nested
+
+    def from_nested(self, viewpoints):
+        """
+        Returns slot values from a nested dict of viewpoints,
+        with the default values for missing viewpoints
+        """
+        values = self.new_values()
+        for path, value in utils.flatten_dict(viewpoints, sep='.').items():
+            if path in self.slots and value != self.defaults[self.slots[path]]:
+                values[self.slots[path]] = value
+        return values
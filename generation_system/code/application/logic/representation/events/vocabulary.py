@@ -0,0 +1,105 @@
+#!/usr/bin/env python3.7
+"""
+This script presents the class Vocabulary that interns the
+categorical (string) values of viewpoints as integer codes
+"""
+import numpy as np
+
+import application.logic.representation.utils.compression as compression
+
+NONE_CODE = -1
+
+
+class Vocabulary:
+    """
+    A class used to keep, for each viewpoint (by path), a reversible
+    dictionary of its categorical values: value <-> integer code.
+
+    Codes are given in order of appearance and never change, so a
+    vocabulary shared by all tables of a corpus (CORPUS_VOCABULARY)
+    gives the same code to the same value in every piece.
+    None is coded as NONE_CODE.
+
+    Attributes
+    ----------
+    values: dict
+        path -> list of values (the value of each code)
+    codes: dict
+        path -> dict of value -> code
+    """
+
+    def __init__(self, values=None):
+        self.values = {}
+        self.codes = {}
+        if values is not None:
+            for path, path_values in values.items():
+                self.encode_all(path, path_values)
+
+    def encode(self, path, value):
+        """
+        Returns the code of a value of a viewpoint (adding it if new)
+        """
+        if value is None:
+            return NONE_CODE
+
+        codes = self.codes.setdefault(path, {})
+        code = codes.get(value)
+        if code is None:
+            code = len(codes)
+            codes[value] = code
+            self.values.setdefault(path, []).append(value)
+        return code
+
+    def encode_all(self, path, values):
+        """
+        Returns the codes of values of a viewpoint (adding the new ones)
+        """
+        return np.array([self.encode(path, value) for value in values],
+                        dtype=np.int32)
+
+    def decode(self, path, code):
+        """
+        Returns the value of a code of a viewpoint
+        """
+        if code < 0:
+            return None
+        return self.values[path][code]
+
+    def remap(self, path, codes, values):
+        """
+        Returns codes of another vocabulary (in which the viewpoint
+        has values) as codes of this vocabulary (the same codes, if
+        the values have the same codes in both)
+        """
+        mapping = self.encode_all(path, list(values) + [None])
+        if np.array_equal(mapping[:-1], np.arange(len(values))):
+            return np.asarray(codes)
+        return mapping[np.asarray(codes)]
+
+    def update(self, other):
+        """
+        Adds the values of another vocabulary
+        """
+        for path, path_values in other.values.items():
+            self.encode_all(path, path_values)
+
+    def to_pickle(self, file_path, codec=compression.DEFAULT_CODEC):
+        """
+        Saves vocabulary to a pickle compressed with a codec
+        """
+        compression.dump(self.values, file_path, codec)
+
+    def from_pickle(self, file_path):
+        """
+        Adds the values of a vocabulary saved to a pickle (of any codec)
+        """
+        self.update(Vocabulary(compression.load(file_path)))
+
+    def __getstate__(self):
+        return self.values
+
+    def __setstate__(self, state):
+        self.__init__(state)
+
+
+CORPUS_VOCABULARY = Vocabulary()
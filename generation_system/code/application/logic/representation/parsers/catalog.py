@@ -0,0 +1,275 @@
+#!/usr/bin/env python3.7
+"""
+This script presents the class Catalog that indexes the parsed pieces
+of a database (where they are, and what they have), so that folders
+and pieces can be listed without reading the parsed files
+"""
+import json
+import os
+import sqlite3
+
+from application.logic.representation.parsers.manifest import Manifest
+from application.logic.representation.parsers.music_parser import (load_parsed,
+                                                                   PARSED_EXTENSIONS)
+
+CATALOG_NAME = 'catalog.sqlite'
+
+# version of the tables of the catalog: a catalog of another version is indexed again
+CATALOG_VERSION = 2
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS pieces (
+    path TEXT PRIMARY KEY,
+    folder TEXT NOT NULL,
+    name TEXT NOT NULL,
+    source TEXT,
+    composer TEXT,
+    title TEXT,
+    parts TEXT NOT NULL,
+    part_events INTEGER NOT NULL,
+    interpart_events INTEGER NOT NULL,
+    keys TEXT NOT NULL,
+    time_signatures TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    mtime REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS instruments (
+    path TEXT NOT NULL REFERENCES pieces (path) ON DELETE CASCADE,
+    instrument TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS pieces_folder ON pieces (folder);
+CREATE INDEX IF NOT EXISTS instruments_instrument ON instruments (instrument);
+'''
+
+# columns of pieces kept as JSON lists
+LIST_COLUMNS = ('parts', 'keys', 'time_signatures')
+
+
+class Catalog:
+    """
+    A class used to index, in a SQLite file of the database, each parsed
+    piece: its file (path relative to the database, and top folder), its
+    source file, composer and title, parts and instruments, number of
+    events, keys and time signatures, and the size and modification
+    time of its file.
+
+    The catalog is updated as pieces are saved to (or evicted from) the
+    database, and refreshed when opened: parsed files added to the
+    folders of the database (or changed since, by size or modification
+    time) are indexed, reading them, and files removed are forgotten
+    (unless opened only to add pieces, with refresh False).
+    Only the parsed files in the (top) folders of the database are
+    indexed, not in their subfolders.
+
+    Attributes
+    ----------
+    database_path: str
+        path of the database (files are kept relative to it)
+    connection: sqlite3 connection
+        connection to the catalog
+    """
+
+    def __init__(self, database_path, refresh=True):
+        self.database_path = database_path
+        self.connection = sqlite3.connect(self.file_path())
+        self.connection.row_factory = sqlite3.Row
+        self.connection.execute('PRAGMA foreign_keys = ON')
+        if self.connection.execute('PRAGMA user_version').fetchone()[0] != CATALOG_VERSION:
+            with self.connection:
+                self.connection.execute('DROP TABLE IF EXISTS instruments')
+                self.connection.execute('DROP TABLE IF EXISTS pieces')
+                self.connection.execute('PRAGMA user_version = {}'.format(CATALOG_VERSION))
+        self.connection.executescript(SCHEMA)
+        if refresh:
+            self.refresh()
+
+    def file_path(self):
+        """
+        Returns path of the catalog in the database
+        """
+        return os.sep.join([self.database_path, CATALOG_NAME])
+
+    def relative_path(self, file_path):
+        """
+        Returns path of a file relative to the database
+        """
+        return os.path.relpath(os.path.normpath(file_path), self.database_path)
+
+    def add(self, file_path, music_events, source=None):
+        """
+        Indexes a parsed file with its events
+        (replacing the file parsed before from the same source,
+        a normalized path as in the manifest)
+        """
+        path = self.relative_path(file_path)
+        description = describe(music_events)
+        with self.connection:
+            if source is not None:
+                self.connection.execute('DELETE FROM pieces WHERE source = ?', (source,))
+            self.connection.execute('DELETE FROM pieces WHERE path = ?', (path,))
+            self.connection.execute(
+                'INSERT INTO pieces VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)', (
+                    path, path.split(os.sep)[0], os.path.basename(path).rsplit('.', 1)[0],
+                    source, description['composer'], description['title'],
+                    json.dumps(description['parts']), description['part_events'],
+                    description['interpart_events'], json.dumps(description['keys']),
+                    json.dumps(description['time_signatures']), os.path.getsize(file_path),
+                    os.path.getmtime(file_path)))
+            self.connection.executemany(
+                'INSERT INTO instruments VALUES (?, ?)',
+                [(path, instrument) for instrument in description['instruments']])
+
+    def remove(self, file_path):
+        """
+        Forgets a parsed file
+        """
+        with self.connection:
+            self.connection.execute('DELETE FROM pieces WHERE path = ?',
+                                    (self.relative_path(file_path),))
+
+    def remove_sources(self, sources):
+        """
+        Forgets the files parsed from some source files
+        """
+        with self.connection:
+            self.connection.executemany('DELETE FROM pieces WHERE source = ?',
+                                        [(source,) for source in sources])
+
+    def rebuild(self):
+        """
+        Indexes again every parsed file in the folders of the database
+        """
+        with self.connection:
+            self.connection.execute('DELETE FROM pieces')
+        self.refresh()
+
+    def refresh(self):
+        """
+        Indexes the parsed files added to the folders of the database
+        (or changed since indexed), and forgets the files removed
+        """
+        indexed = dict((row['path'], (row['size'], row['mtime'])) for row in
+                       self.connection.execute('SELECT path, size, mtime FROM pieces'))
+        sources = None
+        for file_path in self.parsed_files():
+            status = os.stat(file_path)
+            path = self.relative_path(file_path)
+            if indexed.pop(path, None) == (status.st_size, status.st_mtime):
+                continue
+            if sources is None:
+                sources = Manifest(self.database_path).sources()
+            self.add(file_path, load_parsed(file_path).music_events, sources.get(file_path))
+
+        with self.connection:
+            self.connection.executemany('DELETE FROM pieces WHERE path = ?',
+                                        [(path,) for path in indexed])
+
+    def parsed_files(self):
+        """
+        Returns the paths of the parsed files in the (top) folders of the database
+        """
+        file_paths = []
+        for entry in sorted(os.scandir(self.database_path), key=lambda entry: entry.name):
+            if not entry.is_dir() or entry.name.startswith('.'):
+                continue
+            for file_entry in sorted(os.scandir(entry.path), key=lambda entry: entry.name):
+                if file_entry.is_file() and file_entry.name.endswith(PARSED_EXTENSIONS):
+                    file_paths.append(os.path.normpath(file_entry.path))
+        return file_paths
+
+    def folders(self):
+        """
+        Returns the (top) folders of the database with parsed pieces
+        """
+        return [row['folder'] for row in self.connection.execute(
+            'SELECT DISTINCT folder FROM pieces ORDER BY folder')]
+
+    def pieces(self, folders=None, composer=None, instrument=None):
+        """
+        Returns the pieces (as dicts, with the path of their file)
+        in some folders, by a composer or with an instrument
+        """
+        query, parameters = self.select('SELECT * FROM pieces', folders, composer, instrument)
+        pieces = []
+        for row in self.connection.execute(query + ' ORDER BY path', parameters):
+            piece = dict(row)
+            for column in LIST_COLUMNS:
+                piece[column] = json.loads(piece[column])
+            piece['instruments'] = [instrument_row['instrument'] for instrument_row in
+                                    self.connection.execute(
+                                        'SELECT instrument FROM instruments WHERE path = ?',
+                                        (piece['path'],))]
+            piece['path'] = os.path.normpath(os.path.join(self.database_path, piece['path']))
+            pieces.append(piece)
+        return pieces
+
+    def size(self, folders=None, composer=None, instrument=None):
+        """
+        Returns the number of pieces, events and bytes of the
+        pieces in some folders, by a composer or with an instrument
+        """
+        query, parameters = self.select(
+            'SELECT COUNT(*), TOTAL(part_events + interpart_events), TOTAL(size) FROM pieces',
+            folders, composer, instrument)
+        pieces, events, size = self.connection.execute(query, parameters).fetchone()
+        return pieces, int(events), int(size)
+
+    def select(self, query, folders=None, composer=None, instrument=None):
+        """
+        Returns a query of pieces (and its parameters) filtered by
+        folders, and names of composer and instrument (if not None)
+        """
+        conditions, parameters = [], []
+        if folders is not None:
+            conditions.append('folder IN ({})'.format(', '.join('?' * len(folders))))
+            parameters.extend(folders)
+        if composer is not None:
+            conditions.append('composer LIKE ?')
+            parameters.append('%{}%'.format(composer))
+        if instrument is not None:
+            conditions.append('path IN (SELECT path FROM instruments WHERE instrument LIKE ?)')
+            parameters.append('%{}%'.format(instrument))
+        if conditions:
+            query += ' WHERE ' + ' AND '.join(conditions)
+        return query, parameters
+
+    def close(self):
+        """
+        Closes the connection to the catalog
+        """
+        self.connection.close()
+
+
+def describe(music_events):
+    """
+    Returns the description of the events of a piece in the catalog
+    """
+    tables = [table for table in music_events['part_events'].values() if table is not None]
+    tables.append(music_events['interpart_events'])
+
+    def first_value(name):
+        for table in tables:
+            if len(table):
+                return table.values(name)[0]
+        return None
+
+    def distinct_values(name, part_tables):
+        values = []
+        for table in part_tables:
+            for value in table.values(name):
+                if value is not None and str(value) not in values:
+                    values.append(str(value))
+        return values
+
+    part_tables = tables[:-1]
+    return {
+        'composer': first_value('metadata.composer'),
+        'title': first_value('metadata.piece_title'),
+        'parts': [str(table.values('metadata.part')[0]) if len(table) else None
+                  for table in part_tables],
+        'instruments': distinct_values('metadata.instrument', part_tables),
+        'part_events': sum(len(table) for table in part_tables),
+        'interpart_events': len(music_events['interpart_events']),
+        'keys': distinct_values('key.signatures.key', part_tables),
+        'time_signatures': distinct_values('time.timesig', part_tables),
+    }
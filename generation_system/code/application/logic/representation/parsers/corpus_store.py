@@ -0,0 +1,177 @@
+#!/usr/bin/env python3.7
+"""
+This script presents functions to store the events of a piece in a file of the
+corpus store, whose columns are memory-mapped (and only read when used).
+
+A map keeps its file open for as long as the tables that use it: files
+are replaced, not written over, so that tables loaded before keep their
+data; in Windows, where a mapped file can not be replaced or removed,
+files are read instead
+"""
+import contextlib
+import json
+import mmap
+import os
+import pickle
+import struct
+
+import numpy as np
+
+from application.logic.representation.events.event_table import EventTable
+from application.logic.representation.events.interpart_event import InterPartEvent
+from application.logic.representation.events.linear_event import PartEvent
+
+STORE_EXTENSION = '.events'
+STORE_MAGIC = b'EVSTORE1'
+STORE_VERSION = 2
+
+# columns are aligned for memory-mapping
+ALIGNMENT = 64
+
+# a mapped file can not be replaced or removed in Windows: files are read instead
+MAP_FILES = os.name != 'nt'
+
+# kinds of columns stored raw (memory-mapped), the others are pickled
+RAW_KINDS = ('bool', 'int', 'float', 'category')
+
+EVENT_CLASSES = {event_class.__name__: event_class
+                 for event_class in (PartEvent, InterPartEvent)}
+
+
+def write_store(file_path, music_events):
+    """
+    Writes the events of a piece (part events and interpart events) to
+    a store file: a header (JSON, the index of its tables and columns),
+    the raw bool, numeric and category columns of each table (and the
+    int masks of the numeric ones), aligned, and a pickle of its
+    offsets, object columns and vocabularies
+    """
+    tables = [('part', key, table) for key, table in music_events['part_events'].items()]
+    tables.append(('interpart', None, music_events['interpart_events']))
+
+    index = {'version': STORE_VERSION, 'tables': []}
+    blocks = []
+    position = 0
+    for role, key, table in tables:
+        state = table.__getstate__()
+        entry = {'role': role, 'key': key, 'event_class': state['event_class'].__name__,
+                 'length': len(state['offsets']), 'columns': {}, 'integral': {}}
+
+        raw_columns = [('columns', path, column) for path, column in state['columns'].items()
+                       if state['kinds'][path] in RAW_KINDS]
+        raw_columns.extend(('integral', path, integral)
+                           for path, integral in state['integral'].items())
+        for group, path, column in raw_columns:
+            data = np.ascontiguousarray(column).tobytes()
+            position = aligned(position)
+            entry[group][path] = {'dtype': column.dtype.str, 'offset': position}
+            if group == 'columns':
+                entry[group][path]['kind'] = state['kinds'][path]
+            blocks.append((position, data))
+            position += len(data)
+
+        data = pickle.dumps({
+            'offsets': state['offsets'],
+            'columns': dict((path, column) for path, column in state['columns'].items()
+                            if state['kinds'][path] not in RAW_KINDS),
+            'kinds': state['kinds'],
+            'vocabulary': state['vocabulary'],
+        }, protocol=pickle.HIGHEST_PROTOCOL)
+        position = aligned(position)
+        entry['objects'] = {'offset': position, 'size': len(data)}
+        blocks.append((position, data))
+        position += len(data)
+
+        index['tables'].append(entry)
+
+    header = json.dumps(index).encode('utf-8')
+    start = aligned(len(STORE_MAGIC) + 8 + len(header))
+    with replacing(file_path) as handle:
+        handle.write(STORE_MAGIC + struct.pack('<Q', len(header)) + header)
+        for block_position, data in blocks:
+            handle.seek(start + block_position)
+            handle.write(data)
+
+
+def read_store_index(file_path):
+    """
+    Returns the index of a store file (its tables and
+    columns) and the position of its columns in the file
+    """
+    with open(file_path, 'rb') as handle:
+        magic = handle.read(len(STORE_MAGIC))
+        if magic != STORE_MAGIC:
+            raise ValueError('{} is not a store file'.format(file_path))
+        size = struct.unpack('<Q', handle.read(8))[0]
+        index = json.loads(handle.read(size).decode('utf-8'))
+    return index, aligned(len(STORE_MAGIC) + 8 + size)
+
+
+def read_store(file_path):
+    """
+    Returns the events of a piece from a store file; the raw columns
+    of its tables are copy-on-write maps of the file (only read when
+    used, and changes to them are not written to the file); files of
+    version 1 have no int masks (see EventTable.__setstate__)
+    """
+    index, start = read_store_index(file_path)
+    buffer = map_file(file_path)
+
+    music_events = {'part_events': {}, 'interpart_events': None}
+    for entry in index['tables']:
+        objects = entry['objects']
+        state = pickle.loads(buffer[start + objects['offset']:
+                                    start + objects['offset'] + objects['size']])
+        state['event_class'] = EVENT_CLASSES[entry['event_class']]
+        if 'integral' in entry:
+            state['integral'] = {}
+        for group in ('columns', 'integral'):
+            for path, column in entry.get(group, {}).items():
+                if entry['length'] == 0:
+                    state[group][path] = np.empty(0, dtype=np.dtype(column['dtype']))
+                    continue
+                state[group][path] = np.frombuffer(
+                    buffer, dtype=np.dtype(column['dtype']), count=entry['length'],
+                    offset=start + column['offset'])
+
+        table = EventTable.from_state(state)
+        if entry['role'] == 'part':
+            music_events['part_events'][entry['key']] = table
+        else:
+            music_events['interpart_events'] = table
+    return music_events
+
+
+def map_file(file_path):
+    """
+    Returns a copy-on-write map of a file, that is kept (with the file
+    open) while arrays use it; in Windows, a (writable) copy of the file
+    """
+    with open(file_path, 'rb') as handle:
+        if not MAP_FILES:
+            return bytearray(handle.read())
+        return mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_COPY)
+
+
+@contextlib.contextmanager
+def replacing(file_path):
+    """
+    Context of a file to write, that replaces file_path when it is done,
+    so that maps of the file replaced (and the file, if writing fails)
+    are kept as they were
+    """
+    temporary_path = file_path + '.tmp'
+    try:
+        with open(temporary_path, 'wb') as handle:
+            yield handle
+        os.replace(temporary_path, file_path)
+    finally:
+        if os.path.isfile(temporary_path):
+            os.remove(temporary_path)
+
+
+def aligned(position):
+    """
+    Returns the first position aligned for columns from position
+    """
+    return -(-position // ALIGNMENT) * ALIGNMENT
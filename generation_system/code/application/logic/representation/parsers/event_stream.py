@@ -0,0 +1,129 @@
+#!/usr/bin/env python3.7
+"""
+This script presents the NDJSON event stream of parsed pieces: a header
+record per piece and per part (and for the inter-part events), each
+followed by its events, one per line, written and read as generators
+"""
+import json
+from fractions import Fraction
+
+import music21
+
+from application.logic.representation.events.event_table import EventTable
+from application.logic.representation.parsers.corpus_store import EVENT_CLASSES
+
+STREAM_VERSION = 1
+
+
+def write_records(pieces):
+    """
+    Yields the lines of the stream of pieces, given as (name, folder,
+    music events), one piece (and one event) at a time
+    """
+    for name, folder, music_events in pieces:
+        yield dump_record({'record': 'piece', 'version': STREAM_VERSION,
+                           'name': name, 'folder': folder})
+
+        tables = [('part', key, table) for key, table in music_events['part_events'].items()]
+        tables.append(('interpart', None, music_events['interpart_events']))
+        for record, key, table in tables:
+            yield dump_record({'record': record, 'key': key,
+                               'event_class': table.event_class.__name__,
+                               'events': len(table)})
+            for row in range(len(table)):
+                yield dump_record(event_record(table, row))
+
+
+def read_records(lines):
+    """
+    Yields the pieces of a stream, as (name, folder, music events),
+    one piece at a time
+    """
+    piece, table, slots = None, None, {}
+    for line in lines:
+        if not line.strip():
+            continue
+        record = json.loads(line, object_hook=decode_value)
+
+        if 'record' not in record:
+            if table is None:
+                raise ValueError('event before the header of its part')
+            add_event(table, record, slots)
+        elif record['record'] == 'piece':
+            if record['version'] != STREAM_VERSION:
+                raise ValueError('unknown version {} of stream'.format(record['version']))
+            if piece is not None:
+                yield piece
+            piece = (record['name'], record['folder'],
+                     {'part_events': {}, 'interpart_events': None})
+            table = None
+        else:
+            if piece is None:
+                raise ValueError('part before the header of its piece')
+            table = EventTable(EVENT_CLASSES[record['event_class']],
+                               capacity=max(16, record['events']))
+            slots = {path: slot for slot, path in enumerate(table.schema.paths)}
+            if record['record'] == 'part':
+                piece[2]['part_events'][record['key']] = table
+            else:
+                piece[2]['interpart_events'] = table
+
+    if piece is not None:
+        yield piece
+
+
+def event_record(table, row):
+    """
+    Returns the record of an event of a table: its offset
+    and the viewpoints (by path) that are not the defaults
+    """
+    viewpoints = {}
+    for slot, path in enumerate(table.schema.paths):
+        value = table.get_value(row, slot)
+        if value != table.schema.defaults[slot]:
+            viewpoints[path] = value
+    return {'offset': table.offsets[row], 'viewpoints': viewpoints}
+
+
+def add_event(table, record, slots):
+    """
+    Adds the event of a record to a table
+    (slots: path -> slot of the schema of the table)
+    """
+    row = len(table)
+    table.add_rows(1)
+    table.offsets[row] = record['offset']
+    for path, value in record['viewpoints'].items():
+        table.set_value(row, slots[path], value)
+
+
+def dump_record(record):
+    """
+    Returns the line of a record
+    """
+    return json.dumps(record, default=encode_value, ensure_ascii=False) + '\n'
+
+
+def encode_value(value):
+    """
+    Returns the JSON of a value with no JSON type (fractions and instruments):
+    fractions (as of tuplets) are kept exact, by numerator and denominator
+    """
+    if isinstance(value, Fraction):
+        return {'num': value.numerator, 'den': value.denominator}
+    if isinstance(value, music21.instrument.Instrument):
+        return {'instrument': [value.partId, value.partName, value.instrumentName]}
+    raise TypeError('{} is not serializable in the stream'.format(type(value).__name__))
+
+
+def decode_value(obj):
+    """
+    Returns the value of the JSON of a fraction or an instrument
+    """
+    if len(obj) == 2 and 'num' in obj and 'den' in obj:
+        return Fraction(obj['num'], obj['den'])
+    if len(obj) == 1 and 'instrument' in obj:
+        instrument = music21.instrument.Instrument()
+        instrument.partId, instrument.partName, instrument.instrumentName = obj['instrument']
+        return instrument
+    return obj
@@ -2,12 +2,18 @@
 """
 This script presents the class LineParser that processes the interpart relations of various lines
 """
+import functools
 from collections import defaultdict
 
 import music21
 
 import application.logic.representation.parsers.utils as utils
+from application.logic.representation.events.event_table import EventTable
 from application.logic.representation.events.interpart_event import InterPartEvent
+from application.logic.representation.parsers.key_analysis import KeyAnalysisCache
+
+# features of chords (by names, without repetitions) kept for all parsers
+CHORD_FEATURES = 4096
 
 
 class InterPartParser:
@@ -15,10 +21,20 @@ class InterPartParser:
     Class InterPartParser
     """
 
-    def __init__(self, music_to_parse):
-        print('Chordifying music...')
-        self.music_to_parse = music_to_parse.chordify(toSoundingPitch=True)
-        self.events = []
+    # viewpoints of a chord that depend only on the names of its pitches
+    CHORD_VIEWPOINTS = ['cardinality', 'forteClass', 'forteClassNumber', 'inversion',
+                        'pc_cardinality', 'primeForm', 'pcOrdered',
+                        'basic.quality', 'is_consonant', 'is_major_triad',
+                        'is_incomplete_major_triad', 'is_minor_triad',
+                        'is_incomplete_minor_triad', 'is_augmented_sixth',
+                        'is_french_augmented_sixth', 'is_german_augmented_sixth',
+                        'is_italian_augmented_sixth', 'is_swiss_augmented_sixth',
+                        'is_augmented_triad', 'is_half_diminished_seventh',
+                        'is_diminished_seventh', 'is_dominant_seventh']
+
+    def __init__(self, music_to_parse, key_analyses=None):
+        self.music_to_parse = self.vertical_slices(music_to_parse)
+        self.events = EventTable(InterPartEvent)
 
         self.metadata = {
             'composer': music_to_parse.metadata.composer,
@@ -30,14 +46,22 @@ class InterPartParser:
                 music21.key.KeySignature)):
             self.keys[k].append(val)
 
-        key_analysis = music21.analysis.floatingKey.KeyAnalyzer(music_to_parse)
-        self.measure_keys = key_analysis.getRawKeyByMeasure()
+        if key_analyses is None:
+            key_analyses = KeyAnalysisCache()
+        self.measure_keys = key_analyses.key_by_measure(music_to_parse)
 
         key_offsets = list(self.keys) + [self.music_to_parse.highestTime]
         self.ks_keys = dict([utils.get_analysis_keys_stream_bet_offsets(
-            self.music_to_parse, offset, key_offsets[key+1])
+            self.music_to_parse, offset, key_offsets[key+1], key_analyses)
                              for key, offset in enumerate(key_offsets[:-1])])
 
+    def vertical_slices(self, music):
+        """
+        Returns the vertical slices (chords and rests) of music
+        """
+        print('Chordifying music...')
+        return music.chordify(toSoundingPitch=True)
+
     def parse_music(self):
         """
         Returns the events from interpart relations between parts
@@ -53,10 +77,7 @@ class InterPartParser:
 
             self.extract_duration(i, chord)
             if not isinstance(chord, music21.note.Rest):
-                self.extract_chord_table_info(i, chord)
-                self.pitch_class_info(i, chord)
-                self.chord_info(i, chord)
-                self.chord_elements_info(i, chord)
+                self.chord_parsing(i, chord)
                 self.key_signatures_parsing(i, chord)
                 self.perceived_key_at_measure_parsing(i, chord)
 
@@ -88,6 +109,33 @@ class InterPartParser:
             self.events[index].add_viewpoint(
                 'style', chord.tie.style, 'tie')
 
+    def chord_parsing(self, index, chord):
+        """
+        Processes the table, pitch class and elements information for a chord
+        (analysed once for each chord names, the rest taken from its pitches)
+        """
+        features = chord_features(utils.chord_names(chord, repeated=False))
+        if not features:
+            self.extract_chord_table_info(index, chord)
+            self.pitch_class_info(index, chord)
+            self.chord_info(index, chord)
+            self.chord_elements_info(index, chord)
+            features['viewpoints'] = [(name, self.events[index].get_viewpoint(name))
+                                      for name in self.CHORD_VIEWPOINTS]
+            features['root'] = utils.pitch_name(chord.root())
+            return
+
+        root_name = features['root']
+        for name, value in features['viewpoints']:
+            self.events[index].add_viewpoint(name, value)
+        self.events[index].add_viewpoint(
+            'pitchClass', [p.pitchClass for p in chord.pitches])
+        self.events[index].add_viewpoint(
+            'pitches', [p.ps for p in chord.pitches])
+        # the root is the first pitch with its name (as in chord.root())
+        self.events[index].add_viewpoint(
+            'root', next(p.ps for p in chord.pitches if utils.pitch_name(p) == root_name))
+
     def extract_chord_table_info(self, index, chord):
         """
         Processes the table information for a chord
@@ -211,3 +259,13 @@ class InterPartParser:
             harm_f_ms = utils.harmonic_functions_key(chord, measure_key)
             self.events[index].add_viewpoint(
                 'measure.function', harm_f_ms.figure)
+
+
+@functools.lru_cache(maxsize=CHORD_FEATURES)
+def chord_features(names):
+    """
+    Returns the features of the chords of some names (a dict, with the
+    (name, value) of the CHORD_VIEWPOINTS and name of the root of the
+    first chord parsed), keeping the last
+    """
+    return {}
@@ -0,0 +1,282 @@
+#!/usr/bin/env python3.7
+"""
+This script presents the class InterPartSweepParser that processes the interpart
+relations of various lines from their (already parsed) events, without chordifying
+"""
+import bisect
+import collections
+
+import music21
+
+from application.logic.representation.parsers.interpart_parser import InterPartParser
+
+TIES = ('start', 'stop', 'continue')
+
+# an event of a part: (start, end, pitches, ties), pitches is None for rests
+# and ties has the tie (type, style) of each pitch (or None)
+Span = collections.namedtuple('Span', ['start', 'end', 'pitches', 'ties'])
+
+
+class InterPartSweepParser(InterPartParser):
+    """
+    Class InterPartSweepParser: an InterPartParser whose vertical slices
+    (chords and rests) are built sweeping the onsets of the events of
+    the parts, as music.chordify(toSoundingPitch=True) slices the score.
+
+    Attributes
+    ----------
+    part_events: dict
+        index -> events of a part
+    part_numbers: dict
+        index -> number of the part of the score the events are from
+        (for the transposition to sounding pitch)
+    pitches: dict
+        (name, cpitch, transposition) -> music21 pitch
+    chord_ties: dict
+        number of a part of the score -> dict of (offset, pitch names)
+        -> ties of the pitches of the chords of the part (the events of
+        chords have no ties, but chordify ties each of their notes)
+    """
+
+    def __init__(self, music_to_parse, part_events, part_numbers=None, key_analyses=None):
+        self.part_events = part_events
+        self.part_numbers = {} if part_numbers is None else part_numbers
+        self.pitches = {}
+        self.chord_ties = {}
+        super().__init__(music_to_parse, key_analyses)
+
+    def vertical_slices(self, music):
+        """
+        Returns the vertical slices of music (a stream with the measures
+        of its first part, with chords and rests), sweeping the events of
+        its parts measure by measure
+        """
+        print('Sweeping onsets of parts...')
+        if music.hasPartLikeStreams():
+            template = music.getElementsByClass('Stream')[0]
+        else:
+            template = music
+        measures = list(template.getElementsByClass('Measure'))
+
+        slices = music21.stream.Stream()
+        if not measures:
+            measures = [music21.stream.Measure(number=1)]
+            measures_offsets = [0]
+        else:
+            measures_offsets = [measure.offset for measure in measures]
+
+        measure_spans = [[] for _ in measures]
+        for index, events in self.part_events.items():
+            for span in self.part_spans(music, index, events):
+                number = max(bisect.bisect_right(measures_offsets, span.start) - 1, 0)
+                measure_spans[number].append(span)
+
+        for measure, offset, spans in zip(measures, measures_offsets, measure_spans):
+            new_measure = music21.stream.Measure(number=measure.number)
+            for start, element in self.measure_slices(offset, spans):
+                new_measure.coreInsert(music21.common.opFrac(start - offset), element)
+            new_measure.coreElementsChanged()
+            slices.coreInsert(offset, new_measure)
+        slices.coreElementsChanged()
+        return slices
+
+    def part_spans(self, music, index, events):
+        """
+        Returns the spans (start, end, pitches, ties) of the events of a part
+        (pitches at sounding pitch)
+        """
+        transpositions = self.part_transpositions(music, index)
+        transposition_offsets = [offset for offset, _ in transpositions]
+        chord_ties = self.part_chord_ties(music, index)
+
+        spans = []
+        for event in events:
+            start = event.get_offset()
+            end = music21.common.opFrac(start + event.get_viewpoint('duration.length'))
+            if event.is_rest():
+                spans.append(Span(start, end, None, None))
+                continue
+
+            transposition = None
+            if transpositions:
+                position = bisect.bisect_right(transposition_offsets, start) - 1
+                if position >= 0:
+                    transposition = transpositions[position][1]
+
+            tie = event.get_viewpoint('type', 'tie')
+            tie = (tie, event.get_viewpoint('style', 'tie')) if tie in TIES else None
+            pitches = self.event_pitches(event, transposition)
+            ties = [tie] * len(pitches)
+            names = event.get_viewpoint('chordPitches')
+            if names:
+                ties = chord_ties.get((start, tuple(names)), ties)
+            spans.append(Span(start, end, pitches, ties))
+        return spans
+
+    def part_chord_ties(self, music, index):
+        """
+        Returns dict of (offset, pitch names) -> ties (type, style, or None)
+        of the pitches of the chords of the part of the score of the events
+        with index (empty if the part is not known)
+        """
+        number = self.part_numbers.get(index)
+        if number is None:
+            return {}
+        if number not in self.chord_ties:
+            parts = (music.getElementsByClass('Stream') if music.hasPartLikeStreams()
+                     else [music])
+            ties = {}
+            if number < len(parts):
+                flat = parts[number].flat
+                for chord in flat.getElementsByClass('Chord'):
+                    name = (flat.elementOffset(chord), tuple(str(pitch) for pitch in chord.pitches))
+                    ties[name] = [None if note.tie is None else (note.tie.type, note.tie.style)
+                                  for note in chord]
+            self.chord_ties[number] = ties
+        return self.chord_ties[number]
+
+    def part_transpositions(self, music, index):
+        """
+        Returns list of (offset, transposition) of the instruments of the
+        part of the score of the events with index, that chordify transposes
+        to sounding pitch (empty if the part is at sounding pitch)
+        """
+        number = self.part_numbers.get(index)
+        if number is None or not music.hasPartLikeStreams():
+            return []
+
+        parts = music.getElementsByClass('Stream')
+        if parts[0].atSoundingPitch is not False or number >= len(parts):
+            return []
+        part = parts[number]
+        if part.atSoundingPitch is False or (
+                part.atSoundingPitch == 'unknown' and music.atSoundingPitch is False):
+            return [(instrument.offset, instrument.transposition)
+                    for instrument in part.flat.getElementsByClass('Instrument')]
+        return []
+
+    def event_pitches(self, event, transposition=None):
+        """
+        Returns the pitches of a (note or chord) event
+        """
+        names = event.get_viewpoint('chordPitches')
+        if not names:
+            names = [event.get_viewpoint('dnote') + event.get_viewpoint('accidental') +
+                     str(event.get_viewpoint('octave'))]
+            cpitch = event.get_viewpoint('cpitch')
+        else:
+            cpitch = None
+
+        pitches = []
+        for name in names:
+            pitch_name = (name, cpitch, str(transposition))
+            if pitch_name not in self.pitches:
+                pitch = music21.pitch.Pitch(name.split('(')[0])
+                if cpitch is not None and abs(pitch.ps - cpitch) > 1e-6:
+                    pitch.microtone = (cpitch - pitch.ps) * 100
+                if transposition is not None:
+                    pitch = pitch.transpose(transposition)
+                self.pitches[pitch_name] = pitch
+            pitches.append(self.pitches[pitch_name])
+        return pitches
+
+    def measure_slices(self, measure_offset, spans):
+        """
+        Returns list of (offset, chord or rest) of the slices of a measure:
+        between each pair of consecutive starts or ends of its spans,
+        the chord of the pitches of the spans sounding (as a verticality
+        of chordify, tied where pitches are split), or a rest
+        """
+        if not spans:
+            return []
+
+        points = sorted(set([measure_offset] + [span.start for span in spans] +
+                            [span.end for span in spans]))
+        slices = []
+        for offset, end in zip(points, points[1:]):
+            if music21.common.almostEquals(offset, end):
+                continue
+            sounding = [span for span in spans
+                        if span.pitches is not None and
+                        (span.start == offset or span.start < offset < span.end)]
+            length = music21.common.opFrac(end - offset)
+
+            if not sounding:
+                if slices and isinstance(slices[-1][1], music21.note.Rest):
+                    rest = slices[-1][1]
+                    rest.duration.quarterLength = music21.common.opFrac(
+                        rest.duration.quarterLength + length)
+                else:
+                    slices.append((offset, music21.note.Rest(quarterLength=length)))
+                continue
+
+            slices.append((offset, self.slice_chord(offset, end, length, sounding)))
+        return slices
+
+    @staticmethod
+    def slice_chord(offset, end, length, sounding):
+        """
+        Returns the chord of the spans sounding between offset and end
+        (redundant pitches and their ties merged as chordify merges them)
+        """
+        notes = {}
+        for span in sounding:
+            split = split_tie(offset - span.start, span.end - end)
+            for pitch, tie in zip(span.pitches, span.ties):
+                tie = merge_ties(tie, split)
+                if pitch.nameWithOctave not in notes:
+                    notes[pitch.nameWithOctave] = (pitch, tie)
+                else:
+                    old_pitch, old_tie = notes[pitch.nameWithOctave]
+                    notes[pitch.nameWithOctave] = (
+                        old_pitch, merge_redundant_ties(old_tie, tie))
+
+        notes = sorted(notes.values(), key=lambda note: note[0].ps)
+        chord = music21.chord.Chord([pitch for pitch, _ in notes], quarterLength=length)
+        ties = [tie for _, tie in notes if tie is not None]
+        if ties:
+            chord.tie = music21.tie.Tie(ties[0][0])
+            chord.tie.style = ties[0][1]
+        return chord
+
+
+def split_tie(start_difference, end_difference):
+    """
+    Returns the tie type of a part of a span that is split
+    (as Verticality.makeElement), given the difference of the
+    starts and of the ends of span and part
+    """
+    if start_difference == 0 and end_difference <= 0:
+        return None
+    if start_difference > 0:
+        return 'continue' if end_difference > 0 else 'stop'
+    return 'start'
+
+
+def merge_ties(tie, split):
+    """
+    Returns the tie (type, style) of a split note with tie
+    """
+    if tie is not None and {tie[0], split} == {'start', 'stop'}:
+        return ('continue', tie[1])
+    if tie is not None and (tie[0] == 'continue' or split is None):
+        return tie
+    if split is not None:
+        return (split, 'normal')
+    return tie
+
+
+def merge_redundant_ties(old_tie, tie):
+    """
+    Returns the tie of two notes of the same pitch in a slice,
+    the one with more tie information
+    """
+    if old_tie is not None and old_tie[0] == 'continue':
+        return old_tie
+    if tie is None:
+        return old_tie
+    if old_tie is None or tie[0] == 'continue':
+        return tie
+    if {old_tie[0], tie[0]} == {'start', 'stop'}:
+        return ('continue', old_tie[1])
+    return old_tie
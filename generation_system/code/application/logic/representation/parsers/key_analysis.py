@@ -0,0 +1,112 @@
+#!/usr/bin/env python3.7
+"""
+This script presents the class KeyAnalysisCache that analyses
+the keys of a score once for all its parsers
+"""
+import copy
+import functools
+
+import music21
+
+# keys (by tonic and mode) kept for analyses to copy instead of building
+BUILT_KEYS = 64
+
+
+class KeyAnalysis(music21.analysis.discrete.AardenEssen):
+    """
+    The key analysis of music21 (stream.analyze('key')), but
+    the keys of its solutions are copies of the keys of built_key
+    (building a key is most of the time of an analysis, and
+    each analysis builds 24 keys)
+    """
+
+    def _solutionToObject(self, solution):
+        key = copy.copy(built_key(solution[0].nameWithOctave, solution[1]))
+        key.correlationCoefficient = solution[2]
+        key.alternateInterpretations = []
+        return key
+
+
+@functools.lru_cache(maxsize=BUILT_KEYS)
+def built_key(tonic, mode):
+    """
+    Returns the key of a tonic (name of a pitch) and mode,
+    keeping the keys built last
+    """
+    return music21.key.Key(tonic=tonic, mode=mode)
+
+
+class KeyAnalysisCache:
+    """
+    A class used to analyse the keys of a score, shared by
+    all its parsers, so that no stream is analysed twice.
+
+    Attributes
+    ----------
+    analyses: dict
+        (stream, 'measures' or 'offsets', start, end) -> key analysis
+        (stream is the id of a stream in streams)
+    streams: dict
+        id -> stream analysed (so that ids are not reused)
+    """
+
+    def __init__(self):
+        self.analyses = {}
+        self.streams = {}
+
+    def analysis(self, stream, window, get_stream):
+        """
+        Returns the key analysis of the window (kind, start, end)
+        of stream, analysing get_stream() if not analysed before
+        (None, if it returns None)
+        """
+        self.streams[id(stream)] = stream
+        name = (id(stream),) + window
+        if name not in self.analyses:
+            part = get_stream()
+            self.analyses[name] = None if part is None else KeyAnalysis().getSolution(part)
+        return self.analyses[name]
+
+    def stream_analyses(self, stream):
+        """
+        Returns the key analyses of stream, by window
+        (to be added to the cache of another process)
+        """
+        return {name[1:]: analysis for name, analysis in self.analyses.items()
+                if name[0] == id(stream)}
+
+    def add_analyses(self, stream, analyses):
+        """
+        Adds key analyses (by window) of a copy of stream,
+        analysed in another process
+        """
+        self.streams[id(stream)] = stream
+        for window, analysis in analyses.items():
+            self.analyses[(id(stream),) + window] = analysis
+
+    def key_by_measure(self, stream):
+        """
+        Returns the key analysis of each measure of stream
+        (as KeyAnalyzer(stream).getRawKeyByMeasure())
+        """
+        # stream.measure collects the context of each measure: the beats
+        # of the notes of the line are found in the sites it leaves
+        def measure_with_notes(number):
+            measure = stream.measure(number)
+            if measure is None or not measure.recurse().notes:
+                return None
+            return measure
+
+        number_measures = music21.analysis.floatingKey.KeyAnalyzer(stream).numMeasures
+        return [self.analysis(stream, ('measures', number, number),
+                              lambda number=number: measure_with_notes(number))
+                for number in range(number_measures)]
+
+    def key_between_offsets(self, stream, offset1, offset2):
+        """
+        Returns the key analysis of the elements of stream between offsets
+        (as utils.get_analysis_keys_stream_bet_offsets)
+        """
+        return self.analysis(stream, ('offsets', offset1, offset2),
+                             lambda: stream.getElementsByOffset(offset1, offset2).stream())
+
@@ -2,11 +2,15 @@
 """
 This script presents the class LineParser that processes the events of a single line
 """
+import collections
 
 import music21
 
 import application.logic.representation.parsers.utils as utils
+from application.logic.representation.events.event_table import EventTable
 from application.logic.representation.events.linear_event import PartEvent
+from application.logic.representation.events.offset_index import OffsetRanges
+from application.logic.representation.parsers.key_analysis import KeyAnalysisCache
 
 
 class LineParser:
@@ -17,7 +21,7 @@ class LineParser:
     ----------
     music_to_parse: music21 stream
         line of music to parse
-    events: list of objects of class Event
+    events: EventTable of PartEvent
         events parsed from music
     part_name: str
         the name of the part being parsed
@@ -27,14 +31,18 @@ class LineParser:
         offsets of measures in music
     measure_keys: list of music21 key elements
         analysis of key by measure in music
+    last_notes: deque of int
+        indexes of the last (up to 3) events parsed that are notes
     """
 
-    def __init__(self, music_to_parse, metadata=None):
+    def __init__(self, music_to_parse, metadata=None, key_analyses=None):
         """
         Parameters
         ----------
         music_to_parse: music21 stream
             line of music to parse
+        key_analyses: KeyAnalysisCache
+            key analyses of the score of the line
         """
         self.music_to_parse = music_to_parse  # .toSoundingPitch()
 
@@ -51,91 +59,173 @@ class LineParser:
         measures = self.music_to_parse.recurse(classFilter='Measure')
         self.measure_offsets = [measure.offset for measure in measures]
 
-        key_analysis = music21.analysis.floatingKey.KeyAnalyzer(music_to_parse)
-        self.measure_keys = key_analysis.getRawKeyByMeasure()
+        if key_analyses is None:
+            key_analyses = KeyAnalysisCache()
+        self.key_analyses = key_analyses
+        self.measure_keys = key_analyses.key_by_measure(music_to_parse)
 
-        self.events = []
+        self.events = EventTable(PartEvent)
+        self.last_notes = collections.deque(maxlen=3)
 
     def parse_line(self):
         """
         Returns the events from a line with viewpoints
         """
-        self.note_and_rests_parsing()
-        # self.intfib_grace_notes_parsing()
-        self.dynamics_parsing()
-        self.key_signatures_parsing()
-        self.time_signatures_parsing()
-        self.metro_marks_parsing()
-        self.double_barline_parsing()
-        self.repeat_barline_parsing()
+        for _ in self.iter_events():
+            pass
+        return self.events
 
-        if len(self.events) > 0 and self.events[0].get_viewpoint('posinbar') != 0:
-            self.events[0].add_viewpoint('anacrusis', True)
+    def iter_events(self):
+        """
+        Parses the events of the line in a single pass (in order of offset),
+        yielding each event when it has all its viewpoints (the last one
+        at the end, as it takes the repeats with no event at their offset)
+        """
+        context = self.context_parsing()
+
+        # the stream of the notes and rests is kept while they are parsed (and
+        # made after the context is parsed, as in the passes it replaced): it is
+        # their active site, in which their beats and realized volumes are found
+        notes_and_rests = self.music_to_parse.flat.notesAndRests.stream()
+
+        offsets = set()
+        last = None
+        for i, note_or_rest in enumerate(notes_and_rests.elements):
+            self.note_and_rest_parsing(i, note_or_rest)
+            # self.intfib_grace_notes_parsing()
+            self.context_info_parsing(i, context)
+
+            if i == 0 and self.events[0].get_viewpoint('posinbar') != 0:
+                self.events[0].add_viewpoint('anacrusis', True)
+
+            if last is not None:
+                self.barlines_parsing(*last, context)
+                yield self.events[last[0]]
+            last = (i, note_or_rest.offset not in offsets)
+            offsets.add(note_or_rest.offset)
+
+        if last is not None:
+            self.barlines_parsing(*last, context, offsets)
+            yield self.events[last[0]]
+
+    def context_parsing(self):
+        """
+        Walks the flattened line once for the ranges of offsets of its
+        dynamics, key signatures and time signatures (and metronome
+        marks), and the offsets of its double and repeat barlines
+        """
+        dynamics = []
+        keys = []
+        time_sigs = []
+        context = {'double': set(), 'repeats': []}
+        for element in self.music_to_parse.flat:
+            if isinstance(element, music21.dynamics.Dynamic):
+                dynamics.append((element.offset, element.value))
+            elif isinstance(element, music21.key.KeySignature):
+                keys.append((element.offset, element))
+            elif isinstance(element, music21.meter.TimeSignature):
+                time_sigs.append((element.offset, element))
+            elif isinstance(element, music21.bar.Barline):
+                if element.type == 'double':
+                    context['double'].add(element.offset)
+                if isinstance(element, music21.bar.Repeat):
+                    context['repeats'].append((element.offset, element.direction))
+
+        highest_time = self.music_to_parse.highestTime
+        context['dynamic'] = OffsetRanges(
+            (offset, (highest_time if i == (len(dynamics)-1) else dynamics[i+1][0]), value)
+            for i, (offset, value) in enumerate(dynamics))
+        context['time_sig'] = OffsetRanges(
+            (offset, (float('inf') if i == (len(time_sigs)-1) else time_sigs[i+1][0]), sig)
+            for i, (offset, sig) in enumerate(time_sigs))
+        context['metro'] = OffsetRanges(
+            self.music_to_parse.flat.metronomeMarkBoundaries())
+
+        key_ranges = []
+        for i, (offset, key) in enumerate(keys):
+            next_key_offset = (highest_time if i == (len(keys)-1) else keys[i+1][0])
+            try:
+                key_anal = utils.get_analysis_keys_stream_bet_offsets(
+                    self.music_to_parse, offset, next_key_offset, self.key_analyses)[1]
+                key_ranges.append((offset, next_key_offset, (key, key_anal)))
+            except music21.analysis.discrete.DiscreteAnalysisException:
+                print('failed to get likely keys for Stream component')
+        context['key'] = OffsetRanges(key_ranges)
 
-        return self.events
+        return context
 
-    def note_and_rests_parsing(self):
+    def context_info_parsing(self, index, context):
         """
-        Parses the note/rest events
+        Parses the dynamics, key signatures, time signatures
+        and metronome marks at the offset of an event
         """
-        stream_notes_rests = self.music_to_parse.flat.notesAndRests.stream()
-        # Get Notes and Rests only
+        offset = self.events[index].get_offset()
+        for dynamic in context['dynamic'].values_at(offset):
+            self.events[index].add_viewpoint('dynamic', dynamic)
+        for key, key_anal in context['key'].values_at(offset):
+            self.key_signature_parsing(index, key, key_anal)
+        for sig in context['time_sig'].values_at(offset):
+            self.time_signature_parsing(index, sig)
+        for metro_mark in context['metro'].values_at(offset):
+            self.metronome_mark_parsing(self.events[index], metro_mark)
 
-        for i, note_or_rest in enumerate(stream_notes_rests.elements):
+    def note_and_rest_parsing(self, i, note_or_rest):
+        """
+        Parses a note/rest event
+        """
+        self.events.append(PartEvent(offset=note_or_rest.offset))
+        # Metadata
+        for key, value in self.metadata.items():
+            self.events[i].add_viewpoint(key, value)
 
-            self.events.append(PartEvent(offset=note_or_rest.offset))
+        # Basic Rest/Grace Notes Information
+        self.events[i].add_viewpoint('rest', note_or_rest.isRest)
+        self.events[i].add_viewpoint(
+            'grace', note_or_rest.duration.isGrace)
 
-            # Metadata
-            for key, value in self.metadata.items():
-                self.events[i].add_viewpoint(key, value)
+        is_chord = isinstance(note_or_rest, music21.chord.Chord)
+        self.events[i].add_viewpoint(
+            'chord', is_chord)
 
-            # Basic Rest/Grace Notes Information
-            self.events[i].add_viewpoint('rest', note_or_rest.isRest)
-            self.events[i].add_viewpoint(
-                'grace', note_or_rest.duration.isGrace)
-
-            is_chord = isinstance(note_or_rest, music21.chord.Chord)
-            self.events[i].add_viewpoint(
-                'chord', is_chord)
-
-            if len(self.events) > 1:
-                bioi = note_or_rest.offset - self.events[-2].get_offset()
-                self.events[i].add_viewpoint('bioi', bioi)
-                last_bioi = self.events[-2].get_viewpoint('bioi')
-                if last_bioi != 0:
-                    self.events[i].add_viewpoint(
-                        'derived.bioi_ratio', bioi / last_bioi)
+        if len(self.events) > 1:
+            bioi = note_or_rest.offset - self.events[-2].get_offset()
+            self.events[i].add_viewpoint('bioi', bioi)
+            last_bioi = self.events[-2].get_viewpoint('bioi')
+            if last_bioi != 0:
                 self.events[i].add_viewpoint(
-                    'derived.bioi_contour', utils.contour(bioi, last_bioi))
-
-            # Duration Parsing
-            self.duration_info_parsing(i, note_or_rest)
-
-            # Articulation Parsing
-            for art in note_or_rest.articulations:
-                if art.name == 'breath mark':
-                    self.events[i].add_viewpoint('breath_mark', True)
-                else:
-                    self.events[i].add_viewpoint('articulation', art.name)
+                    'derived.bioi_ratio', bioi / last_bioi)
+            self.events[i].add_viewpoint(
+                'derived.bioi_contour', utils.contour(bioi, last_bioi))
 
-            # Expression and Spanners Parsing
-            self.expression_parsing(i, note_or_rest.expressions)
-            self.spanner_parsing(
-                i, note_or_rest, note_or_rest.getSpannerSites())
+        # Duration Parsing
+        self.duration_info_parsing(i, note_or_rest)
 
-            # If note is not a rest, parse pitch information
-            if not note_or_rest.isRest:
-                note_to_parse = note_or_rest
-                if is_chord:
-                    note_to_parse = music21.note.Note(note_or_rest.bass())
-                    self.events[i].add_viewpoint(
-                        'pitch.chordPitches', [str(p) for p in note_or_rest.pitches])
+        # Articulation Parsing
+        for art in note_or_rest.articulations:
+            if art.name == 'breath mark':
+                self.events[i].add_viewpoint('breath_mark', True)
+            else:
+                self.events[i].add_viewpoint('articulation', art.name)
+
+        # Expression and Spanners Parsing
+        self.expression_parsing(i, note_or_rest.expressions)
+        self.spanner_parsing(
+            i, note_or_rest, note_or_rest.getSpannerSites())
+
+        # If note is not a rest, parse pitch information
+        if not note_or_rest.isRest:
+            note_to_parse = note_or_rest
+            if is_chord:
+                note_to_parse = music21.note.Note(note_or_rest.bass())
+                self.events[i].add_viewpoint(
+                    'pitch.chordPitches', [str(p) for p in note_or_rest.pitches])
 
-                self.note_basic_info_parsing(i, note_to_parse)
-                self.contours_parsing(i)
+            self.note_basic_info_parsing(i, note_to_parse)
+            self.contours_parsing(i)
+            self.last_notes.append(i)
 
-            # Measure Related Information Parsing
-            self.measure_info_parsing(i, note_or_rest)
+        # Measure Related Information Parsing
+        self.measure_info_parsing(i, note_or_rest)
 
     def note_basic_info_parsing(self, index, note_or_rest):
         """
@@ -168,7 +258,7 @@ class LineParser:
                 'parenthesis', note_or_rest.noteheadParenthesis)
 
         self.events[index].add_viewpoint(
-            'volume', note_or_rest.volume.getRealized())
+            'volume', self.realized_volume(note_or_rest))
 
         if note_or_rest.tie is not None:
             self.events[index].add_viewpoint(
@@ -206,8 +296,9 @@ class LineParser:
         """
         Parses the contours for an event
         """
-        last_note_index = utils.get_last_x_events_that_are_notes_before_index(
-            self.events)  # get index of last event that is a note and not a rest
+        # index of last event that is a note and not a rest
+        # (as utils.get_last_x_events_that_are_notes_before_index, from last_notes)
+        last_note_index = self.last_notes[-1] if self.last_notes else None
 
         if last_note_index is not None:
             pitch_note = self.events[index].get_viewpoint('cpitch')
@@ -220,11 +311,12 @@ class LineParser:
             self.events[index].add_viewpoint(
                 'contour_hd', utils.contour_hd(pitch_note, pitch_last_note))
 
-        last_four_note_indexes = utils.get_last_x_events_that_are_notes_before_index(
-            self.events, number=2)
+        last_four_note_indexes = None
+        if index == 1 and last_note_index is not None:
+            last_four_note_indexes = [last_note_index]
+        elif len(self.last_notes) > 2:
+            last_four_note_indexes = list(self.last_notes)[:0:-1]
         if last_four_note_indexes is not None:
-            if not isinstance(last_four_note_indexes, list):
-                last_four_note_indexes = [last_four_note_indexes]
 
             last_four_note_indexes.append(index)
             seq_ints = [self.events[i].get_viewpoint(
@@ -369,7 +461,7 @@ class LineParser:
         and melodic sequences with other elements of a measure
         for an event
         """
-        key_anal = self.measure_keys[note_or_rest.measureNumber - 1]
+        key_anal = self.measure_keys[self.measure_number(note_or_rest) - 1]
         self.events[index].add_viewpoint(
             'key', str(key_anal), 'measure')
 
@@ -380,16 +472,17 @@ class LineParser:
             else:
                 note = note_or_rest.pitch.name
 
-            sc_deg = key_anal.getScaleDegreeFromPitch(note)
+            sc_deg = utils.scale_degree(key_anal, note)
             self.events[index].add_viewpoint(
                 'scale_degree', sc_deg, 'measure')
 
         if not note_or_rest.duration.isGrace:
             try:
-                posinbar = note_or_rest.beat - 1
+                beat, beat_strength = self.beat(note_or_rest)
+                posinbar = beat - 1
                 self.events[index].add_viewpoint('posinbar', posinbar)
                 self.events[index].add_viewpoint(
-                    'beat_strength', note_or_rest.beatStrength)
+                    'beat_strength', beat_strength)
 
                 if posinbar == 0 or posinbar % 1 == 0:
                     self.events[index].add_viewpoint(
@@ -402,17 +495,24 @@ class LineParser:
         else:
             self.parsing_non_fib_element(index, note_or_rest)
 
-    def dynamics_parsing(self):
+    def measure_number(self, note_or_rest):
+        """
+        Returns the number of the measure of a note or rest
+        """
+        return note_or_rest.measureNumber
+
+    def beat(self, note_or_rest):
+        """
+        Returns the beat and the beat strength of a note or rest
+        (raising a Music21Exception if it has no time signature)
+        """
+        return note_or_rest.beat, note_or_rest.beatStrength
+
+    def realized_volume(self, note):
         """
-        Parses the existent dynamics information
+        Returns the realized volume of a note (in its dynamic context)
         """
-        dynamics = list(self.music_to_parse.flat.getElementsByClass(
-            music21.dynamics.Dynamic))
-        for i, dynamic in enumerate(dynamics):
-            next_dyn_offset = (self.music_to_parse.highestTime if i == (len(dynamics)-1)
-                               else dynamics[i+1].offset)
-            for event in utils.get_evs_bet_offs_inc(self.events, dynamic.offset, next_dyn_offset):
-                event.add_viewpoint('dynamic', dynamic.value)
+        return note.volume.getRealized()
 
     def intfib_grace_notes_parsing(self):
         """
@@ -425,50 +525,6 @@ class LineParser:
             grace_note.add_viewpoint('intfib', utils.seq_int(
                 fib_midi, grace_note.get_viewpoint('cpitch')))
 
-    def key_signatures_parsing(self):
-        """
-        Parses the existent key signatures information
-        """
-        keys = list(self.music_to_parse.flat.getElementsByClass(
-            music21.key.KeySignature))
-
-        for i, key in enumerate(keys):
-            next_key_offset = (self.music_to_parse.highestTime if i == (len(keys)-1)
-                               else keys[i+1].offset)
-
-            try:
-                key_anal = utils.get_analysis_keys_stream_bet_offsets(
-                    self.music_to_parse, key.offset, next_key_offset)[1]
-
-                for event in utils.get_evs_bet_offs_inc(self.events, key.offset, next_key_offset):
-                    event.add_viewpoint('keysig', key.sharps)
-                    event.add_viewpoint('signatures.key', str(key_anal))
-                    if not event.is_rest():
-                        sc_deg = key_anal.getScaleDegreeFromPitch(
-                            event.get_viewpoint('dnote') +
-                            event.get_viewpoint('accidental'))
-                        event.add_viewpoint(
-                            'signatures.scale_degree', sc_deg)
-            except music21.analysis.discrete.DiscreteAnalysisException:
-                print('failed to get likely keys for Stream component')
-
-    def time_signatures_parsing(self):
-        """
-        Parses the existent key signatures information
-        """
-        time_sigs = list(self.music_to_parse.flat.getElementsByClass(
-            music21.meter.TimeSignature))
-        for i, sig in enumerate(time_sigs):
-            offset = (None if i == (len(time_sigs)-1)
-                      else time_sigs[i+1].offset)
-            for event in utils.get_evs_bet_offs_inc(self.events, sig.offset, offset):
-                event.add_viewpoint(
-                    'timesig', sig.ratioString)
-                event.add_viewpoint(
-                    'pulses', sig.numerator)
-                event.add_viewpoint(
-                    'barlength', sig.denominator)
-
     def metronome_marks_parsing(self, metro_marks, events=None):
         """
         Parses the existent Metronome Markings of a line part to a set of events
@@ -478,40 +534,54 @@ class LineParser:
 
         for metro in metro_marks:
             for event in utils.get_evs_bet_offs_inc(events, metro[0], metro[1]):
-                event.add_viewpoint(
-                    'text', metro[2].text, 'metro')
-                event.add_viewpoint(
-                    'value', metro[2].number, 'metro')
+                self.metronome_mark_parsing(event, metro[2])
 
-                if metro[2].numberSounding is not None:
-                    event.add_viewpoint(
-                        'sound', metro[2].numberSounding)
-                else:
-                    event.add_viewpoint(
-                        'sound', metro[2].number)
+    def metronome_mark_parsing(self, event, metro_mark):
+        """
+        Parses a Metronome Marking to an event
+        """
+        event.add_viewpoint(
+            'text', metro_mark.text, 'metro')
+        event.add_viewpoint(
+            'value', metro_mark.number, 'metro')
+
+        if metro_mark.numberSounding is not None:
+            event.add_viewpoint(
+                'sound', metro_mark.numberSounding)
+        else:
+            event.add_viewpoint(
+                'sound', metro_mark.number)
 
-                event.add_viewpoint(
-                    'value', metro[2].referent.quarterLength, 'ref')
-                event.add_viewpoint(
-                    'type', metro[2].referent.type, 'ref')
+        event.add_viewpoint(
+            'value', metro_mark.referent.quarterLength, 'ref')
+        event.add_viewpoint(
+            'type', metro_mark.referent.type, 'ref')
 
-    def metro_marks_parsing(self):
+    def key_signature_parsing(self, index, key, key_anal):
         """
-        Parses the existent Metronome Markings
+        Parses a key signature (and its analysis of key) to an event
         """
-        self.metronome_marks_parsing(metro_marks=list(
-            self.music_to_parse.flat.metronomeMarkBoundaries()))
+        event = self.events[index]
+        event.add_viewpoint('keysig', key.sharps)
+        event.add_viewpoint('signatures.key', str(key_anal))
+        if not event.is_rest():
+            sc_deg = utils.scale_degree(
+                key_anal, event.get_viewpoint('dnote') +
+                event.get_viewpoint('accidental'))
+            event.add_viewpoint(
+                'signatures.scale_degree', sc_deg)
 
-    def double_barline_parsing(self):
+    def time_signature_parsing(self, index, sig):
         """
-        Parses the existent double barlines (because they can be important if delimiting phrases)
+        Parses a time signature to an event
         """
-        for d_bar_off in [barline.offset for barline in self.music_to_parse.flat.getElementsByClass(
-                music21.bar.Barline) if barline.type == 'double']:
-            events_at_barline = utils.get_events_at_offset(
-                self.events, d_bar_off)
-            if len(events_at_barline) > 0:
-                events_at_barline[0].add_viewpoint('double', True)
+        event = self.events[index]
+        event.add_viewpoint(
+            'timesig', sig.ratioString)
+        event.add_viewpoint(
+            'pulses', sig.numerator)
+        event.add_viewpoint(
+            'barlength', sig.denominator)
 
     def clefs_parsing(self):
         """
@@ -524,20 +594,25 @@ class LineParser:
                 events_at_clef[0].add_viewpoint(
                     'clef', str(clef.sign) + str(clef.line))
 
-    def repeat_barline_parsing(self):
+    def barlines_parsing(self, index, first_at_offset, context, offsets=None):
         """
-        Parses the existent repeat barlines (because they can be important if delimiting phrases)
-        and the direction for repeating
+        Parses the double and repeat barlines (because they can be important
+        if delimiting phrases) at the offset of an event, if it is the first
+        event at its offset, and the direction for repeating; offsets of
+        all events are given for the last event, that also takes the
+        repeats with no event at their offset
         """
-        for repeat in self.music_to_parse.flat.getElementsByClass(music21.bar.Repeat):
-            events_repeats = utils.get_events_at_offset(
-                self.events, repeat.offset)
-            if len(events_repeats) == 0:
-                self.events[-1].add_viewpoint('is_end', True)
-                self.events[-1].add_viewpoint('direction',
-                                              repeat.direction)
-            else:
-                events_repeats[0].add_viewpoint(
+        offset = self.events[index].get_offset()
+        if first_at_offset and offset in context['double']:
+            self.events[index].add_viewpoint('double', True)
+
+        for repeat_offset, direction in context['repeats']:
+            if first_at_offset and repeat_offset == offset:
+                self.events[index].add_viewpoint(
                     'exists_before', True)
-                events_repeats[0].add_viewpoint(
-                    'direction', repeat.direction)
+                self.events[index].add_viewpoint(
+                    'direction', direction)
+            elif offsets is not None and repeat_offset not in offsets:
+                self.events[index].add_viewpoint('is_end', True)
+                self.events[index].add_viewpoint('direction',
+                                                 direction)
@@ -0,0 +1,142 @@
+#!/usr/bin/env python3.7
+"""
+This script presents the class Manifest that records which
+files were parsed to the database, so that unchanged files
+are not parsed again
+"""
+import functools
+import hashlib
+import json
+import os
+
+MANIFEST_NAME = 'manifest.json'
+
+# version of the representation (parsers, events and utils): files parsed
+# by another version are parsed again, so it must be increased whenever
+# the events of a parsed file change
+PARSER_VERSION = 4
+
+
+def content_hash(filename):
+    """
+    Returns the hash of the contents of a file
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    with open(filename, 'rb') as handle:
+        for chunk in iter(functools.partial(handle.read, 1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def source_path(filename):
+    """
+    Returns the normalized (absolute) path of a source file,
+    by which it is recorded in the manifest
+    """
+    return os.path.normcase(os.path.abspath(filename))
+
+
+class Manifest:
+    """
+    A class used to record, for each parsed (source) file, the hash of
+    its contents and the parser version when it was parsed, and the
+    pickle of its events in the database.
+
+    Source files that are not found are kept (with their pickles):
+    they are only evicted when asked to.
+
+    Attributes
+    ----------
+    database_path: str
+        path of the database (pickles are kept relative to it)
+    entries: dict
+        source file (normalized path) -> {'hash', 'version', 'pickle'}
+    """
+
+    def __init__(self, database_path):
+        self.database_path = database_path
+        self.entries = {}
+        if os.path.isfile(self.file_path()):
+            with open(self.file_path(), 'r') as handle:
+                for filename, entry in json.load(handle).items():
+                    self.entries[source_path(filename)] = entry
+
+    def file_path(self):
+        """
+        Returns path of the manifest in the database
+        """
+        return os.sep.join([self.database_path, MANIFEST_NAME])
+
+    def pickle_path(self, filename):
+        """
+        Returns path of the pickle of a source file (or None)
+        """
+        filename = source_path(filename)
+        if filename not in self.entries:
+            return None
+        return os.path.normpath(os.path.join(
+            self.database_path, self.entries[filename]['pickle']))
+
+    def is_current(self, filename, file_hash):
+        """
+        Returns if a source file with contents of hash file_hash
+        was parsed (by this parser version) and its pickle exists
+        """
+        entry = self.entries.get(source_path(filename))
+        return (entry is not None and entry['hash'] == file_hash
+                and entry['version'] == PARSER_VERSION
+                and os.path.isfile(self.pickle_path(filename)))
+
+    def add(self, filename, file_hash, pickle_path):
+        """
+        Records a parsed source file
+        (removing its old pickle if it moved)
+        """
+        old_path = self.pickle_path(filename)
+        pickle_path = os.path.normpath(pickle_path)
+        if old_path is not None and old_path != pickle_path and os.path.isfile(old_path):
+            os.remove(old_path)
+
+        self.entries[source_path(filename)] = {
+            'hash': file_hash,
+            'version': PARSER_VERSION,
+            'pickle': os.path.relpath(pickle_path, self.database_path)
+        }
+
+    def relocate(self, pickle_path, new_path):
+        """
+        Records that the pickle of a source file was moved to new_path
+        """
+        pickle_path = os.path.normpath(pickle_path)
+        for filename, entry in self.entries.items():
+            if self.pickle_path(filename) == pickle_path:
+                entry['pickle'] = os.path.relpath(os.path.normpath(new_path), self.database_path)
+
+    def evict(self, filename):
+        """
+        Forgets a source file, removing its pickle
+        """
+        pickle_path = self.pickle_path(filename)
+        if pickle_path is not None and os.path.isfile(pickle_path):
+            os.remove(pickle_path)
+        self.entries.pop(source_path(filename), None)
+
+    def missing(self):
+        """
+        Returns the source files that are not found
+        (deleted, moved, or in a drive not mounted)
+        """
+        return [filename for filename in self.entries if not os.path.isfile(filename)]
+
+    def sources(self):
+        """
+        Returns dict of pickle path -> source file
+        """
+        return {self.pickle_path(filename): filename for filename in self.entries}
+
+    def save(self):
+        """
+        Saves the manifest to the database
+        """
+        with open(self.file_path(), 'w') as handle:
+            json.dump(self.entries, handle, indent=2)
@@ -0,0 +1,85 @@
+#!/usr/bin/env python3.7
+"""
+This script presents the migration of a database of legacy .pbz2 pickles:
+parsed pieces are moved to the corpus store, models to model files and
+the other pickles (vocabulary) are compressed again with a faster codec.
+
+Usage: python -m application.logic.representation.parsers.migration
+       DATABASE_PATH [--codec CODEC] [--keep]
+"""
+import argparse
+import os
+
+import application.logic.generation.model_store as model_store
+import application.logic.representation.utils.compression as compression
+from application.logic.representation.parsers.catalog import Catalog
+from application.logic.representation.parsers.corpus_store import STORE_EXTENSION, write_store
+from application.logic.representation.parsers.manifest import Manifest
+from application.logic.representation.parsers.music_parser import event_tables
+
+
+def migrate_database(database_path, codec=compression.DEFAULT_CODEC, keep=False):
+    """
+    Migrates the .pbz2 pickles of a database (removed unless keep);
+    returns the paths of the files written
+    """
+    manifest = Manifest(database_path)
+    migrated = []
+    for root, _, files in os.walk(database_path):
+        for filename in sorted(files):
+            if not filename.endswith(compression.LEGACY_EXTENSION):
+                continue
+            legacy_path = os.path.join(root, filename)
+            migrated.append(migrate_pickle(legacy_path, codec))
+            manifest.relocate(legacy_path, migrated[-1])
+            if not keep:
+                os.remove(legacy_path)
+
+    if os.path.isfile(manifest.file_path()):
+        manifest.save()
+
+    # the catalog is refreshed, with the files migrated
+    Catalog(database_path).close()
+    return migrated
+
+
+def migrate_pickle(legacy_path, codec=compression.DEFAULT_CODEC):
+    """
+    Migrates a .pbz2 pickle: to the corpus store, if it has the
+    events of a piece, to a model file, if it has oracles, or else
+    to a pickle compressed with codec; returns the path of the file written
+    """
+    file_path = legacy_path[:-len(compression.LEGACY_EXTENSION)]
+    obj = compression.load(legacy_path)
+    if isinstance(obj, dict) and 'part_events' in obj:
+        write_store(file_path + STORE_EXTENSION, event_tables(obj))
+        return file_path + STORE_EXTENSION
+
+    model = model_store.as_model(obj)
+    if model is not None:
+        model_store.save_model(file_path + model_store.MODEL_EXTENSION, model)
+        return file_path + model_store.MODEL_EXTENSION
+
+    compression.dump(obj, file_path + compression.PICKLE_EXTENSION, codec)
+    return file_path + compression.PICKLE_EXTENSION
+
+
+def main():
+    """
+    Migrates the database given in the command line
+    """
+    argument_parser = argparse.ArgumentParser(
+        description='Migrates the .pbz2 pickles of a database')
+    argument_parser.add_argument('database_path')
+    argument_parser.add_argument('--codec', default=compression.DEFAULT_CODEC,
+                                 choices=sorted(compression.CODECS))
+    argument_parser.add_argument('--keep', action='store_true',
+                                 help='keep the .pbz2 pickles')
+    arguments = argument_parser.parse_args()
+
+    for file_path in migrate_database(arguments.database_path, arguments.codec, arguments.keep):
+        print('Migrated', file_path)
+
+
+if __name__ == '__main__':
+    main()
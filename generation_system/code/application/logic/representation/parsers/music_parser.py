@@ -3,24 +3,42 @@
 This script presents the class Parser that tries different approaches to segment a melodic line
 """
 
-import bz2
+import concurrent.futures
 import json
+import multiprocessing
 import os
-import pickle
+import threading
 
 import music21
 
 import application.logic.representation.parsers.utils as utils
+import application.logic.representation.utils.compression as compression
 import application.logic.representation.utils.printing as printing
 import application.logic.representation.utils.voice as voice_utils
+from application.logic.representation.events.event_table import EventTable
+from application.logic.representation.parsers.corpus_store import (STORE_EXTENSION,
+                                                                   read_store, write_store)
 from application.logic.representation.events.linear_event import PartEvent
 from application.logic.representation.events.interpart_event import InterPartEvent
 from application.logic.representation.parsers.line_parser import LineParser
+from application.logic.representation.parsers.event_stream import read_records, write_records
 from application.logic.representation.parsers.interpart_parser import InterPartParser
+from application.logic.representation.parsers.interpart_sweep_parser import InterPartSweepParser
+from application.logic.representation.parsers.key_analysis import KeyAnalysisCache
+from application.logic.representation.parsers.musicxml_line_parser import MusicXMLLineParser
+from application.logic.representation.parsers.musicxml_reader import (MusicXMLReader,
+                                                                      UnsupportedMusicXML)
 
 FOLDER_DEFAULT = ['data', 'myexamples']
+
+# files of parsed music in a database (legacy pickles are still read)
+PARSED_EXTENSIONS = (STORE_EXTENSION, compression.PICKLE_EXTENSION,
+                     compression.LEGACY_EXTENSION)
 LINEAR_INSTRUMENTS = ['WoodwindInstrument', 'BrassInstrument', 'Vocalist']
 
+# parser (and its parts to parse) shared with forked processes
+PENDING_PARSER = None
+
 
 class MusicParser:
     """
@@ -30,21 +48,30 @@ class MusicParser:
     ----------
     """
 
-    def __init__(self, filename=None, folders=None):
+    def __init__(self, filename=None, folders=None, reader='music21'):
+        """
+        Reads the music of filename with music21, or streams it with
+        a MusicXMLReader (reader 'iterparse', for MusicXML files whose
+        parts are sequences of a voice; others are read with music21)
+        """
 
         if folders is None:
             folders = FOLDER_DEFAULT
 
         self.music = None
+        self.music_reader = None
         self.music_parts = []
         self.first_part = None
 
         self.music_events = {
             'part_events': {},
-            'interpart_events': []
+            'interpart_events': EventTable(InterPartEvent)
         }
 
         self.exception = False
+        self.pending_parts = None
+        self.part_numbers = {}
+        self.key_analyses = KeyAnalysisCache()
 
         if filename is not None:
             if not os.path.exists(filename):
@@ -68,25 +95,50 @@ class MusicParser:
                     self.music.show()
             else:
                 try:
-                    self.music = music21.converter.parse(file_path)
+                    self.music = self.read_music(file_path, reader)
                 except music21.musicxml.xmlToM21.MusicXMLImportException as exception:
                     self.exception = exception
 
-            if not self.exception:
+            # a MusicXMLReader reads no hidden music
+            if not self.exception and self.music_reader is None:
                 self.clean_hidden_music()
 
-    def parse(self, parts=True, interpart=True, number_parts=None):
+    def read_music(self, file_path, reader='music21'):
+        """
+        Returns the score of a (not midi) file, read with music21,
+        or streamed with a MusicXMLReader (reader 'iterparse'),
+        if the reader reads its music
+        """
+        if reader == 'iterparse':
+            try:
+                self.music_reader = MusicXMLReader(file_path)
+                return self.music_reader.score
+            except UnsupportedMusicXML as exception:
+                print('Reading with music21: {}'.format(exception))
+        return music21.converter.parse(file_path)
+
+    def parse(self, parts=True, interpart=True, number_parts=None, processes=1,
+              interpart_method='chordify'):
         """
         Parse music
+        (parts in a pool of processes if processes is not 1;
+        None uses all cpus)
+
+        Interpart events are built chordifying the score
+        (interpart_method 'chordify') or sweeping the parsed parts
+        ('sweep', if parts are parsed)
         """
         if self.exception:
             return
 
         if parts:
-            self.music.makeVoices(inPlace=True)
-            self.music.flattenUnnecessaryVoices(inPlace=True)
-            if self.music.hasVoices():
-                self.music = self.music.voicesToParts(separateById=True)
+            self.pending_parts = None if processes == 1 else []
+            # the parts a MusicXMLReader reads are sequences of a voice
+            if self.music_reader is None:
+                self.music.makeVoices(inPlace=True)
+                self.music.flattenUnnecessaryVoices(inPlace=True)
+                if self.music.hasVoices():
+                    self.music = self.music.voicesToParts(separateById=True)
 
             self.music_parts = self.music.parts
             if number_parts is None or number_parts > len(self.music_parts):
@@ -108,15 +160,22 @@ class MusicParser:
                     self.process_voiced_part(part, i, instrument)
                 else:
                     _, name = self.name_of_part(instrument)
-                    self.music_events['part_events'][name] = self.parse_sequence_part(
-                        part, name=name, first=(False, True)[i == 0])
+                    self.add_part(name, part, name, i)
+
+            if self.pending_parts is not None:
+                self.parse_pending_parts(processes)
 
         if interpart and (len(self.music.parts) > 1 or
                          len(self.music.getOverlaps()) > 0 or
                          len(self.music.recurse(classFilter='Chord')) > 0):
             print('Processing InterPart Events')
-            self.music_events['interpart_events'] = InterPartParser(
-                self.music).parse_music()
+            if interpart_method == 'sweep' and parts:
+                interpart_parser = InterPartSweepParser(
+                    self.music, self.music_events['part_events'],
+                    self.part_numbers, self.key_analyses)
+            else:
+                interpart_parser = InterPartParser(self.music, self.key_analyses)
+            self.music_events['interpart_events'] = interpart_parser.parse_music()
             print('End of Processing {} InterPart Events'.format(
                 len(self.music_events['interpart_events'])))
 
@@ -130,7 +189,8 @@ class MusicParser:
         if verbose:
             print('Processing part {}'.format(name))
 
-        parser = LineParser(part, self.music.metadata)
+        line_parser = LineParser if self.music_reader is None else MusicXMLLineParser
+        parser = line_parser(part, self.music.metadata, self.key_analyses)
         parsed = parser.parse_line()
 
         first_metro_marks = list(
@@ -143,6 +203,58 @@ class MusicParser:
 
         return parsed
 
+    def add_part(self, index, part, name, number):
+        """
+        Parses a part (from the part of the score with number)
+        to the part events with index
+        (or leaves it pending, if parsing parts in parallel)
+        """
+        self.part_numbers[index] = number
+        first = number == 0
+        if self.pending_parts is None:
+            self.music_events['part_events'][index] = self.parse_sequence_part(
+                part, name=name, first=first)
+        else:
+            # keeps the index taken, for the names of the next parts
+            self.music_events['part_events'][index] = None
+            self.pending_parts.append((index, part, name, first))
+
+    def parse_pending_parts(self, processes=None):
+        """
+        Parses the pending parts in a pool of processes, forked so that
+        parts keep their score; each process sends back the events and
+        key analyses of its part. Parts are parsed serially where forking
+        is not safe: with other threads running (as in the interface), or
+        where processes can't be forked
+        """
+        global PENDING_PARSER
+
+        pending_parts, self.pending_parts = self.pending_parts, None
+        if processes is None:
+            processes = os.cpu_count() or 1
+
+        if processes == 1 or len(pending_parts) < 2 or not can_fork():
+            for index, part, name, first in pending_parts:
+                self.music_events['part_events'][index] = self.parse_sequence_part(
+                    part, name=name, first=first)
+            return
+
+        # the score is left as parsing the parts serially leaves it
+        for _, part, _, _ in pending_parts:
+            convert_quarter_tones(part)
+
+        PENDING_PARSER = (self, pending_parts)
+        try:
+            context = multiprocessing.get_context('fork')
+            with concurrent.futures.ProcessPoolExecutor(min(processes, len(pending_parts)),
+                                                        mp_context=context) as executor:
+                parsed_parts = executor.map(parse_pending_part, range(len(pending_parts)))
+                for (index, part, _, _), (events, analyses) in zip(pending_parts, parsed_parts):
+                    self.music_events['part_events'][index] = events
+                    self.key_analyses.add_analyses(part, analyses)
+        finally:
+            PENDING_PARSER = None
+
     def process_voiced_part_linear_instruments(self, part, i, real_in):
         """
         Process a part that has overlappings
@@ -165,13 +277,11 @@ class MusicParser:
             for j, voice in enumerate(new_parts.parts):
                 voice.insert(0, real_in)
                 index, name = self.name_of_part(real_in, j)
-                self.music_events['part_events'][index] = self.parse_sequence_part(
-                    voice, name=name, first=(False, True)[i == 0])
+                self.add_part(index, voice, name, i)
         else:
             new_parts.insert(0, real_in)
             index, name = self.name_of_part(real_in)
-            self.music_events['part_events'][index] = self.parse_sequence_part(
-                new_parts, name=name, first=(False, True)[i == 0])
+            self.add_part(index, new_parts, name, i)
 
     def process_voiced_part(self, part, i, real_in):
         """
@@ -190,13 +300,11 @@ class MusicParser:
             for j, voice in enumerate(new_parts.parts):
                 voice.insert(0, real_in)
                 index, name = self.name_of_part(real_in, j)
-                self.music_events['part_events'][index] = self.parse_sequence_part(
-                    voice, name=name, first=(False, True)[i == 0])
+                self.add_part(index, voice, name, i)
         else:
             new_parts.insert(0, real_in)
             index, name = self.name_of_part(real_in)
-            self.music_events['part_events'][index] = self.parse_sequence_part(
-                new_parts, name=name, first=(False, True)[i == 0])
+            self.add_part(index, new_parts, name, i)
 
     def name_of_part(self, real_in, j=None):
         """
@@ -308,6 +416,16 @@ class MusicParser:
             return self.music_events['interpart_events']
         return None
 
+    def column(self, name, part=None):
+        """
+        Returns a view (no copy) of the column of a viewpoint
+        for the events of a part (or the interpart events, if
+        part is None), e.g. column('pitch.cpitch', 'Piano')
+        """
+        if part is None:
+            return utils.viewpoint_column(self.get_interpart_events(), name)
+        return utils.viewpoint_column(self.get_part_events()[part], name)
+
     def to_json(self, filename, folders=None, indent=2):
         """
         Parses Music To json object
@@ -349,39 +467,60 @@ class MusicParser:
 
         with open(file_path + '.json', 'rb') as handle:
             to_load = json.load(handle)
-            print(to_load['interpart_events'])
-            self.music_events['interpart_events'] = [
-                InterPartEvent(from_dict=event) for event in to_load['interpart_events']]
+            self.music_events['interpart_events'] = EventTable(InterPartEvent, [
+                InterPartEvent(from_dict=event) for event in to_load['interpart_events']])
             for key, part in to_load['part_events'].items():
-                self.music_events['part_events'][int(key)] = [
-                    PartEvent(from_dict=event) for event in part]
+                # keys of parts are numbers or names
+                key = int(key) if key.isdigit() else key
+                self.music_events['part_events'][key] = EventTable(PartEvent, [
+                    PartEvent(from_dict=event) for event in part])
             handle.close()
 
-    def to_pickle(self, filename, folders=None):
+    def to_ndjson(self, filename, folders=None):
         """
-        Parses Music To cpickle object
+        Writes the events to an NDJSON event stream, one event per line
         """
         if folders is None:
             folders = FOLDER_DEFAULT
 
-        if not os.path.exists(os.sep.join(folders)):
-            os.makedirs(os.sep.join(folders))
+        folder_path = os.sep.join(folders)
+        with open(os.sep.join([folder_path, filename]) + '.ndjson', 'w', encoding='utf-8') as handle:
+            handle.writelines(write_records(
+                [(filename, os.path.basename(os.path.normpath(folder_path)), self.music_events)]))
+
+    def from_ndjson(self, filename, folders=None):
+        """
+        Reads the events from an NDJSON event stream (of one piece)
+        """
+        if folders is None:
+            folders = FOLDER_DEFAULT
+
+        with open(os.sep.join(folders + [filename]) + '.ndjson', 'r', encoding='utf-8') as handle:
+            _, _, self.music_events = next(read_records(handle))
+
+    def to_pickle(self, filename, folders=None, codec=compression.DEFAULT_CODEC):
+        """
+        Parses Music To cpickle object, compressed with a codec
+        (returns path of the file)
+        """
+        if folders is None:
+            folders = FOLDER_DEFAULT
+
+        # exist_ok, as parallel parsers may create the same folder
+        os.makedirs(os.sep.join(folders), exist_ok=True)
 
         file_path = os.sep.join(folders + [filename])
         if os.path.realpath('.').find('code') != -1:
             file_path.replace('code', '')
             file_path = os.sep.join(['..', file_path])
 
-        # .pbz2 is even better for compression than pickle
-        with bz2.BZ2File(file_path + '.pbz2', 'wb') as handle:
-            pickle.dump(self.music_events, handle,
-                        protocol=pickle.HIGHEST_PROTOCOL)
-            handle.close()
+        compression.dump(self.music_events, file_path + compression.PICKLE_EXTENSION, codec)
         print('Dumped to pickle')
+        return file_path + compression.PICKLE_EXTENSION
 
     def from_pickle(self, filename, folders=None):
         """
-        Parses Music To cpickle object
+        Parses Music from cpickle object (of any codec)
         """
         if folders is None:
             folders = FOLDER_DEFAULT
@@ -391,7 +530,97 @@ class MusicParser:
         #     file_path.replace('code', '')
         #     file_path = os.sep.join(['..', file_path])
 
-        with bz2.BZ2File(file_path + '.pbz2', 'rb') as handle:
-            self.music_events = pickle.load(handle)
-            handle.close()
+        # or its legacy .pbz2 file, if not saved since
+        pickle_path = compression.pickle_path(file_path)
+        if pickle_path is None:
+            raise FileNotFoundError('No pickle of {}'.format(file_path))
+        self.music_events = event_tables(compression.load(pickle_path))
         print('Loaded from pickle')
+
+    def to_store(self, filename, folders=None):
+        """
+        Saves the events to a file of the corpus store
+        (returns path of the file)
+        """
+        if folders is None:
+            folders = FOLDER_DEFAULT
+
+        # exist_ok, as parallel parsers may create the same folder
+        os.makedirs(os.sep.join(folders), exist_ok=True)
+
+        file_path = os.sep.join(folders + [filename]) + STORE_EXTENSION
+        write_store(file_path, self.music_events)
+        return file_path
+
+    def from_store(self, filename, folders=None):
+        """
+        Loads the events from a file of the corpus store
+        (its columns are only read from the file when used)
+        """
+        if folders is None:
+            folders = FOLDER_DEFAULT
+
+        self.music_events = read_store(os.sep.join(folders + [filename]) + STORE_EXTENSION)
+
+
+def event_tables(music_events):
+    """
+    Returns the events of a piece (as pickled) with its
+    lists of events (of legacy pickles) converted to tables
+    """
+    for key, part in music_events['part_events'].items():
+        if isinstance(part, list):
+            music_events['part_events'][key] = EventTable(PartEvent, part)
+    if isinstance(music_events['interpart_events'], list):
+        music_events['interpart_events'] = EventTable(
+            InterPartEvent, music_events['interpart_events'])
+    return music_events
+
+
+def load_parsed(file_path):
+    """
+    Returns a parser with the events of a parsed file in a
+    database (a file of the corpus store, or a pickle)
+    """
+    parser = MusicParser()
+    name, extension = os.path.splitext(os.path.basename(file_path))
+    folders = os.path.dirname(file_path).split(os.sep)
+    if extension == STORE_EXTENSION:
+        parser.from_store(name, folders)
+    else:
+        parser.from_pickle(name, folders)
+    return parser
+
+
+def parse_pending_part(number):
+    """
+    Parses a pending part of PENDING_PARSER in a forked process;
+    returns its events and its key analyses (by window)
+    """
+    parser, pending_parts = PENDING_PARSER
+    _, part, name, first = pending_parts[number]
+    events = parser.parse_sequence_part(part, name=name, first=first)
+    return events, parser.key_analyses.stream_analyses(part)
+
+
+def can_fork():
+    """
+    Returns if this process can be forked safely: it can be
+    forked, from its main thread, and no other thread runs
+    """
+    return ('fork' in multiprocessing.get_all_start_methods()
+            and threading.current_thread() is threading.main_thread()
+            and threading.active_count() == 1)
+
+
+def convert_quarter_tones(part):
+    """
+    Converts the quarter tones of the notes of a part to microtones,
+    as LineParser does when parsing the part
+    (needed when it parses a copy of it, in a forked process)
+    """
+    for note_or_rest in part.flat.notesAndRests:
+        if isinstance(note_or_rest, music21.chord.Chord):
+            note_or_rest.bass().convertQuarterTonesToMicrotones(inPlace=True)
+        elif not note_or_rest.isRest:
+            note_or_rest.pitch.convertQuarterTonesToMicrotones(inPlace=True)
@@ -0,0 +1,64 @@
+#!/usr/bin/env python3.7
+"""
+This script presents the class MusicXMLLineParser that processes the events of a
+line read by a MusicXMLReader
+"""
+import bisect
+
+import music21
+
+from application.logic.representation.parsers.line_parser import LineParser
+
+
+class MusicXMLLineParser(LineParser):
+    """
+    A LineParser for a part read by a MusicXMLReader (a sequence of notes
+    and rests in measures), that takes the measure and dynamic of each
+    note from the measures of the part, walked once, instead of searching
+    the contexts of each note (beats are still found by music21, as the
+    offset they are measured from depends on the contexts it searches).
+
+    Attributes
+    ----------
+    note_measures: dict
+        id of a note or rest -> (its measure, its offset in the part)
+    dynamic_offsets: list of float
+        offsets of the dynamics of the part, in order
+    dynamics: list of music21 dynamics
+        dynamics of the part, in order of offset
+    """
+
+    def __init__(self, music_to_parse, metadata=None, key_analyses=None):
+        super().__init__(music_to_parse, metadata, key_analyses)
+
+        self.note_measures = {}
+        self.dynamic_offsets, self.dynamics = [], []
+        for measure in music_to_parse.getElementsByClass('Measure'):
+            measure_offset = music_to_parse.elementOffset(measure)
+            for element in measure.elements:
+                offset = music21.common.opFrac(measure_offset + measure.elementOffset(element))
+                if isinstance(element, music21.note.GeneralNote):
+                    self.note_measures[id(element)] = (measure, offset)
+                elif isinstance(element, music21.dynamics.Dynamic):
+                    self.dynamic_offsets.append(offset)
+                    self.dynamics.append(element)
+
+    def measure_number(self, note_or_rest):
+        """
+        Returns the number of the measure of a note or rest
+        """
+        if id(note_or_rest) not in self.note_measures:
+            return super().measure_number(note_or_rest)
+        return self.note_measures[id(note_or_rest)][0].number
+
+    def realized_volume(self, note):
+        """
+        Returns the realized volume of a note with
+        the last dynamic at or before it
+        """
+        if id(note) not in self.note_measures:
+            return super().realized_volume(note)
+
+        position = bisect.bisect_right(self.dynamic_offsets, self.note_measures[id(note)][1]) - 1
+        dynamic = self.dynamics[position] if position >= 0 else False
+        return note.volume.getRealized(useDynamicContext=dynamic)
@@ -0,0 +1,198 @@
+#!/usr/bin/env python3.7
+"""
+This script presents the class MusicXMLReader that reads a MusicXML file
+(.xml, .musicxml or .mxl) in a single streaming pass, measure by measure
+"""
+import os
+import zipfile
+import xml.etree.ElementTree as ET
+
+import music21
+from music21.musicxml import xmlToM21
+
+MUSICXML_EXTENSIONS = ('.xml', '.musicxml', '.mxl')
+
+# tags of a measure that the reader reads (as music21 reads them)
+MEASURE_TAGS = ('note', 'attributes', 'direction', 'barline', 'forward', 'print', 'sound')
+
+
+class UnsupportedMusicXML(Exception):
+    """
+    Raised when a MusicXML file has music that the reader does not read
+    (more than a voice or staff in a part, chords, hidden elements...),
+    to be read by music21 instead
+    """
+
+
+class MusicXMLReader:
+    """
+    A class used to read a MusicXML file with iterparse, converting each
+    measure (with the parsers of music21) as soon as it is read and
+    dropping its elements, without loading the tree of the file nor
+    searching its music for voices: a file is read only if each of its
+    parts is a sequence of notes and rests of a single voice and staff.
+
+    Attributes
+    ----------
+    importer: MusicXMLImporter
+        importer (of music21) of the score, with its part list and spanners
+    score: music21 score
+        score read, with the parts read
+    parts: list of music21 parts
+        parts read, in order
+    """
+
+    def __init__(self, file_path):
+        self.importer = xmlToM21.MusicXMLImporter()
+        self.score = self.importer.stream
+        self.parts = []
+        self.read(file_path)
+
+    def read(self, file_path):
+        """
+        Reads the parts of the score of a MusicXML file
+        """
+        if not file_path.lower().endswith(MUSICXML_EXTENSIONS):
+            raise UnsupportedMusicXML('not a MusicXML file: {}'.format(file_path))
+
+        with open_musicxml(file_path) as handle:
+            root = None
+            part = None
+            part_parser = None
+            try:
+                for event, element in ET.iterparse(handle, events=('start', 'end')):
+                    if event == 'start':
+                        if root is None:
+                            root = self.read_root(element)
+                        elif element.tag == 'part':
+                            part, part_parser = element, self.part_parser(element)
+                    elif element.tag == 'part-list':
+                        self.read_header(root)
+                    elif element.tag == 'measure' and part_parser is not None:
+                        self.read_measure(part_parser, element)
+                        part.remove(element)
+                    elif element.tag == 'part' and part_parser is not None:
+                        self.read_part(part_parser)
+                        root.remove(element)
+                        part, part_parser = None, None
+            except ET.ParseError as exception:
+                raise UnsupportedMusicXML(str(exception))
+
+        self.read_score()
+        # as music21, the name of the file is the title of a score with no titles
+        if self.score.metadata.movementName is None:
+            self.score.metadata.movementName = os.path.basename(file_path)
+
+    def read_root(self, root):
+        """
+        Checks the root of a MusicXML file (partwise scores only)
+        """
+        if root.tag != 'score-partwise':
+            raise UnsupportedMusicXML('not a partwise score: {}'.format(root.tag))
+        version = root.get('version')
+        if version is not None:
+            self.importer.musicXmlVersion = version
+        return root
+
+    def read_header(self, root):
+        """
+        Reads the metadata and the part list of a score, that come
+        before its parts (as MusicXMLImporter.xmlRootToScore)
+        """
+        self.score.coreInsert(0, self.importer.xmlMetadata(root))
+        self.importer.parsePartList(root)
+
+    def part_parser(self, part):
+        """
+        Returns the parser (of music21) of a part, with its score part read
+        """
+        part_id = part.get('id')
+        if part_id is None:
+            part_id = list(self.importer.mxScorePartDict.keys())[0]
+        if part_id not in self.importer.mxScorePartDict:
+            raise UnsupportedMusicXML('part with no score part: {}'.format(part_id))
+
+        part_parser = xmlToM21.PartParser(
+            part, mxScorePart=self.importer.mxScorePartDict[part_id], parent=self.importer)
+        part_parser.partId = part_id
+        part_parser.parseXmlScorePart()
+        return part_parser
+
+    def read_measure(self, part_parser, measure):
+        """
+        Reads a measure of a part (as PartParser.parseMeasures),
+        if it has a single voice and staff
+        """
+        voices = set()
+        for element in measure:
+            if element.tag not in MEASURE_TAGS:
+                raise UnsupportedMusicXML('measure with {}'.format(element.tag))
+            if element.tag == 'note':
+                if element.find('chord') is not None:
+                    raise UnsupportedMusicXML('measure with chords')
+                voices.add(element.findtext('voice'))
+            elif element.tag == 'attributes' and int(element.findtext('staves', '1')) > 1:
+                raise UnsupportedMusicXML('part with more than a staff')
+        if len(voices) > 1:
+            raise UnsupportedMusicXML('measure with more than a voice')
+        if any(element.get('print-object') == 'no' for element in measure.iter()):
+            raise UnsupportedMusicXML('measure with hidden elements')
+
+        part_parser.xmlMeasureToMeasure(measure)
+
+    def read_part(self, part_parser):
+        """
+        Ends reading a part (as PartParser.parse), if it is a sequence
+        """
+        part = part_parser.stream
+        part.coreElementsChanged()
+        part.atSoundingPitch = part_parser.atSoundingPitch
+
+        completed = list(part_parser.spannerBundle.getByCompleteStatus(True))
+        for spanner in completed:
+            part.coreInsert(0, spanner)
+        for spanner in completed:
+            part_parser.spannerBundle.remove(spanner)
+        part.coreElementsChanged()
+
+        part.addGroupForElements(part_parser.partId)
+        part.groups.append(part_parser.partId)
+
+        if part.hasVoices() or not part.isSequence():
+            raise UnsupportedMusicXML('part that is not a sequence: {}'.format(part_parser.partId))
+
+        self.score.coreInsert(0.0, part)
+        self.importer.m21PartObjectsById[part_parser.partId] = part
+        self.parts.append(part)
+
+    def read_score(self):
+        """
+        Ends reading the score (as MusicXMLImporter.xmlRootToScore)
+        """
+        if not self.parts:
+            raise UnsupportedMusicXML('score with no parts')
+
+        self.importer.partGroups()
+        completed = list(self.importer.spannerBundle.getByCompleteStatus(True))
+        for spanner in completed:
+            self.score.coreInsert(0, spanner)
+        for spanner in completed:
+            self.importer.spannerBundle.remove(spanner)
+
+        self.score.coreElementsChanged()
+        self.score.sort()
+
+
+def open_musicxml(file_path):
+    """
+    Opens the MusicXML of a file: its first xml file, for
+    a compressed (.mxl) file (as music21 opens it)
+    """
+    if not file_path.lower().endswith('.mxl'):
+        return open(file_path, 'rb')
+
+    with zipfile.ZipFile(file_path) as archive:
+        for name in archive.namelist():
+            if 'META-INF' not in name and name.endswith(('.xml', 'musicxml')):
+                return archive.open(name)
+    raise UnsupportedMusicXML('no MusicXML in {}'.format(file_path))
@@ -194,25 +194,31 @@ def segmentation(events, weights_line=None, interpart_events=None, weights_vert=
     apply_phrasing(events, normalized_bss, normalized_weights)
 
 
-def get_last_bound_index_and_length(boundary_indexes, len_events, i):
+def get_last_bound_indexes_and_lengths(boundary_indexes, len_events, indexes):
     """
-    Get Index for Last Phrase Boundary
+    Get Indexes (in boundary_indexes) for Last Phrase Boundary of
+    events at indexes, and the lengths of their phrases
     """
-    index = boundary_indexes.index(
-        min(boundary_indexes, key=lambda x: abs(x - i)))
-    last_index = (index, index-1)[bool(i < boundary_indexes[index])]
+    boundary_indexes = np.asarray(boundary_indexes)
+    last_bound = len(boundary_indexes) - 1
 
-    length = len_events - boundary_indexes[last_index]
-    if last_index < len(boundary_indexes)-1:
-        length = boundary_indexes[last_index +
-                                  1] - boundary_indexes[last_index]
-    if i in boundary_indexes:
-        last_index = boundary_indexes.index(i)-1
-        length = len_events - i
-        if last_index < len(boundary_indexes)-2:
-            length = boundary_indexes[last_index+2] - i
+    last_indexes = np.searchsorted(boundary_indexes, indexes, side='right') - 1
+    next_indexes = np.minimum(last_indexes + 1, last_bound)
+    lengths = np.where(last_indexes < last_bound,
+                       boundary_indexes[next_indexes] -
+                       boundary_indexes[last_indexes],
+                       len_events - boundary_indexes[last_indexes])
 
-    return last_index, length
+    # events that are boundaries
+    is_boundary = np.isin(indexes, boundary_indexes)
+    bound_last_indexes = last_indexes - 1
+    after_next_indexes = np.minimum(bound_last_indexes + 2, last_bound)
+    bound_lengths = np.where(bound_last_indexes < last_bound - 1,
+                             boundary_indexes[after_next_indexes] - indexes,
+                             len_events - indexes)
+
+    return (np.where(is_boundary, bound_last_indexes, last_indexes),
+            np.where(is_boundary, bound_lengths, lengths))
 
 
 def apply_segmentation_info(events):
@@ -220,17 +226,19 @@ def apply_segmentation_info(events):
     Apply information to events from boundaries information
     """
     # print('Parse Segmentation')
-    boundary_indexes = [
-        i for i, event in enumerate(events) if event.get_viewpoint('phrase.boundary') == 1]
-
-    for i, event in enumerate(events):
-        if i != 0:
-            last_index, length = get_last_bound_index_and_length(
-                boundary_indexes, len(events), i)
-            intphrase = basic_utils.seq_int(event.get_viewpoint('pitch.cpitch'),
-                                            events[last_index].get_viewpoint('pitch.cpitch'))
-            event.add_viewpoint('intphrase', intphrase)
-            event.add_viewpoint('phrase.length', length)
+    boundary_indexes = np.flatnonzero(
+        basic_utils.viewpoint_column(events, 'phrase.boundary') == 1)
+    if len(events) < 2 or len(boundary_indexes) == 0:
+        return
+
+    indexes = np.arange(1, len(events))
+    last_indexes, lengths = get_last_bound_indexes_and_lengths(
+        boundary_indexes, len(events), indexes)
+
+    pitches = basic_utils.numeric_column(events, 'pitch.cpitch')
+    basic_utils.set_viewpoint_column(
+        events, 'intphrase', pitches[indexes] - pitches[last_indexes], indexes)
+    basic_utils.set_viewpoint_column(events, 'phrase.length', lengths, indexes)
 
 
 def get_phrases_from_events(events, return_rest_phrases=False):
@@ -0,0 +1,53 @@
+#!/usr/bin/env python3.7
+"""
+This script presents the command that exports the parsed pieces of a
+database as an NDJSON event stream, or imports them from one, a piece
+at a time, so that streams can be piped between databases and tools.
+
+Usage: python -m application.logic.representation.parsers.stream_events
+       export DATABASE_PATH [FOLDER ...] > events.ndjson
+       python -m application.logic.representation.parsers.stream_events
+       import DATABASE_PATH < events.ndjson
+"""
+import argparse
+import contextlib
+import os
+import sys
+
+from application.logic.representation.parsers.catalog import Catalog
+from application.logic.representation.parsers.corpus_store import STORE_EXTENSION, write_store
+from application.logic.representation.parsers.event_stream import read_records, write_records
+from application.logic.representation.parsers.music_parser import load_parsed
+
+
+def main():
+    """
+    Exports folders of a database to the standard output,
+    or imports pieces from the standard input to a database
+    """
+    argument_parser = argparse.ArgumentParser(
+        description='Exports or imports the parsed pieces of a database as NDJSON')
+    argument_parser.add_argument('command', choices=['export', 'import'])
+    argument_parser.add_argument('database_path')
+    argument_parser.add_argument('folders', nargs='*', help='folders to export (all if none)')
+    arguments = argument_parser.parse_args()
+
+    # messages of the parsers go to stderr, out of the stream
+    stream = sys.stdout
+    with contextlib.redirect_stdout(sys.stderr):
+        catalog = Catalog(arguments.database_path)
+        if arguments.command == 'export':
+            pieces = ((piece['name'], piece['folder'], load_parsed(piece['path']).music_events)
+                      for piece in catalog.pieces(folders=arguments.folders or None))
+            stream.writelines(write_records(pieces))
+        else:
+            for name, folder, music_events in read_records(sys.stdin):
+                folder_path = os.sep.join([arguments.database_path, folder or 'Other'])
+                os.makedirs(folder_path, exist_ok=True)
+                file_path = os.sep.join([folder_path, name + STORE_EXTENSION])
+                write_store(file_path, music_events)
+                catalog.add(file_path, music_events)
+        catalog.close()
+
+if __name__ == '__main__':
+    main()
@@ -2,7 +2,20 @@
 """
 This script presents utility functions for dealing with representations
 """
+import functools
+
 import music21
+import numpy as np
+
+from application.logic.representation.events.event_table import EventTable
+from application.logic.representation.events.offset_index import OffsetIndex
+from application.logic.representation.parsers.key_analysis import built_key
+
+# roman numerals of chords (by names of a chord, tonic and mode of a key) kept
+HARMONIC_FUNCTIONS = 4096
+
+# scale degrees of pitches (by name of a pitch, tonic and mode of a key) kept
+SCALE_DEGREES = 1024
 
 #
 # Basic/Maths Functions
@@ -60,6 +73,61 @@ def is_intervalic_difference(seq_int_1, sign_1, seq_int_2, sign_2):
         return True
     return False
 
+#
+# Viewpoint Columns
+#
+
+
+def viewpoint_column(events, name):
+    """
+    Returns the values of a viewpoint for a sequence of events as a numpy
+    array: for an EventTable, a view of its column (no copy, codes for
+    category viewpoints), else an object array of the values
+    """
+    if isinstance(events, EventTable):
+        return events.column(name)
+    return np.array([event.get_viewpoint(name) for event in events], dtype=object)
+
+
+def viewpoint_values(events, name):
+    """
+    Returns the values of a viewpoint for a sequence of events
+    (decoded from its column, for an EventTable)
+    """
+    if isinstance(events, EventTable):
+        return events.values(name)
+    return [event.get_viewpoint(name) for event in events]
+
+
+def offsets_column(events):
+    """
+    Returns the offsets of a sequence of events
+    (a view of its offsets, for an EventTable)
+    """
+    if isinstance(events, EventTable):
+        return events.offsets[:len(events)]
+    return np.array([event.get_offset() for event in events], dtype=object)
+
+
+def set_viewpoint_column(events, name, values, indexes):
+    """
+    Sets the values of a viewpoint for the events at indexes
+    (at once, for an EventTable)
+    """
+    if isinstance(events, EventTable):
+        events.set_column(name, values, indexes)
+    else:
+        for index, value in zip(indexes, np.asarray(values).tolist()):
+            events[index].add_viewpoint(name, None if value != value else value)
+
+
+def numeric_column(events, name):
+    """
+    Returns the values of a numeric viewpoint for
+    a sequence of events as floats (NaN for None)
+    """
+    return np.asarray(viewpoint_column(events, name), dtype=np.float64)
+
 #
 # Offset Related
 #
@@ -68,6 +136,7 @@ def is_intervalic_difference(seq_int_1, sign_1, seq_int_2, sign_2):
 def get_last_x_events_that_are_notes_before_index(events, number=1, actual_index=None):
     """
     Returns the first event that is a note but not a rest before an event
+    (with number > 1, the last number notes, if there are more before it)
     """
     if len(events) < 2:
         return None
@@ -76,26 +145,39 @@ def get_last_x_events_that_are_notes_before_index(events, number=1, actual_index
     if actual_index is None:
         actual_index = len(events) - 1
 
-    count = 0
-    events_to_return = []
-    events_process = events[:actual_index]
-    for i in range(len(events_process)):
-        index = len(events_process) - (i + 1)
-        if not events_process[index].is_rest():
-            if number == 1:
-                return index
-            if count < number:
-                events_to_return.append(index)
-                count += 1
-            else:
-                return events_to_return
+    # search back in growing windows, as the notes are usually near
+    rests = viewpoint_column(events, 'rest')[:actual_index]
+    indexes = []
+    end, window = len(rests), 16
+    while end > 0 and len(indexes) <= number:
+        start = max(0, end - window)
+        notes = np.flatnonzero(~rests[start:end].astype(bool))
+        indexes.extend(int(start + index) for index in notes[::-1])
+        end, window = start, 2 * window
+
+    if number == 1:
+        return indexes[0] if indexes else None
+    if len(indexes) > number:
+        return indexes[:number]
     return None
 
 
+def offset_index(events):
+    """
+    Returns the OffsetIndex of a sequence of events
+    (kept by the table, for an EventTable)
+    """
+    if isinstance(events, EventTable):
+        return events.offset_index()
+    return OffsetIndex(event.get_offset() for event in events)
+
+
 def get_events_at_offset(events, offset):
     """
     Returns all events that happen at a specified offset
     """
+    if isinstance(events, EventTable):
+        return [events[index] for index in events.offset_index().indexes_at(offset)]
     return [event for event in events if event.get_offset() == offset]
 
 
@@ -109,6 +191,9 @@ def get_evs_bet_offs_inc(events, offset1, offset2=None):
     if offset2 is None:
         offset2 = events[-1].get_offset()
 
+    if isinstance(events, EventTable):
+        return [events[index] for index in
+                events.offset_index().indexes_between(offset1, offset2)]
     return [event for event in events if offset1 <= event.get_offset() <= offset2]
 
 
@@ -119,7 +204,8 @@ def get_rests(events):
     """
     Returns all events that are rests
     """
-    return [event for event in events if event.is_rest()]
+    rests = viewpoint_column(events, 'rest').astype(bool)
+    return [events[index] for index in np.flatnonzero(rests)]
 
 
 def get_grace_notes(events):
@@ -129,11 +215,65 @@ def get_grace_notes(events):
     return [event for event in events if event.is_grace_note()]
 
 
+def pitch_name(pitch):
+    """
+    Returns the name (without octave) and microtone of a pitch
+    """
+    return (pitch.name, pitch.microtone.cents)
+
+
+def chord_names(chord, repeated=True):
+    """
+    Returns the names of the pitches of a chord, in order (without
+    octaves), as a key of the analyses of chords: the table, pitch
+    class and elements information of a chord depend only on its
+    names without repetitions, its roman numerals on all its names
+    """
+    names = []
+    for pitch in chord.pitches:
+        name = pitch_name(pitch)
+        if repeated or name not in names:
+            names.append(name)
+    return tuple(names)
+
+
 def harmonic_functions_key(chord, key):
     """
     Parses the harmonic key signatures information for a key
+    (analysed once for each chord names and key)
+    """
+    analysed = harmonic_function(chord_names(chord), key.tonic.nameWithOctave,
+                                 getattr(key, 'mode', None))
+    if 'function' not in analysed:
+        analysed['function'] = music21.roman.romanNumeralFromChord(chord, key)
+    return analysed['function']
+
+
+@functools.lru_cache(maxsize=HARMONIC_FUNCTIONS)
+def harmonic_function(names, tonic, mode):
+    """
+    Returns the analysis of the chords of some names in a key (a dict,
+    with the function of the first chord analysed), keeping the last
+    """
+    return {}
+
+
+def scale_degree(key, pitch):
+    """
+    Returns the scale degree of a pitch (or name of a pitch) in a key
+    (analysed once for each name of a pitch and key)
+    """
+    return pitch_scale_degree(pitch if isinstance(pitch, str) else pitch.name,
+                              key.tonic.nameWithOctave, getattr(key, 'mode', None))
+
+
+@functools.lru_cache(maxsize=SCALE_DEGREES)
+def pitch_scale_degree(name, tonic, mode):
+    """
+    Returns the scale degree of the name of a pitch in the key of
+    a tonic and mode, keeping the scale degrees found last
     """
-    return music21.roman.romanNumeralFromChord(chord, key)
+    return built_key(tonic, mode).getScaleDegreeFromPitch(name)
 
 
 def part_name_parser(music_to_parse):
@@ -146,10 +286,13 @@ def part_name_parser(music_to_parse):
     return part_name_voice
 
 
-def get_analysis_keys_stream_bet_offsets(music_to_parse, off1, off2):
+def get_analysis_keys_stream_bet_offsets(music_to_parse, off1, off2, key_analyses=None):
     """
     Gets an analysis of key for a stream
+    (from a KeyAnalysisCache, if given)
     """
+    if key_analyses is not None:
+        return (off1, key_analyses.key_between_offsets(music_to_parse, off1, off2))
     k = music_to_parse.getElementsByOffset(
         off1, off2).stream().analyze('key')
     return (off1, k)
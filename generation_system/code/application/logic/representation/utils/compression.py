@@ -0,0 +1,93 @@
+"""
+Compressed Pickles
+"""
+import bz2
+import lzma
+import os
+import pickle
+import zlib
+
+PICKLE_EXTENSION = '.pickle'
+LEGACY_EXTENSION = '.pbz2'
+
+# a header (magic, length of the name of the codec, name) precedes the data
+PICKLE_MAGIC = b'PCKL'
+LEGACY_MAGIC = b'BZh'
+
+# codec -> (compress, decompress)
+CODECS = {
+    'none': (bytes, bytes),
+    'zlib': (zlib.compress, zlib.decompress),
+    'lzma': (lzma.compress, lzma.decompress),
+    'bz2': (bz2.compress, bz2.decompress),
+}
+DEFAULT_CODEC = 'zlib'
+
+
+def dump(obj, file_path, codec=DEFAULT_CODEC):
+    """
+    Pickles an object to a file compressed with a codec, named in
+    the header of the file (written to a temporary file that replaces
+    it when done, so that no file is left half written)
+    """
+    if codec not in CODECS:
+        raise ValueError('unknown codec {} (codecs: {})'.format(codec, ', '.join(CODECS)))
+
+    data = CODECS[codec][0](pickle.dumps(obj, protocol=pickle.HIGHEST_PROTOCOL))
+    name = codec.encode('ascii')
+    temporary_path = file_path + '.tmp'
+    try:
+        with open(temporary_path, 'wb') as handle:
+            handle.write(PICKLE_MAGIC + bytes([len(name)]) + name)
+            handle.write(data)
+        os.replace(temporary_path, file_path)
+    finally:
+        if os.path.isfile(temporary_path):
+            os.remove(temporary_path)
+
+
+def pickle_path(file_path):
+    """
+    Returns the path of the pickle of file_path (without extension): its
+    .pickle file or its legacy .pbz2 file, the newest if both exist, so
+    that a pickle older than its .pbz2 file does not shadow it (or None)
+    """
+    paths = [file_path + extension for extension in (PICKLE_EXTENSION, LEGACY_EXTENSION)
+             if os.path.isfile(file_path + extension)]
+    if not paths:
+        return None
+    return max(paths, key=os.path.getmtime)
+
+
+def load(file_path):
+    """
+    Unpickles an object from a file, decompressed with the codec
+    of its header (or with bz2, for a legacy .pbz2 file)
+    """
+    with open(file_path, 'rb') as handle:
+        data = handle.read()
+    return pickle.loads(CODECS[codec_of(data, file_path)][1](strip_header(data)))
+
+
+def codec_of(data, file_path=''):
+    """
+    Returns the codec of the contents of a file
+    """
+    if data.startswith(PICKLE_MAGIC):
+        size = data[len(PICKLE_MAGIC)]
+        codec = data[len(PICKLE_MAGIC) + 1:len(PICKLE_MAGIC) + 1 + size].decode('ascii')
+        if codec not in CODECS:
+            raise ValueError('{} has unknown codec {}'.format(file_path, codec))
+        return codec
+    if data.startswith(LEGACY_MAGIC):
+        return 'bz2'
+    raise ValueError('{} is not a compressed pickle'.format(file_path))
+
+
+def strip_header(data):
+    """
+    Returns the contents of a file without its header
+    """
+    if not data.startswith(PICKLE_MAGIC):
+        return data
+    return data[len(PICKLE_MAGIC) + 1 + data[len(PICKLE_MAGIC)]:]
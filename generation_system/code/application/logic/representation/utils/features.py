@@ -1,9 +1,15 @@
 """
 Normalization And Arrays
 """
+import functools
+import numbers
+
 import numpy as np
-from sklearn.feature_extraction import DictVectorizer
-from sklearn.impute import SimpleImputer
+
+from application.logic.representation.events.event_table import EventRow, EventTable
+
+# decoders (lists of features names) kept compiled
+COMPILED_DECODERS = 64
 
 
 def flatten(newlist):
@@ -69,21 +75,342 @@ def normalize_weights(weights):
     return [float(w)/sum(weights) for w in weights]
 
 
+def event_blocks(events):
+    """
+    Splits a sequence of events in blocks of consecutive rows of
+    the same EventTable, as (first index, length, table, first row);
+    events that are not views of a table are blocks of their own,
+    with table and first row None
+    """
+    if isinstance(events, EventTable):
+        return [(0, len(events), events, 0)]
+
+    blocks = []
+    for i, event in enumerate(events):
+        values = event._values
+        if (isinstance(values, EventRow) and blocks and blocks[-1][2] is values.table
+                and blocks[-1][3] + blocks[-1][1] == values.row):
+            start, length, table, row = blocks[-1]
+            blocks[-1] = (start, length + 1, table, row)
+        elif isinstance(values, EventRow):
+            blocks.append((i, 1, values.table, values.row))
+        else:
+            blocks.append((i, 1, None, None))
+    return blocks
+
+
+class FeatureEncoder:
+    """
+    A class used to encode events in a matrix of features.
+
+    Gives the same columns, in the same (sorted) order and with the same
+    names, as a DictVectorizer over the to_feature_dict of the events
+    followed by imputing nan_value for None, but writes the events straight
+    into the matrix: numeric viewpoints of events stored in an EventTable
+    are copied column by column, strings are one-hot encoded by their codes
+    in the vocabulary, and only lists and objects are encoded one by one.
+
+    Attributes
+    ----------
+    features: list of str
+        viewpoints to encode (all viewpoints of the events if None)
+    offset: bool
+        if offset is encoded as a feature
+    feature_names: list of str
+        names of the columns of the matrix, sorted (but
+        for the columns appended by partial_fit)
+    vocabulary: dict
+        name of column -> index of column
+    """
+
+    def __init__(self, features=None, offset=True, nan_value=10000, dtype=np.float64):
+        self.features = None if features is None else list(features)
+        self.offset = offset
+        self.nan_value = nan_value
+        self.dtype = dtype
+
+        self.feature_names = []
+        self.vocabulary = {}
+
+    def fit(self, events):
+        """
+        Learns the vocabulary of features from events
+        """
+        self.feature_names = []
+        self.vocabulary = {}
+        return self.partial_fit(events)
+
+    def partial_fit(self, events):
+        """
+        Adds the features of events to the vocabulary: new columns are
+        appended (sorted by name), so that the columns of the matrices
+        and weights of the vocabulary before keep their indexes
+        """
+        self._add_names(name for name, _, _ in self._entries(events))
+        return self
+
+    def set_feature_names(self, feature_names):
+        """
+        Sets the vocabulary of features (e.g. to the one of a corpus)
+        """
+        self.feature_names = []
+        self.vocabulary = {}
+        self._add_names(feature_names)
+        return self
+
+    def transform(self, events, out=None):
+        """
+        Returns the matrix of features of events, in out if
+        given; features not in the vocabulary are ignored
+        """
+        return self._fill(self._entries(events), len(events), out)
+
+    def fit_transform(self, events, out=None):
+        """
+        Learns the vocabulary of features from events
+        and returns their matrix of features
+        """
+        self.feature_names = []
+        self.vocabulary = {}
+
+        entries = list(self._entries(events))
+        self._add_names(name for name, _, _ in entries)
+        return self._fill(entries, len(events), out)
+
+    def _add_names(self, names):
+        for name in sorted(set(names).difference(self.vocabulary)):
+            self.vocabulary[name] = len(self.feature_names)
+            self.feature_names.append(name)
+
+    def _fill(self, entries, length, out=None):
+        matrix = out
+        if matrix is None:
+            matrix = np.zeros((length, len(self.feature_names)), dtype=self.dtype)
+        else:
+            matrix[:] = 0
+
+        for name, rows, value in entries:
+            column = self.vocabulary.get(name)
+            if column is not None:
+                matrix[rows, column] = value
+
+        matrix[np.isnan(matrix)] = self.nan_value
+        return matrix
+
+    def _entries(self, events):
+        """
+        Yields the features of events as (name, rows, value),
+        rows being a slice (for a block of values) or an index
+        """
+        if len(events) == 0:
+            return
+
+        event_class = (events.event_class if isinstance(events, EventTable)
+                       else type(events[0]))
+        schema = event_class.SCHEMA
+        features = self.features
+        if features is None:
+            features = schema.paths
+
+        for start, length, table, row in event_blocks(events):
+            rows = slice(start, start + length)
+
+            if self.offset:
+                if table is not None:
+                    offsets = table.offsets[row:row + length]
+                else:
+                    offsets = [events[start].get_offset()]
+                yield 'offset', rows, np.array(offsets, dtype=np.float64)
+
+            for feat in features:
+                slot = schema.resolve(feat)
+                if (table is not None and slot is not None
+                        and event_class.is_numeric_feature(feat)):
+                    kind = table.kinds[slot]
+                    column = table.columns[slot][row:row + length]
+                    if kind in ('bool', 'int', 'float'):
+                        yield feat, rows, column
+                        continue
+                    if kind == 'category':
+                        # one-hot straight from the codes of the values
+                        for code in np.unique(column):
+                            value = table.vocabulary.decode(schema.paths[slot], code)
+                            code_rows = start + np.flatnonzero(column == code)
+                            for name, entry in vectorized_entries(feat, value):
+                                yield name, code_rows, entry
+                        continue
+
+                for i in range(length):
+                    content = None
+                    if slot is not None:
+                        content = (table.get_value(row + i, slot) if table is not None
+                                   else events[start + i]._values[slot])
+                    for name, value in event_class.feature_values(feat, content):
+                        for entry in vectorized_entries(name, value):
+                            yield entry[0], start + i, entry[1]
+
+
+class FeatureDecoder:
+    """
+    A class used to decode rows of a matrix of features back into events
+    (the inverse of FeatureEncoder, as event_class.from_feature_list).
+
+    The features names are compiled once (see compile_feature of the
+    event classes) to the slots they set; a block of rows is then decoded
+    column by column into an EventTable, numeric and bool columns being
+    written at once and only the one-hot/converted features one by one.
+
+    Attributes
+    ----------
+    event_class: class
+        class of the decoded events (PartEvent, InterPartEvent)
+    features_names: list of str
+        names of the columns of the matrix
+    nan_value: float
+        value of the features that are None
+    operations: list of tuples
+        compiled (kind, slot, raw_slot, info) of each column
+    """
+
+    def __init__(self, event_class, features_names, nan_value=10000):
+        self.event_class = event_class
+        self.features_names = list(features_names)
+        self.nan_value = nan_value
+        self.operations = [event_class.compile_feature(feat)
+                           for feat in self.features_names]
+
+    @classmethod
+    def compiled(cls, event_class, features_names, nan_value=10000):
+        """
+        Returns the (shared) decoder of a list of features names
+        (the decoders used last are kept compiled)
+        """
+        return compiled_decoder(cls, event_class, tuple(features_names), nan_value)
+
+    def decode(self, rows):
+        """
+        Returns an EventTable with the events of rows of features
+        """
+        matrix = np.asarray(rows, dtype=np.float64).reshape(
+            len(rows), len(self.operations))
+        table = EventTable(self.event_class, capacity=max(16, len(matrix)))
+        table.add_rows(len(matrix))
+
+        for column, (kind, slot, raw_slot, info) in zip(matrix.T, self.operations):
+            if kind == 'offset':
+                table.offsets[:len(column)] = list(column)
+                continue
+
+            is_nan = column == self.nan_value
+            self._set(table, raw_slot, np.flatnonzero(is_nan))
+
+            indexes = np.flatnonzero(~is_nan)
+            if kind in ('array', 'category', 'instrument'):
+                is_on = column[indexes] == 1.0
+                on_indexes, indexes = indexes[is_on], indexes[~is_on]
+                if kind == 'instrument':
+                    self._set(table, slot, on_indexes, [info() for _ in on_indexes])
+                else:
+                    self._set(table, slot, on_indexes, [info] * len(on_indexes))
+
+            values = column[indexes]
+            if kind == 'bool':
+                values = values.astype(bool)
+            elif kind == 'convert':
+                values = [info(value) for value in values]
+            self._set(table, raw_slot, indexes, values)
+
+        return table
+
+    def decode_event(self, event, row):
+        """
+        Sets the viewpoints (and offset) of an event from a row of features
+        """
+        for value, (kind, slot, raw_slot, info) in zip(row, self.operations):
+            if kind == 'offset':
+                event.offset_time = value
+                continue
+
+            if value == self.nan_value:
+                slot, value = raw_slot, None
+            elif kind == 'bool':
+                slot, value = raw_slot, bool(value)
+            elif kind in ('array', 'category') and value == 1.0:
+                value = info
+            elif kind == 'instrument' and value == 1.0:
+                value = info()
+            elif kind == 'convert':
+                slot, value = raw_slot, info(value)
+            else:
+                slot = raw_slot
+
+            if slot is not None:
+                add_value(event._values, slot, value)
+
+    @staticmethod
+    def _set(table, slot, indexes, values=None):
+        """
+        Adds values to a slot of some rows of a (new) table
+        """
+        if slot is None or len(indexes) == 0:
+            return
+        if table.kinds[slot] == 'object':
+            # values may already be lists, that are appended to
+            if values is None:
+                values = [None] * len(indexes)
+            for index, value in zip(indexes, values):
+                add_value(EventRow(table, index), slot, value)
+        else:
+            table.set_values(slot, indexes, values)
+
+
+@functools.lru_cache(maxsize=COMPILED_DECODERS)
+def compiled_decoder(decoder_class, event_class, features_names, nan_value):
+    """
+    Returns a decoder of a tuple of features names,
+    keeping the decoders compiled last
+    """
+    return decoder_class(event_class, features_names, nan_value)
+
+
+def add_value(values, slot, value):
+    """
+    Adds a value to a slot of the values of an event
+    (list viewpoints are appended to, the others replaced)
+    """
+    if isinstance(values[slot], list):
+        values[slot] = flatten(values[slot] + [value])
+    else:
+        values[slot] = value
+
+
+def vectorized_entries(name, value):
+    """
+    Returns the (name, value) of the columns of a feature,
+    as DictVectorizer does: strings are one-hot encoded as
+    'name=value' and None is NaN
+    """
+    if isinstance(value, str):
+        return [(name + '=' + value, 1.0)]
+    if value is None:
+        return [(name, np.nan)]
+    if isinstance(value, numbers.Number):
+        return [(name, float(value))]
+    try:
+        return [(name + '=' + item, 1.0) for item in value]
+    except TypeError:
+        raise TypeError('Unsupported value type {} for {}: {}'.format(
+            type(value), name, value))
+
+
 def create_feat_array(events, weights=None, offset=True):
     """
     Create a feature Array from Events and clean values.
     Can use weights for which features to extract and offset
     if offset can be counted as a feature
     """
-    events_dict = [event.to_feature_dict(weights, offset) for event in events]
-
-    vec = DictVectorizer()
-    features = vec.fit_transform(events_dict).toarray()
-    features_names = vec.get_feature_names()
-
-    imp = SimpleImputer(missing_values=np.nan,
-                        strategy='constant', fill_value=10000)
-    return imp.fit_transform(features), features_names
+    encoder = FeatureEncoder(weights, offset)
+    return encoder.fit_transform(events), encoder.feature_names
 
 
 def events_to_features(events, weights=None,
@@ -152,3 +479,130 @@ def get_columns_from_weights(weights, fixed_weights, features_names):
             feature_names_per_column.append(key)
 
     return columns_to_retain, weights_per_column, fixed_per_column, feature_names_per_column
+
+
+def feature_columns(features_names, viewpoints):
+    """
+    Returns, for each viewpoint, the indexes of the columns of
+    features_names that encode it ('name', 'name=value', 'name_item');
+    a column belongs to the longest viewpoint it matches
+    """
+    columns = dict((viewpoint, []) for viewpoint in viewpoints)
+    for i, name in enumerate(features_names):
+        matches = [viewpoint for viewpoint in viewpoints
+                   if name == viewpoint or name.startswith(viewpoint + '=')
+                   or name.startswith(viewpoint + '_')]
+        if matches:
+            columns[max(matches, key=len)].append(i)
+    return [np.array(columns[viewpoint], dtype=int) for viewpoint in viewpoints]
+
+
+def weighted_similarity_matrix(features, other_features, columns, weights):
+    """
+    Returns the (M, N) matrix of weighted similarities of M rows of features
+    with N rows of other_features (encoded with the same columns): the sum
+    of the weights of the viewpoints (given by their columns) whose
+    columns are all equal, over the sum of the weights.
+    Encoded list viewpoints are equal if they have the same items, in any
+    order (weighted_similarity compares the viewpoints of events exactly)
+    """
+    features = np.asarray(features, dtype=np.float64)
+    other_features = np.asarray(other_features, dtype=np.float64)
+    length = len(features)
+
+    score = np.zeros((length, len(other_features)))
+    for viewpoint_columns, weight in zip(columns, weights):
+        if weight == 0:
+            continue
+        if len(viewpoint_columns) == 0:
+            # viewpoint encoded by no column: always equal (None)
+            score += weight
+            continue
+        # rows with the same values have the same code (None, as NaN, is equal to None)
+        _, codes = np.unique(np.nan_to_num(np.concatenate((features[:, viewpoint_columns],
+                                                           other_features[:, viewpoint_columns])),
+                                           nan=np.inf),
+                             axis=0, return_inverse=True)
+        codes = codes.ravel()
+        score += weight * (codes[:length, np.newaxis] == codes[np.newaxis, length:])
+
+    return score / np.sum(weights)
+
+
+def weighted_similarity(events, others=None, weights=None):
+    """
+    Returns the (M, N) matrix of weighted_comparison of M events
+    with N others (with themselves if others is None), computed
+    viewpoint by viewpoint over codes of their values
+    """
+    if others is None:
+        others = events
+
+    if weights is None:
+        fingerprints = [event.fingerprint() for event in events]
+        other_fingerprints = [event.fingerprint() for event in others]
+        _, codes = np.unique(np.array(fingerprints + other_fingerprints, dtype=object),
+                             return_inverse=True)
+        codes = codes.ravel()
+        length = len(fingerprints)
+        return (codes[:length, np.newaxis] == codes[np.newaxis, length:]).astype(np.float64)
+
+    length = len(events)
+    score = np.zeros((length, len(others)))
+    for viewpoint, weight in weights.items():
+        if weight == 0:
+            continue
+        values = comparison_values(events, viewpoint)
+        other_values = comparison_values(others, viewpoint)
+        codes = equality_codes(values + other_values)
+        if codes is None:
+            # values that are only compared with ==
+            score += weight * np.array([[value == other for other in other_values]
+                                        for value in values], dtype=bool)
+        else:
+            score += weight * (codes[:length, np.newaxis] == codes[np.newaxis, length:])
+
+    return score / sum(weights.values())
+
+
+def comparison_values(events, name):
+    """
+    Returns the values of a viewpoint of events, as get_viewpoint gives them
+    """
+    if isinstance(events, EventTable):
+        if events.schema.resolve(name) is None:
+            return [None] * len(events)
+        return events.values(name)
+    return [event.get_viewpoint(name) for event in events]
+
+
+def equality_codes(values):
+    """
+    Returns an array of codes of values, the same for equal values
+    (lists are equal item by item, in order), or None if some
+    value can not be coded (objects only compared with ==)
+    """
+    codes = {}
+    result = np.empty(len(values), dtype=np.int64)
+    for i, value in enumerate(values):
+        key = equality_key(value)
+        if key is None and value is not None:
+            return None
+        result[i] = codes.setdefault(key, len(codes))
+    return result
+
+
+def equality_key(value):
+    """
+    Returns a key of a value, equal (and with the same hash) for equal
+    values: the value itself for None, strings and numbers (1 == 1.0 ==
+    Fraction(1, 1)), the keys of its items for lists, else None
+    """
+    if value is None or isinstance(value, (str, numbers.Number)):
+        return value
+    if isinstance(value, (list, tuple)):
+        keys = tuple(equality_key(item) for item in value)
+        if any(key is None and item is not None for key, item in zip(keys, value)):
+            return None
+        return (type(value), keys)
+    return None
@@ -1,23 +1,25 @@
 """
 Printing Utilities
 """
+import application.logic.representation.parsers.utils as utils
 
 
-def offset_info(event, viewpoint):
+def offset_info(offset, value):
     """
-    Returns a string of offset : specific viewpoint for an event
+    Returns a string of offset : specific viewpoint value for an event
     """
-    to_print = 'Off ' + str(event.get_offset()) + ': '
-    to_print += str(event.get_viewpoint(viewpoint)) + '; '
+    to_print = 'Off ' + str(offset) + ': '
+    to_print += str(value) + '; '
     return to_print
 
 
 def show_sequence_of_viewpoint_with_offset(events, viewpoint):
     """
-    Returns a string of a specific viewpoint for all events and offset of event
+    Returns a string of a specific viewpoint for all events (that have it) and offset of event
     """
-    viewpoint_events = [offset_info(event, viewpoint)
-                        for event in events if event.check_viewpoint(viewpoint)]
+    viewpoint_events = [offset_info(offset, value) for offset, value in
+                        zip(utils.offsets_column(events), utils.viewpoint_values(events, viewpoint))
+                        if value is not None]
     to_print = 'Viewpoint ' + viewpoint + ' : '
     to_print += ''.join(viewpoint_events)
     return to_print
@@ -28,8 +30,8 @@ def show_sequence_of_viewpoint_without_offset(events, viewpoint):
     Returns a string of a specific viewpoint for all events with no offset
     """
     to_print = 'Viewpoint ' + viewpoint + ': '
-    to_print += ''.join([(str(event.get_viewpoint(viewpoint)) + ' ')
-                         for event in events])
+    to_print += ''.join([(str(value) + ' ')
+                         for value in utils.viewpoint_values(events, viewpoint)])
     return to_print
 
 
@@ -25,24 +25,14 @@ def is_power(num_1, num_2):
 def get_number_voices(stream):
     """
     Get Ideal Number of Voices from a Music21 Stream
+    (the largest cardinality of its chords: its notes stay in
+    the same voice even if they overlap)
     """
     voice_count = 1
 
     # To deal with separation of chords
-    chords = stream.recurse(classFilter='Chord')
-    cardinalities = [len(chord.pitches) for chord in chords]
-    for card in cardinalities:
-        if card > voice_count:
-            voice_count = card
-
-    old_dict_notes = stream.recurse(classFilter='Note')
-    stream_not_hidden = music21.stream.Stream()
-    _ = [stream_not_hidden.append(
-        note) for note in old_dict_notes if not note.style.hideObjectOnPrint]
-    old_dict_overlaps = stream_not_hidden.getOverlaps()
-    for group in old_dict_overlaps.values():
-        if len(group) > voice_count:
-            voice_count = len(group)
+    for chord in stream.recurse(classFilter='Chord'):
+        voice_count = max(voice_count, len(chord.pitches))
     return voice_count
 
 
@@ -84,12 +74,27 @@ def process_chord(element, off, voices, voice_count):
 
         cardinality = len(notes_to_insert)
         if cardinality == voice_count:
-            voices[i].insert(off, note)
+            voices[i].coreInsert(off, note)
             continue
 
         start_voice, end_voice = distribute_notes(i, cardinality, voice_count)
         for j in range(start_voice, end_voice):
-            voices[j].insert(off, note)
+            voices[j].coreInsert(off, note)
+
+
+def insert_element(element, off, voices, voice_count):
+    """
+    Insert element in voices (the notes of a chord distributed by them)
+    """
+    if isinstance(element, music21.chord.Chord):
+        process_chord(element, off, voices, voice_count)
+        return
+
+    for voice in voices:
+        if (isinstance(element, (music21.note.Note, music21.note.Rest))
+                and element.style.hideObjectOnPrint):
+            break
+        voice.coreInsert(off, element)
 
 
 def remove_unused_voices(voices, fill_gaps, return_obj):
@@ -133,19 +138,26 @@ def make_voices(stream, in_place=False, fill_gaps=True, number_voices=None, dist
 
     voices = define_voices(voice_count, dist_name)
 
+    # elements are distributed with offsets of a single flat stream and then
+    # removed from source at once, but end elements (barlines) at the end of
+    # the stream without its elements (where removing one by one left them)
+    flat = return_obj.flat
+    elements, end_elements = [], []
     for element in return_obj.recurse():
-        off = element.getOffsetBySite(return_obj.flat)
+        if return_obj.elementOffset(element, stringReturns=True) == 'highestTime':
+            end_elements.append(element)
+            continue
+        insert_element(element, element.getOffsetBySite(flat), voices, voice_count)
+        elements.append(element)
+    return_obj.remove(elements)
 
-        if isinstance(element, music21.chord.Chord):
-            process_chord(element, off, voices, voice_count)
-        else:
-            for voice in voices:
-                if (isinstance(element, (music21.note.Note, music21.note.Rest))
-                        and element.style.hideObjectOnPrint):
-                    break
-                voice.insert(off, element)
-        # remove from source
-        return_obj.remove(element)
+    flat = return_obj.flat
+    for element in end_elements:
+        insert_element(element, element.getOffsetBySite(flat), voices, voice_count)
+    return_obj.remove(end_elements)
+
+    for voice in voices:
+        voice.coreElementsChanged()
 
     remove_unused_voices(voices, fill_gaps, return_obj)
 
@@ -158,16 +170,16 @@ def process_voiced_measure(measure, max_voice_count):
     Process a measure that has voices
     """
     new_voices = []
-    old_measure = copy.deepcopy(measure)
+    old_voices = [copy.deepcopy(voice) for voice in measure.voices]
     measure.removeByClass(classFilterList='Voice')
 
-    for voice in old_measure.voices:
+    for voice in old_voices:
         if (len(voice.recurse(classFilter='Chord')) > 0
                 or len(voice.recurse(classFilter='Note').getOverlaps()) > 0):
-            new = make_voices(voice, in_place=False, number_voices=int(
-                max_voice_count/len(old_measure.voices)), dist_name=len(new_voices))
-            for _voice in new.voices:
-                new_voices.append(_voice)
+            # voice is a copy already, divided in place
+            make_voices(voice, in_place=True, number_voices=int(
+                max_voice_count/len(old_voices)), dist_name=len(new_voices))
+            new_voices.extend(voice.voices)
         else:
             new_voices.append(voice)
 
@@ -14,6 +14,7 @@ from application.logic.representation.conversor.score_conversor import parse_sin
 from application.logic.representation.events.linear_event import PartEvent
 from application.logic.representation.events.interpart_event import InterPartEvent
 from application.logic.representation.parsers.utils import get_last_x_events_that_are_notes_before_index
+from application.logic.representation.utils.features import FeatureDecoder
 
 
 def get_single_part_features(application, information, line):
@@ -193,8 +194,8 @@ def linear_score_generator(application, sequence, o_information,
     Score Generator for Single Line
     """
     if 'inter-part' not in line:
-        sequenced_events = [PartEvent(
-            from_list=o_information[state+start], features=feature_names) for state in sequence]
+        sequenced_events = FeatureDecoder.compiled(PartEvent, feature_names).decode(
+            [o_information[state+start] for state in sequence])
 
         if application.principal_music is not None:
             start_pitch = application.principal_music[0].get_part_events()[
@@ -208,8 +209,8 @@ def linear_score_generator(application, sequence, o_information,
         else:
             start_pitch = o_information[start][feature_names.index('pitch.cpitch')]
     else:
-        sequenced_events = [InterPartEvent(
-            from_list=o_information[state+start], features=feature_names) for state in sequence]
+        sequenced_events = FeatureDecoder.compiled(InterPartEvent, feature_names).decode(
+            [o_information[state+start] for state in sequence])
 
     if len(sequenced_events) > 0:
         if 'inter-part' not in line:
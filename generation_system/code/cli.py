@@ -1,7 +1,11 @@
 """
 Main caller for .EXE
 """
+import multiprocessing
+
 from application.__main__ import main
 
 if __name__ == '__main__':
+    # workers of the parsing pool re-run the frozen .EXE: they must not open the interface
+    multiprocessing.freeze_support()
     main()
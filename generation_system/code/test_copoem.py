@@ -1,6 +1,4 @@
-import bz2
 import glob
-import pickle
 import os
 
 from application.logic import Application
@@ -17,16 +15,9 @@ if __name__ == '__main__':
     # app.apply_viewpoint_weights(w_d, f_d)
     # app.generate_oracle(None, line_oracle=True, line='Piano')
 
-    # with bz2.BZ2File(app.database_path + os.sep + 'portuguese_model.pbz2', 'wb') as handle:
-    #     pickle.dump(app.oracles_information['single_oracle'], handle,
-    #                 protocol=pickle.HIGHEST_PROTOCOL)
-    #     handle.close()
-    #     print('Dumped to pickle')
+    # app.save_model('portuguese_model')
+    # print('Model Saved')
 
-    with bz2.BZ2File(app.database_path + os.sep + 'portuguese_model.pbz2', 'rb') as handle:
-        unpickler = pickle.Unpickler(handle)
-        data = unpickler.load()
-
-    print('Data Loaded')
-    app.oracles_information['single_oracle'] = data
+    app.load_model('portuguese_model')
+    print('Model Loaded')
     # app.generate_sequences(line_oracle=True, num_seq=1)
\ No newline at end of file
@@ -0,0 +1,34 @@
+# content of catalog_test.py
+import os
+
+from .context import code
+
+from application.logic.representation.parsers.catalog import Catalog
+from application.logic.representation.parsers.music_parser import MusicParser
+
+EXAMPLES = os.path.join(os.path.dirname(__file__), '..', 'data', 'myexamples')
+
+
+def test_catalog_is_refreshed(tmp_path):
+    parser = MusicParser(os.path.join(EXAMPLES, 'small.mxl'))
+    parser.parse()
+    kept = parser.to_store('small', [str(tmp_path), 'Bach'])
+    removed = parser.to_store('small', [str(tmp_path), 'Other'])
+
+    catalog = Catalog(str(tmp_path))
+    assert catalog.folders() == ['Bach', 'Other']
+    assert [piece['path'] for piece in catalog.pieces()] == [os.path.normpath(kept),
+                                                            os.path.normpath(removed)]
+    piece = catalog.pieces(folders=['Bach'])[0]
+    assert piece['name'] == 'small'
+    assert piece['part_events'] == sum(len(table) for table in
+                                       parser.music_events['part_events'].values())
+    assert piece['interpart_events'] == len(parser.music_events['interpart_events'])
+    catalog.close()
+
+    # files removed from the database are forgotten when it is opened
+    os.remove(removed)
+    catalog = Catalog(str(tmp_path))
+    assert catalog.folders() == ['Bach']
+    assert catalog.size()[0] == 1
+    catalog.close()
@@ -0,0 +1,60 @@
+# content of compression_test.py
+import bz2
+import os
+import pickle
+
+import pytest
+
+from .context import code
+
+import application.logic.representation.utils.compression as compression
+from application.logic.representation.parsers.corpus_store import STORE_EXTENSION
+from application.logic.representation.parsers.migration import migrate_database
+from application.logic.representation.parsers.music_parser import MusicParser, load_parsed
+
+EXAMPLES = os.path.join(os.path.dirname(__file__), '..', 'data', 'myexamples')
+
+
+def feature_dicts(music_events):
+    return ({key: [(event.get_offset(), event.to_feature_dict()) for event in table]
+             for key, table in music_events['part_events'].items()},
+            [(event.get_offset(), event.to_feature_dict())
+             for event in music_events['interpart_events']])
+
+
+@pytest.fixture(scope='module')
+def parser():
+    parser = MusicParser(os.path.join(EXAMPLES, 'small.mxl'))
+    parser.parse()
+    return parser
+
+
+@pytest.mark.parametrize('codec', sorted(compression.CODECS))
+def test_pickle_round_trip(tmp_path, parser, codec):
+    file_path = parser.to_pickle('small', [str(tmp_path)], codec)
+    with open(file_path, 'rb') as handle:
+        assert compression.codec_of(handle.read()) == codec
+
+    loaded = MusicParser()
+    loaded.from_pickle('small', [str(tmp_path)])
+    assert feature_dicts(loaded.music_events) == feature_dicts(parser.music_events)
+
+
+def test_legacy_pickles_are_migrated(tmp_path, parser):
+    # a legacy pickle: bz2, no header, and lists of events
+    legacy = {'part_events': {key: list(table)
+                              for key, table in parser.music_events['part_events'].items()},
+              'interpart_events': list(parser.music_events['interpart_events'])}
+    os.makedirs(str(tmp_path / 'Folder'))
+    with bz2.BZ2File(str(tmp_path / 'Folder' / 'small.pbz2'), 'wb') as handle:
+        pickle.dump(legacy, handle)
+
+    loaded = MusicParser()
+    loaded.from_pickle('small', [str(tmp_path), 'Folder'])
+    assert feature_dicts(loaded.music_events) == feature_dicts(parser.music_events)
+
+    store_path = str(tmp_path / 'Folder' / 'small') + STORE_EXTENSION
+    assert migrate_database(str(tmp_path)) == [store_path]
+    assert sorted(os.listdir(str(tmp_path / 'Folder'))) == ['small' + STORE_EXTENSION]
+    assert feature_dicts(load_parsed(store_path).music_events) == \
+        feature_dicts(parser.music_events)
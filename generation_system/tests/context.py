@@ -2,4 +2,19 @@ import os
 import sys
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
 
-import code
\ No newline at end of file
+import code
+# the application package is in code
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'code'))
+
+from application.logic.representation.events.linear_event import PartEvent
+
+
+def part_event(offset, cpitch, dynamics=()):
+    """
+    Returns a part event with a pitch and dynamics
+    """
+    event = PartEvent(offset)
+    for dynamic in dynamics:
+        event.add_viewpoint('dynamic', dynamic)
+    event.add_viewpoint('cpitch', cpitch)
+    return event
@@ -0,0 +1,61 @@
+# content of corpus_store_test.py
+import os
+
+from .context import code
+
+from application.logic.representation.events.event_table import EventTable
+from application.logic.representation.events.interpart_event import InterPartEvent
+from application.logic.representation.events.linear_event import PartEvent
+from application.logic.representation.events.vocabulary import CORPUS_VOCABULARY, Vocabulary
+from application.logic.representation.parsers.corpus_store import read_store, write_store
+from application.logic.representation.parsers.music_parser import MusicParser
+
+EXAMPLES = os.path.join(os.path.dirname(__file__), '..', 'data', 'myexamples')
+
+
+def table_values(table):
+    # (music21 objects, as instruments, are equal by their repr)
+    return [(event.get_offset(), [(path, repr(event.get_viewpoint(path)))
+                                  for path in table.schema.paths])
+            for event in table]
+
+
+def test_store_round_trip(tmp_path):
+    parser = MusicParser(os.path.join(EXAMPLES, 'small.mxl'))
+    parser.parse()
+    parser.to_store('small', [str(tmp_path)])
+
+    loaded = MusicParser()
+    loaded.from_store('small', [str(tmp_path)])
+
+    assert list(loaded.music_events['part_events']) == list(parser.music_events['part_events'])
+    for key, table in parser.music_events['part_events'].items():
+        assert table_values(loaded.music_events['part_events'][key]) == table_values(table)
+    assert table_values(loaded.music_events['interpart_events']) == \
+        table_values(parser.music_events['interpart_events'])
+
+
+def test_store_recodes_vocabulary(tmp_path):
+    # a table coded with the vocabulary of another process
+    # (its accidentals do not have the codes of the corpus vocabulary)
+    table = EventTable(PartEvent)
+    values = {path: list(path_values) for path, path_values in CORPUS_VOCABULARY.values.items()}
+    values['pitch.accidental'] = ['unknown-accidental', 'b', '#'] + [
+        value for value in values.get('pitch.accidental', []) if value not in ('b', '#')]
+    table.vocabulary = Vocabulary(values)
+    accidentals = ['#', 'b', '#', 'n']
+    for offset, accidental in enumerate(accidentals):
+        event = PartEvent(offset)
+        event.add_viewpoint('accidental', accidental)
+        table.append(event)
+
+    file_path = str(tmp_path / 'piece.events')
+    write_store(file_path, {'part_events': {'Flute': table},
+                            'interpart_events': EventTable(InterPartEvent)})
+    loaded = read_store(file_path)['part_events']['Flute']
+
+    slot = PartEvent.SCHEMA.paths.index('pitch.accidental')
+    assert loaded.vocabulary is CORPUS_VOCABULARY
+    assert list(loaded.columns[slot][:4]) != list(table.columns[slot][:4])
+    assert [event.get_viewpoint('accidental') for event in loaded] == accidentals
+    assert list(loaded.values('pitch.accidental')) == accidentals
@@ -0,0 +1,41 @@
+# content of event_stream_test.py
+from fractions import Fraction
+
+import music21
+
+from .context import code
+
+from application.logic.representation.parsers.music_parser import MusicParser
+
+
+def tuplet_score():
+    score = music21.stream.Score()
+    part = music21.stream.Part()
+    part.partName = 'Flute'
+    measure = music21.stream.Measure(number=1)
+    measure.timeSignature = music21.meter.TimeSignature('2/4')
+    for name in ['C4', 'D4', 'E4']:
+        measure.append(music21.note.Note(name, quarterLength=Fraction(1, 3)))
+    measure.append(music21.note.Note('F4', quarterLength=1))
+    part.append(measure)
+    score.insert(0, part)
+    return score
+
+
+def test_ndjson_tuplet_durations(tmp_path):
+    file_path = tuplet_score().write('musicxml', str(tmp_path / 'tuplet.musicxml'))
+    parser = MusicParser(str(file_path))
+    parser.parse()
+    parser.to_ndjson('tuplet', [str(tmp_path)])
+
+    loaded = MusicParser()
+    loaded.from_ndjson('tuplet', [str(tmp_path)])
+
+    for key, table in parser.music_events['part_events'].items():
+        events = loaded.music_events['part_events'][key]
+        assert [event.get_offset() for event in events] == [0, Fraction(1, 3), Fraction(2, 3), 1]
+        durations = [event.get_viewpoint('duration.length') for event in events]
+        assert durations == [Fraction(1, 3)] * 3 + [1]
+        assert all(isinstance(duration, Fraction) for duration in durations[:3])
+        assert [event.to_feature_dict() for event in events] == \
+            [event.to_feature_dict() for event in table]
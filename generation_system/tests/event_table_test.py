@@ -0,0 +1,31 @@
+# content of event_table_test.py
+import pickle
+
+import numpy as np
+
+from .context import code
+
+from application.logic.representation.events.event_table import EventTable
+from application.logic.representation.events.linear_event import PartEvent
+
+
+def test_numeric_values_keep_their_types():
+    values = [1, 1.0, 0.5, None, 2 ** 60]
+    events = []
+    for offset, value in enumerate(values):
+        event = PartEvent(offset)
+        event.add_viewpoint('cpitch', value)
+        events.append(event)
+    table = EventTable(PartEvent, events)
+
+    for loaded in (table, pickle.loads(pickle.dumps(table))):
+        read = [event.get_viewpoint('cpitch') for event in loaded]
+        assert read == values
+        assert [type(value) for value in read] == [type(value) for value in values]
+        assert [type(value) for value in loaded.values('cpitch')] == \
+            [type(value) for value in values]
+
+    table = EventTable(PartEvent, events[:4])
+    table.set_column('cpitch', np.array([3, 4]), [0, 1])
+    table.set_column('cpitch', np.array([2.0]), [3])
+    assert [type(event.get_viewpoint('cpitch')) for event in table] == [int, int, float, float]
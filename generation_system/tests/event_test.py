@@ -0,0 +1,37 @@
+# content of event_test.py
+import pickle
+
+import pytest
+
+from .context import code, part_event
+
+from application.logic.representation.events.event_table import EventTable
+from application.logic.representation.events.linear_event import PartEvent
+
+
+def test_only_frozen_events_are_hashable():
+    event = part_event(0, 2)
+    with pytest.raises(TypeError):
+        hash(event)
+
+    frozen = event.freeze()
+    assert frozen == event and frozen.freeze() is frozen
+    with pytest.raises(TypeError):
+        frozen.add_viewpoint('cpitch', 4)
+
+    # the event it was copied from can still be changed
+    event.add_viewpoint('cpitch', 4)
+    assert frozen.get_viewpoint('cpitch') == 2
+    assert frozen in {part_event(1, 2).freeze()}
+    assert hash(pickle.loads(pickle.dumps(frozen))) == hash(frozen)
+
+
+def test_frozen_rows_are_detached():
+    table = EventTable(PartEvent, [part_event(0, 2), part_event(1, 2)])
+    events = {event.freeze() for event in table}
+    assert len(events) == 1
+
+    frozen = table[0].freeze()
+    table[0].add_viewpoint('cpitch', 4)
+    assert frozen.get_viewpoint('cpitch') == 2
+    assert frozen in events
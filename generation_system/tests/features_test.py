@@ -0,0 +1,33 @@
+# content of features_test.py
+import numpy as np
+
+from .context import code, part_event
+
+from application.logic.representation.events.event_table import EventTable
+from application.logic.representation.events.linear_event import PartEvent
+from application.logic.representation.utils.features import FeatureEncoder, weighted_similarity
+
+
+def test_weighted_similarity_list_order():
+    events = [part_event(0, 0, ['p', 'f']), part_event(1, 0, ['f', 'p']),
+              part_event(2, 2, ['p', 'f'])]
+    weights = {'expressions.dynamic': 2, 'cpitch': 1}
+
+    expected = np.array([[event.weighted_comparison(other, weights) for other in events]
+                         for event in events])
+    assert expected[0, 1] == 1 / 3
+    assert np.allclose(weighted_similarity(events, weights=weights), expected)
+    assert np.allclose(weighted_similarity(EventTable(PartEvent, events), weights=weights),
+                       expected)
+
+
+def test_partial_fit_appends_columns():
+    first = [part_event(0, 60), part_event(1, 62)]
+    encoder = FeatureEncoder(['cpitch', 'dynamic']).fit(first)
+    matrix = encoder.transform(first)
+    assert encoder.feature_names == ['cpitch', 'offset']
+
+    # the columns fitted before keep their indexes
+    encoder.partial_fit([part_event(2, 64, ['p', 'f'])])
+    assert encoder.feature_names == ['cpitch', 'offset', 'dynamic_f', 'dynamic_p']
+    assert np.array_equal(encoder.transform(first)[:, :2], matrix)
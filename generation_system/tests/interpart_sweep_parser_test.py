@@ -0,0 +1,57 @@
+# content of interpart_sweep_parser_test.py
+import music21
+
+from .context import code
+
+from application.logic.representation.parsers.music_parser import MusicParser
+
+
+def tied_score():
+    score = music21.stream.Score()
+    upper = music21.stream.Part()
+    upper.partName = 'Flute'
+    lower = music21.stream.Part()
+    lower.partName = 'Cello'
+    for number in (1, 2):
+        upper_measure = music21.stream.Measure(number=number)
+        lower_measure = music21.stream.Measure(number=number)
+        if number == 1:
+            for measure in (upper_measure, lower_measure):
+                measure.keySignature = music21.key.KeySignature(0)
+                measure.timeSignature = music21.meter.TimeSignature('4/4')
+
+        # a note tied to a note of the chord after it,
+        # split by the (shorter) notes of the other part
+        tied = music21.note.Note('E4', quarterLength=1)
+        tied.tie = music21.tie.Tie('start')
+        chord = music21.chord.Chord(['E4', 'G4'], quarterLength=2)
+        chord[0].tie = music21.tie.Tie('stop')
+        upper_measure.append([music21.note.Note('C4', quarterLength=1), tied, chord])
+        for name in ['C3', 'D3', 'E3', 'F3', 'G3', 'A3', 'B3', 'C4']:
+            lower_measure.append(music21.note.Note(name, quarterLength=0.5))
+
+        upper.append(upper_measure)
+        lower.append(lower_measure)
+    score.insert(0, upper)
+    score.insert(0, lower)
+    return score
+
+
+def test_sweep_matches_chordify(tmp_path):
+    file_path = str(tied_score().write('musicxml', str(tmp_path / 'tied.musicxml')))
+
+    events = {}
+    for method in ('chordify', 'sweep'):
+        parser = MusicParser(file_path)
+        parser.parse(interpart_method=method)
+        events[method] = parser.music_events['interpart_events']
+
+    assert len(events['sweep']) == len(events['chordify'])
+    for swept, chordified in zip(events['sweep'], events['chordify']):
+        assert swept.get_offset() == chordified.get_offset()
+        assert swept.to_feature_dict() == chordified.to_feature_dict()
+
+    # the chords (at 2.0 and 6.0) start split, but their first
+    # note is tied to the note before them: their tie continues
+    ties = [event.get_viewpoint('duration.tie.type') for event in events['sweep']]
+    assert ties[4] == ties[12] == 'continue'
@@ -0,0 +1,33 @@
+# content of line_parser_test.py
+import os
+from fractions import Fraction
+
+from .context import code
+
+from application.logic.representation.parsers.music_parser import MusicParser
+
+EXAMPLES = os.path.join(os.path.dirname(__file__), '..', 'data', 'myexamples')
+
+
+def test_single_pass_matches_multi_pass():
+    # a line with a time signature change (4/4 to 3/4 at 4.0)
+    # and dynamics (ppp and fz), parsed as the passes of each
+    # viewpoint over all events parsed it
+    parser = MusicParser(os.path.join(EXAMPLES, 'MicrotonsExample.mxl'))
+    parser.parse()
+    events = parser.music_events['part_events']['Alto Saxophone']
+
+    assert [event.get_offset() for event in events] == [
+        0, 1, 1, 2, 3, 4, Fraction(25, 6), Fraction(13, 3), 4.5,
+        5, 6, 6.5, 7, 8, 8.5, 8.75, 9, 10, 11]
+    assert [event.get_viewpoint('derived.posinbar') for event in events] == [
+        0, 0, 1, 2, 3, 2, Fraction(13, 6), Fraction(7, 3), 2.5,
+        0, 1, 1.5, 2, 0, 0.5, 0.75, 1, 2, 0]
+    assert [event.get_viewpoint('derived.beat_strength') for event in events] == [
+        1, 0, 0.25, 0.5, 0.25, 0.5, 0.0625, 0.0625, 0.25,
+        1, 0.5, 0.25, 0.5, 1, 0.25, 0.125, 0.5, 0.5, 1]
+    assert [event.get_viewpoint('dynamic') for event in events] == \
+        [['ppp']] * 4 + [['ppp', 'fz']] + [['fz']] * 14
+    volumes = [event.get_viewpoint('expressions.volume') for event in events]
+    assert volumes[:5] == [0.262598, 0.212598, 0.212598, 0.16259800000000002, 1]
+    assert volumes[5:] == [0.992124] * 6 + [100] + [0.992124] * 2 + [100] + [0.992124] * 4
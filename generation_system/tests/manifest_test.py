@@ -0,0 +1,37 @@
+# content of manifest_test.py
+from .context import code
+
+import application.logic.representation.parsers.manifest as manifest
+from application.logic.representation.parsers.manifest import Manifest, content_hash
+
+
+def test_changed_files_are_not_current(tmp_path, monkeypatch):
+    source = tmp_path / 'piece.musicxml'
+    source.write_text('<score-partwise/>')
+    pickle_path = tmp_path / 'Folder' / 'piece.events'
+    pickle_path.parent.mkdir()
+    pickle_path.write_bytes(b'')
+
+    parsed = Manifest(str(tmp_path))
+    parsed.add(str(source), content_hash(str(source)), str(pickle_path))
+    parsed.save()
+
+    # a manifest read again keeps the files parsed
+    loaded = Manifest(str(tmp_path))
+    assert loaded.is_current(str(source), content_hash(str(source)))
+    assert loaded.pickle_path(str(source)) == str(pickle_path)
+
+    # files parsed by another version of the parser are parsed again
+    monkeypatch.setattr(manifest, 'PARSER_VERSION', manifest.PARSER_VERSION + 1)
+    assert not loaded.is_current(str(source), content_hash(str(source)))
+    monkeypatch.undo()
+
+    # and so are files whose contents changed
+    source.write_text('<score-partwise version="3.1"/>')
+    assert not loaded.is_current(str(source), content_hash(str(source)))
+
+    # or whose pickle was removed
+    source.write_text('<score-partwise/>')
+    assert loaded.is_current(str(source), content_hash(str(source)))
+    pickle_path.unlink()
+    assert not loaded.is_current(str(source), content_hash(str(source)))
@@ -0,0 +1,41 @@
+# content of model_store_test.py
+import random
+
+import numpy as np
+
+from .context import code
+
+import application.logic.generation.gen_algorithms.generation as gen
+import application.logic.generation.utils as gen_utils
+from application.logic.generation.model_store import load_model, save_model
+
+
+def trained_model():
+    features = np.random.RandomState(0).randint(0, 3, (30, 4)).astype(float).tolist()
+    names = ['a', 'b', 'c', 'd']
+    oracle = gen_utils.build_oracle(features, flag='a', features=names,
+                                    weights=np.ones(4), dim=4, dfunc='cosine', threshold=0.1)
+    return {'single_oracle': {'key': 'piece', 'oracle': oracle, 'normed_features': features,
+                              'features_names': names, 'threshold': 0.1},
+            'multiple_oracles': {}}
+
+
+def test_model_round_trip(tmp_path):
+    model = trained_model()
+    file_path = str(tmp_path / 'piece.model')
+    save_model(file_path, model)
+    loaded = load_model(file_path)
+
+    oracle = model['single_oracle']['oracle']
+    loaded_oracle = loaded['single_oracle']['oracle']
+    for links in ('sfx', 'trn', 'rsfx', 'lrs', 'data'):
+        assert loaded_oracle.basic_attributes[links] == oracle.basic_attributes[links]
+    assert loaded['single_oracle']['normed_features'] == model['single_oracle']['normed_features']
+    assert loaded['single_oracle']['features_names'] == model['single_oracle']['features_names']
+
+    # the oracle loaded generates the same sequences
+    sequences = []
+    for generating in (oracle, loaded_oracle):
+        random.seed(1)
+        sequences.append(gen.generate(oracle=generating, seq_len=20, p=0.5, k=-1, LRS=2))
+    assert sequences[0] == sequences[1]
@@ -0,0 +1,39 @@
+# content of musicxml_reader_test.py
+import os
+
+import pytest
+
+from .context import code
+
+from application.logic.representation.parsers.music_parser import MusicParser
+from application.logic.representation.parsers.musicxml_reader import (MusicXMLReader,
+                                                                       UnsupportedMusicXML)
+
+EXAMPLES = os.path.join(os.path.dirname(__file__), '..', 'data', 'myexamples')
+
+
+def parsed_events(filename, reader):
+    parser = MusicParser(os.path.join(EXAMPLES, filename), reader=reader)
+    assert (parser.music_reader is not None) == (reader == 'iterparse')
+    parser.parse()
+    return parser.music_events
+
+
+@pytest.mark.parametrize('filename', ['small.mxl', 'complexcompass.mxl', 'f.mxl',
+                                      'MicrotonsExample.mxl', 'bwv1.6.mxl'])
+def test_iterparse_matches_music21(filename):
+    streamed = parsed_events(filename, 'iterparse')
+    read = parsed_events(filename, 'music21')
+
+    assert list(streamed['part_events']) == list(read['part_events'])
+    for key, events in read['part_events'].items():
+        assert [(event.get_offset(), event.to_feature_dict()) for event in streamed['part_events'][key]] == \
+            [(event.get_offset(), event.to_feature_dict()) for event in events]
+    assert [(event.get_offset(), event.to_feature_dict()) for event in streamed['interpart_events']] == \
+        [(event.get_offset(), event.to_feature_dict()) for event in read['interpart_events']]
+
+
+@pytest.mark.parametrize('filename', ['bwv67.4.mxl', 'Faur2.mxl'])
+def test_unsupported_files_are_read_by_music21(filename):
+    with pytest.raises(UnsupportedMusicXML):
+        MusicXMLReader(os.path.join(EXAMPLES, filename))